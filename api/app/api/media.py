@@ -0,0 +1,228 @@
+import hashlib
+import os
+import stat
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from mimetypes import guess_type
+from pathlib import Path
+
+import anyio
+from starlette.background import BackgroundTask
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+CHUNK_SIZE = 1024 * 1024
+
+# Media files are replaced in place (re-renders, regenerated clips), so
+# clients may keep them but must revalidate; the strong ETag makes that a
+# cheap 304.
+MEDIA_CACHE_CONTROL = "no-cache"
+
+
+def file_etag(st: os.stat_result) -> str:
+    """Strong ETag from file identity.
+
+    Outputs are written to a temp file and renamed into place, so a new
+    version always has a new inode even when size and mtime collide.
+    """
+    identity = f"{st.st_dev}:{st.st_ino}:{st.st_size}:{st.st_mtime_ns}"
+    return '"' + hashlib.sha1(identity.encode()).hexdigest()[:20] + '"'
+
+
+class MediaFileResponse(Response):
+    """Serve a file with conditional requests, single byte ranges and
+    zero-copy transfer where the server supports it.
+
+    Servers advertising the ``http.response.zerocopysend`` extension get
+    the file descriptor and send it with sendfile(2); ``pathsend`` is used
+    for whole-file responses. Otherwise the file is streamed in large
+    chunks read off the event loop.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        media_type: str | None = None,
+        filename: str | None = None,
+        cache_control: str = MEDIA_CACHE_CONTROL,
+        headers: dict[str, str] | None = None,
+        background: BackgroundTask | None = None,
+    ) -> None:
+        self.path = Path(path)
+        self.status_code = 200
+        self.media_type = media_type or guess_type(self.path.name)[0] or "application/octet-stream"
+        self.background = background
+        self.init_headers(headers)
+        self.headers.setdefault("accept-ranges", "bytes")
+        self.headers.setdefault("cache-control", cache_control)
+        if filename is not None:
+            self.headers.setdefault(
+                "content-disposition", f'attachment; filename="{filename}"')
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except (FileNotFoundError, IsADirectoryError):
+            await Response(status_code=404)(scope, receive, send)
+            return
+
+        try:
+            st = os.fstat(fd)
+            if not stat.S_ISREG(st.st_mode):
+                await Response(status_code=404)(scope, receive, send)
+                return
+            await self._respond(scope, send, fd, st)
+        finally:
+            os.close(fd)
+
+        if self.background is not None:
+            await self.background()
+
+    async def _respond(self, scope: Scope, send: Send, fd: int, st: os.stat_result) -> None:
+        request_headers = Headers(scope=scope)
+        size = st.st_size
+        etag = file_etag(st)
+        last_modified = format_datetime(
+            datetime.fromtimestamp(st.st_mtime, timezone.utc), usegmt=True)
+
+        self.headers["etag"] = etag
+        self.headers["last-modified"] = last_modified
+
+        if _not_modified(request_headers, etag, st.st_mtime):
+            await self._send_headers(send, 304, content_length=None)
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        byte_range = None
+        range_header = request_headers.get("range")
+        if range_header and _if_range_matches(request_headers.get("if-range"), etag, last_modified):
+            try:
+                byte_range = _parse_range(range_header, size)
+            except ValueError:
+                # A malformed Range is ignored and the whole file is sent.
+                byte_range = (0, size)
+            if byte_range is None:
+                self.headers["content-range"] = f"bytes */{size}"
+                await self._send_headers(send, 416, content_length=0)
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+        if byte_range is not None and byte_range != (0, size):
+            start, end = byte_range
+            self.headers["content-range"] = f"bytes {start}-{end - 1}/{size}"
+            status = 206
+        else:
+            start, end = 0, size
+            byte_range = None
+            status = 200
+
+        await self._send_headers(send, status, content_length=end - start)
+        if scope["method"] == "HEAD" or end == start:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        extensions = scope.get("extensions") or {}
+        if "http.response.zerocopysend" in extensions:
+            await send({
+                "type": "http.response.zerocopysend",
+                "file": fd,
+                "offset": start,
+                "count": end - start,
+            })
+        elif "http.response.pathsend" in extensions and byte_range is None:
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+        else:
+            await _send_chunks(send, fd, start, end)
+
+    async def _send_headers(self, send: Send, status: int, content_length: int | None) -> None:
+        if content_length is not None:
+            self.headers["content-length"] = str(content_length)
+        elif "content-length" in self.headers:
+            del self.headers["content-length"]
+        if status in (304, 416):
+            del self.headers["content-type"]
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": self.raw_headers,
+        })
+
+
+async def _send_chunks(send: Send, fd: int, start: int, end: int) -> None:
+    offset = start
+    while offset < end:
+        chunk = await anyio.to_thread.run_sync(
+            os.pread, fd, min(CHUNK_SIZE, end - offset), offset)
+        if not chunk:
+            # Truncated underneath us; the declared length cannot be met.
+            raise RuntimeError("File shrank while it was being sent")
+        offset += len(chunk)
+        await send({
+            "type": "http.response.body",
+            "body": chunk,
+            "more_body": offset < end,
+        })
+
+
+def _etags(header: str) -> list[str]:
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def _not_modified(headers: Headers, etag: str, mtime: float) -> bool:
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        # Weak comparison is correct for If-None-Match.
+        return any(tag == "*" or tag.removeprefix("W/") == etag
+                   for tag in _etags(if_none_match))
+
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return int(mtime) <= since.timestamp()
+    return False
+
+
+def _if_range_matches(if_range: str | None, etag: str, last_modified: str) -> bool:
+    if if_range is None:
+        return True
+    # If-Range needs a strong match: weak validators never satisfy it.
+    if if_range.startswith('"'):
+        return if_range == etag
+    return if_range == last_modified
+
+
+def _parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """Parse a single ``bytes=`` range into a half-open ``(start, end)``.
+
+    Returns None when it cannot be satisfied and raises ValueError when it
+    is malformed. Multiple ranges are served as their spanning range, which
+    browsers never ask for anyway.
+    """
+    units, _, spec = header.partition("=")
+    if units.strip().lower() != "bytes" or not spec:
+        raise ValueError(header)
+
+    starts, ends = [], []
+    for part in spec.split(","):
+        first, sep, last = part.strip().partition("-")
+        if not sep or not (first or last):
+            raise ValueError(header)
+        if first:
+            start = int(first)
+            if last and int(last) < start:
+                raise ValueError(header)
+            end = min(int(last) + 1, size) if last else size
+        else:
+            start, end = max(0, size - int(last)), size
+        if start >= end:
+            continue
+        starts.append(start)
+        ends.append(end)
+
+    if not starts:
+        return None
+    return min(starts), max(ends)
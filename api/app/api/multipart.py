@@ -0,0 +1,123 @@
+from dataclasses import dataclass
+from typing import AsyncIterator
+
+import python_multipart
+from fastapi import HTTPException, Request
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import parse_options_header
+
+
+@dataclass
+class StreamedFile:
+    filename: str | None
+    content_type: str | None
+    chunks: AsyncIterator[bytes]
+
+
+class _FileFieldCollector:
+    """Multipart parser callbacks that keep only one file field's bytes."""
+
+    def __init__(self, field_name: str) -> None:
+        self.field_name = field_name
+        self.headers: dict[bytes, bytes] = {}
+        self.found: dict[bytes, bytes] | None = None
+        self.pending: list[bytes] = []
+        self.finished = False
+        self._in_target = False
+        self._header_field = b""
+        self._header_value = b""
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self) -> None:
+        self.headers = {}
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self.headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self.headers.get(b"content-disposition", b""))
+        if (
+            self.found is None
+            and options.get(b"name", b"").decode("latin-1") == self.field_name
+            and b"filename" in options
+        ):
+            self.found = {**self.headers, b"filename": options[b"filename"]}
+            self._in_target = True
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_target:
+            self.pending.append(data[start:end])
+
+    def on_part_end(self) -> None:
+        if self._in_target:
+            self._in_target = False
+            self.finished = True
+
+
+async def stream_file_field(request: Request, field_name: str = "file") -> StreamedFile:
+    """Read a multipart body up to the headers of one file field.
+
+    Unlike ``UploadFile``, nothing is spooled: the returned ``chunks``
+    iterator pulls the rest of the request body as it is consumed, so a slow
+    consumer holds back the client.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Expected multipart/form-data")
+
+    collector = _FileFieldCollector(field_name)
+    parser = python_multipart.MultipartParser(boundary, collector.callbacks())
+    body = request.stream().__aiter__()
+
+    def feed(chunk: bytes) -> None:
+        try:
+            parser.write(chunk)
+        except MultipartParseError as e:
+            raise HTTPException(status_code=400, detail=f"Malformed multipart body: {e}")
+
+    async for chunk in body:
+        feed(chunk)
+        if collector.found is not None:
+            break
+    else:
+        raise HTTPException(status_code=400, detail=f"Missing file field '{field_name}'")
+
+    async def chunks() -> AsyncIterator[bytes]:
+        while True:
+            if collector.pending:
+                data = b"".join(collector.pending)
+                collector.pending.clear()
+                yield data
+            if collector.finished:
+                return
+            try:
+                chunk = await anext(body)
+            except StopAsyncIteration:
+                raise HTTPException(status_code=400, detail="Upload ended before the file was complete")
+            feed(chunk)
+
+    headers = collector.found
+    return StreamedFile(
+        filename=headers[b"filename"].decode("utf-8", errors="replace") or None,
+        content_type=headers[b"content-type"].decode("latin-1") if b"content-type" in headers else None,
+        chunks=chunks(),
+    )
@@ -1,8 +1,9 @@
 from fastapi import APIRouter
 
-from app.api.routes import tasks, test
+from app.api.routes import media, tasks, test
 
 api_router = APIRouter(prefix="/api")
 
 api_router.include_router(tasks.router)
 api_router.include_router(test.router)
+api_router.include_router(media.router)
@@ -0,0 +1,33 @@
+import re
+from pathlib import PurePosixPath
+
+from fastapi import APIRouter, HTTPException
+
+from app.api.media import MediaFileResponse
+from app.core.config import get_directories
+from app.services.thumbnails import sprite_path
+
+router = APIRouter(tags=["media"])
+
+
+@router.api_route("/media/{file_path:path}", methods=["GET", "HEAD"])
+def get_media(file_path: str):
+    parts = PurePosixPath(file_path).parts
+    # Dot-prefixed entries are internal (segments, render cache, lock files).
+    if not parts or any(part in ("..", "/") or part.startswith(".") for part in parts):
+        raise HTTPException(status_code=404, detail="Not found")
+
+    return MediaFileResponse(get_directories().media.joinpath(*parts))
+
+
+@router.api_route("/thumbnails/{digest}.jpg", methods=["GET", "HEAD"])
+def get_thumbnail_sprite(digest: str):
+    if not re.fullmatch(r"[0-9a-f]{64}", digest):
+        raise HTTPException(status_code=404, detail="Not found")
+
+    # Addressed by the clip's content hash, so the bytes never change.
+    return MediaFileResponse(
+        sprite_path(digest),
+        media_type="image/jpeg",
+        cache_control="public, max-age=31536000, immutable",
+    )
@@ -0,0 +1,45 @@
+import logging
+
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+
+from app.db import SessionLocal
+from app.repositories.task_repository import TaskRepository
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["metrics"])
+
+
+def _tasks_gauge() -> GaugeMetricFamily:
+    return GaugeMetricFamily("tasks", "Tasks per state.", labels=["state"])
+
+
+class TaskStateCollector:
+    """Number of tasks in each state, counted when scraped."""
+
+    def describe(self):
+        # Registering calls collect() unless this is defined; no DB at import.
+        yield _tasks_gauge()
+
+    def collect(self):
+        try:
+            with SessionLocal() as db:
+                counts = TaskRepository(db).count_by_state()
+        except Exception:
+            logger.warning("Failed to count tasks for metrics", exc_info=True)
+            return
+
+        gauge = _tasks_gauge()
+        for state, count in counts.items():
+            gauge.add_metric([state.value], count)
+        yield gauge
+
+
+REGISTRY.register(TaskStateCollector())
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
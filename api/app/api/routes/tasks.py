@@ -1,24 +1,40 @@
+import asyncio
+import json
+import re
 from pathlib import Path
 
 from typing import Annotated
-from fastapi import UploadFile, File, HTTPException, APIRouter, BackgroundTasks, Depends
-from app.db import get_db
-from app.repositories.task_repository import TaskRepository
-from app.core.config import get_directories
-from app.services.slurm import stage_audio, run_and_poll_task, poll_video_segments, poll_and_store_videos, compose_videos_on_timeline, run_and_poll_scene_task
-from app.models import TaskState
+from fastapi import HTTPException, APIRouter, Depends, Header, Query, Request, Response
+from app.db import SessionLocal, get_db
+from app.repositories.task_repository import TaskRepository, decode_cursor, encode_cursor, event_payload
+from app.services.task_events import get_task_event_broker
+from app.repositories.job_repository import JobRepository
+from app.core.config import ENCODER_PROFILES, get_directories, get_worker_config
+from app.models import JobState, TaskState
 from sqlalchemy import select
 from sqlalchemy.orm import selectinload
-from app.schemas.track import TrackRead
-from app.schemas.task import GenerateVideosRequest, RegenerateVideoRequest, CutMarkersUpdateRequest, CutMarkersResponse, TaskResponse, TaskSchema, EditProjectRequest
+from app.schemas.track import ClipThumbnails, TrackRead
+from app.services.thumbnails import read_thumbnail_index
+from app.services import waveform
+from app.api.media import file_etag
+from app.schemas.render import RenderRead
+from app.repositories.render_repository import RenderRepository
+from app.services.slurm import PREVIEW_PROFILE, RENDER_OUTPUTS
+from app.schemas.task import GenerateVideosRequest, RegenerateVideoRequest, CutMarkersUpdateRequest, CutMarkersResponse, SuggestedCutMarkersResponse, TaskResponse, TaskSchema, EditProjectRequest
 import subprocess
-from fastapi.responses import FileResponse
+from fastapi.responses import StreamingResponse
+from app.services.compositor import read_render_record
+from app.api.media import MediaFileResponse
+from app.api.multipart import stream_file_field
+from app.services.audio_upload import store_upload
 
 from app.models import Track, Clip
 
 
 router = APIRouter(tags=["tasks"])
 
+AUDIO_EXT_PATTERN = re.compile(r"\.[A-Za-z0-9]{1,8}")
+
 
 @router.get("/tasks/{task_id}")
 async def get_task(task_id: int, db=Depends(get_db)):
@@ -29,14 +45,55 @@ async def get_task(task_id: int, db=Depends(get_db)):
     return task
 
 
-@router.get("/tasks")
-async def get_tasks(db=Depends(get_db)):
+@router.get("/tasks", response_model=list[TaskSchema])
+async def get_tasks(
+    response: Response,
+    limit: Annotated[int, Query(ge=1, le=500)] = 100,
+    cursor: str | None = None,
+    state: Annotated[list[TaskState] | None, Query()] = None,
+    db=Depends(get_db),
+):
     repo = TaskRepository(db)
-    return repo.list()
-
 
-@router.post("/upload-audio", response_model=TaskResponse)
-async def upload_audio(background_tasks: BackgroundTasks, file: Annotated[UploadFile, File()], db=Depends(get_db)):
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    rows, next_cursor = repo.list_page(limit=limit, after=after, states=state)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = encode_cursor(*next_cursor)
+
+    return [TaskSchema.model_validate(row) for row in rows]
+
+
+@router.post(
+    "/upload-audio",
+    response_model=TaskResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {"file": {"type": "string", "format": "binary"}},
+                        "required": ["file"],
+                    }
+                }
+            },
+        }
+    },
+)
+async def upload_audio(
+    request: Request,
+    content_sha256: Annotated[str | None, Header(alias="X-Content-Sha256", pattern="^[0-9a-f]{64}$")] = None,
+    db=Depends(get_db),
+):
+    # The body is parsed as it arrives rather than spooled by UploadFile, so
+    # it can be written to the HPC while the client is still sending it.
+    # Clients that send the file's hash skip the transfer for known audio.
+    file = await stream_file_field(request, "file")
     if not file.content_type or not file.content_type.startswith("audio/"):
         raise HTTPException(
             status_code=400, detail=f"Expected audio/*, got {file.content_type}")
@@ -45,38 +102,66 @@ async def upload_audio(background_tasks: BackgroundTasks, file: Annotated[Upload
 
     original_name = Path(file.filename).stem if file.filename else "Untitled"
     ext = Path(file.filename).suffix if file.filename else ""
+    # The extension ends up in remote paths, shell commands and job scripts.
+    if not AUDIO_EXT_PATTERN.fullmatch(ext):
+        raise HTTPException(
+            status_code=400, detail=f"Unsupported file extension {ext!r}")
 
     repo = TaskRepository(db)
     task = repo.create(name=original_name)
-    task_id = str(task.id)
-    local_path = directories.media / f"{task_id}{ext}"
-
-    task.name = original_name
+    repo.update_state(
+        task.id,
+        state=TaskState.staging,
+        message="Uploading audio to HPC",
+        progress=20,
+    )
+    db.commit()
+    local_path = directories.media / f"{task.id}{ext}"
 
     try:
-        with local_path.open("wb") as out:
-            print("Saving file to:", local_path)
-            while True:
-                chunk = await file.read(1024 * 1024)  # 1MB
-                if not chunk:
-                    break
-                out.write(chunk)
-        db.commit()
-
-        background_tasks.add_task(
-            stage_audio,
-            task_id=task_id,
-            local_path=str(local_path),
-            ext=ext,
+        staged = await store_upload(db, task, file.chunks, ext, content_sha256)
+        if staged:
+            repo.update_state(
+                task.id,
+                state=TaskState.ready,
+                message="Uploaded Audio",
+                progress=100,
+            )
+        else:
+            JobRepository(db).enqueue(
+                "stage_audio",
+                {"task_id": task.id, "local_path": str(local_path), "ext": ext,
+                 "sha256": task.audio_sha256},
+                task_id=task.id,
+            )
+        JobRepository(db).enqueue(
+            "extract_waveform",
+            {"task_id": task.id, "local_path": str(local_path)},
+            task_id=task.id,
+        )
+        JobRepository(db).enqueue(
+            "analyze_beats",
+            {"task_id": task.id, "local_path": str(local_path)},
+            task_id=task.id,
         )
+        db.commit()
 
     except Exception as e:
         db.rollback()
+        repo.update_state(
+            task.id,
+            state=TaskState.failed,
+            message="Upload failed",
+            progress=100,
+            error=str(e),
+        )
+        db.commit()
+        if isinstance(e, HTTPException):
+            raise
         raise HTTPException(
             status_code=500, detail=f"Failed to save file: {str(e)}")
-    finally:
-        await file.close()
 
+    db.refresh(task)
     return task
 
 
@@ -89,8 +174,69 @@ async def get_status(task_id: int, db=Depends(get_db)):
     return task
 
 
+def _sse(event: dict) -> str:
+    return f"id: {event['id']}\nevent: task\ndata: {json.dumps(event)}\n\n"
+
+
+def _task_events_after(task_id: int, after_event_id: int | None) -> list[dict]:
+    with SessionLocal() as db:
+        return [event_payload(e) for e in TaskRepository(db).events_after(task_id, after_event_id)]
+
+
+@router.get("/tasks/{task_id}/events")
+async def stream_task_events(
+    task_id: int,
+    request: Request,
+    last_event_id: Annotated[int | None, Header()] = None,
+    after: int | None = None,
+):
+    """Server-sent stream of state/progress/message changes of a task.
+
+    Reconnecting clients resume after the ``Last-Event-ID`` they saw (or
+    ``?after=``); new clients first get the latest known state.
+    """
+    with SessionLocal() as db:
+        if not TaskRepository(db).get(task_id):
+            raise HTTPException(status_code=404, detail="Not found")
+
+    resume_from = last_event_id if last_event_id is not None else after
+
+    async def event_stream():
+        last_id = resume_from
+        async with get_task_event_broker().subscribe(task_id) as queue:
+            yield "retry: 3000\n\n"
+            for event in _task_events_after(task_id, last_id):
+                yield _sse(event)
+                last_id = event["id"]
+
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    # Catch up on anything missed while the listener was
+                    # reconnecting, otherwise just keep the connection alive.
+                    missed = _task_events_after(task_id, last_id) if last_id is not None else []
+                    for event in missed:
+                        yield _sse(event)
+                        last_id = event["id"]
+                    if not missed:
+                        yield ": keep-alive\n\n"
+                    continue
+
+                if last_id is not None and event["id"] <= last_id:
+                    continue
+                yield _sse(event)
+                last_id = event["id"]
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/run/{task_id}")
-async def run_task(task_id: str, body: GenerateVideosRequest, background_tasks: BackgroundTasks, db=Depends(get_db)):
+async def run_task(task_id: int, body: GenerateVideosRequest, db=Depends(get_db)):
     repo = TaskRepository(db)
     task = repo.get(task_id)
 
@@ -100,14 +246,21 @@ async def run_task(task_id: str, body: GenerateVideosRequest, background_tasks:
         raise HTTPException(
             status_code=400, detail=f"Task not ready to run (current state: {task.state})")
 
-    background_tasks.add_task(
-        run_and_poll_task, task_id=task_id, additional_prompt=body.additional_prompt, task=task)
+    # Resubmitting would start a second GPU job, so submitting is not
+    # retried; waiting for the job is queued separately and is.
+    JobRepository(db).enqueue(
+        "run_task",
+        {"task_id": task_id, "additional_prompt": body.additional_prompt},
+        task_id=task_id,
+        max_attempts=1,
+    )
+    db.commit()
 
     return {"ok": True, "task_id": task_id}
 
 
 @router.post("/tasks/{task_id}/poll-segments")
-async def start_polling(task_id: int, background_tasks: BackgroundTasks, db=Depends(get_db)):
+async def start_polling(task_id: int, db=Depends(get_db)):
     repo = TaskRepository(db)
     task = repo.get(task_id)
 
@@ -128,7 +281,9 @@ async def start_polling(task_id: int, background_tasks: BackgroundTasks, db=Depe
     if not task:
         raise HTTPException(status_code=404, detail="Not found")
 
-    background_tasks.add_task(poll_video_segments, task_id=task_id)
+    JobRepository(db).enqueue(
+        "poll_segments", {"task_id": task_id}, task_id=task_id)
+    db.commit()
 
     return {"ok": True, "task_id": task_id}
 
@@ -151,8 +306,35 @@ async def get_tracks(task_id: int, db=Depends(get_db)):
     return tracks
 
 
+@router.get("/tasks/{task_id}/tracks/thumbnails", response_model=list[ClipThumbnails])
+def get_track_thumbnails(task_id: int, db=Depends(get_db)):
+    """Sprite sheet indexes for the task's clips that have one."""
+    if not TaskRepository(db).get(task_id):
+        raise HTTPException(status_code=404, detail="Not found")
+
+    clips = db.scalars(
+        select(Clip)
+        .join(Track)
+        .where(Track.task_id == task_id, Clip.thumbnail_digest.is_not(None))
+        .order_by(Clip.clip_index)
+    ).all()
+
+    thumbnails = []
+    for clip in clips:
+        index = read_thumbnail_index(clip.thumbnail_digest)
+        if index is None:
+            continue
+        thumbnails.append(ClipThumbnails(
+            clip_id=clip.id,
+            clip_index=clip.clip_index,
+            sprite_url=f"/api/thumbnails/{index['digest']}.jpg",
+            **{k: v for k, v in index.items() if k != "digest"},
+        ))
+    return thumbnails
+
+
 @router.post("/tasks/{task_id}/poll-videos")
-async def poll_videos(task_id: int, background_tasks: BackgroundTasks, db=Depends(get_db)):
+async def poll_videos(task_id: int, db=Depends(get_db)):
     repo = TaskRepository(db)
     task = repo.get(task_id)
 
@@ -162,34 +344,42 @@ async def poll_videos(task_id: int, background_tasks: BackgroundTasks, db=Depend
         raise HTTPException(
             status_code=400, detail=f"Task not ready to poll videos (current state: {task.state})")
 
-    background_tasks.add_task(poll_and_store_videos, task_id=task_id, job_id=task.job_id)
+    JobRepository(db).enqueue(
+        "poll_videos", {"task_id": task_id, "job_id": task.job_id}, task_id=task_id)
+    db.commit()
 
     return {"ok": True, "task_id": task_id}
 
 
+def _check_profile(profile: str | None) -> None:
+    # The preview profile is only for the preview render, not the final video.
+    allowed = [name for name in ENCODER_PROFILES if name != PREVIEW_PROFILE]
+    if profile is not None and profile not in allowed:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown profile {profile!r}, expected one of: {', '.join(allowed)}",
+        )
+
+
 @router.post("/tasks/{task_id}/concat")
-def concat_videos(task_id: int, background_tasks: BackgroundTasks, db=Depends(get_db)):
+def concat_videos(task_id: int, profile: str | None = None, db=Depends(get_db)):
+    _check_profile(profile)
     repo = TaskRepository(db)
     task = repo.get(task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Not found")
 
-    stmt = (
-        select(Clip)
-        .join(Clip.track)
-        .where(Track.task_id == task_id)
-        .order_by(Clip.clip_index)
-    )
-
-    clips = db.scalars(stmt).all()
-    output_path = get_directories().media / str(task_id) / "final_video.mp4"
-
-    audio_path = get_directories().media / f"{task_id}.mp3"
-
-    background_tasks.add_task(compose_videos_on_timeline, clips,
-                              audio_path=audio_path, output_path=output_path, task_id=task_id)
+    jobs = JobRepository(db)
+    # A queued render reads the clips when it starts, so one is enough; a
+    # running one may predate the latest edits.
+    pending = [job for job in jobs.list_active("compose", task_id)
+               if job.state == JobState.queued and job.payload.get("profile") == profile]
+    if not pending:
+        jobs.enqueue(
+            "compose", {"task_id": task_id, "profile": profile}, task_id=task_id, max_attempts=2)
+        db.commit()
 
-    return {}
+    return {"profile": profile, "queued": not pending}
 
 
 @router.delete("/tasks/{task_id}")
@@ -205,7 +395,7 @@ def delete_task(task_id: int, db=Depends(get_db)):
 
 
 @router.post("/clips/{clip_id}/regenerate")
-def regenerate_clip(clip_id: int, body: RegenerateVideoRequest, background_tasks: BackgroundTasks, db=Depends(get_db)):
+def regenerate_clip(clip_id: int, body: RegenerateVideoRequest, db=Depends(get_db)):
     stmt = select(Clip).where(Clip.id == clip_id)
     clip = db.scalars(stmt).first()
     if not clip:
@@ -214,18 +404,111 @@ def regenerate_clip(clip_id: int, body: RegenerateVideoRequest, background_tasks
     clip.aesthetics = body.aesthetics
     clip.camera_movement = body.cameraMovement
     clip.script_description = body.scriptDescription
-    db.commit()
-    db.refresh(clip)
+    # Supersedes any regeneration of this clip that is queued or running.
+    clip.generation = Clip.generation + 1
+    db.flush()
 
     prompt = f"{clip.script_description}. {
         clip.aesthetics}. {clip.camera_movement}."
 
-    background_tasks.add_task(run_and_poll_scene_task, task_id=clip.track.task_id, clip_id=clip_id,
-                              scene_number=clip.clip_index + 1, prompt=prompt, duration_seconds=clip.duration_seconds)
+    task_id = clip.track.task_id
+    JobRepository(db).enqueue(
+        "regenerate_scene",
+        {
+            "task_id": task_id,
+            "clip_id": clip_id,
+            "scene_number": clip.clip_index + 1,
+            "prompt": prompt,
+            "duration_seconds": clip.duration_seconds,
+            "generation": clip.generation,
+        },
+        task_id=task_id,
+        max_attempts=1,
+        # Regenerations requested within the window are submitted together
+        # as one Slurm job array.
+        delay_seconds=get_worker_config().scene_batch_window,
+    )
+    db.commit()
 
     return {"ok": True}
 
 
+def _waveform_levels(task_id: int) -> tuple[Path, list[waveform.PeakLevel]]:
+    path = waveform.peaks_path(task_id)
+    try:
+        return path, waveform.read_levels(path)
+    except (OSError, ValueError):
+        raise HTTPException(status_code=404, detail="Waveform not available")
+
+
+@router.get("/tasks/{task_id}/waveform")
+def get_waveform_levels(task_id: int):
+    """Zoom levels of the task's waveform peaks."""
+    path, levels = _waveform_levels(task_id)
+    return {
+        "sample_rate": waveform.SAMPLE_RATE,
+        "levels": [
+            {
+                "level": level.level,
+                "samples_per_peak": level.samples_per_peak,
+                "seconds_per_peak": level.seconds_per_peak,
+                "count": level.count,
+            }
+            for level in levels
+        ],
+    }
+
+
+@router.get("/tasks/{task_id}/waveform/peaks")
+def get_waveform_peaks(
+    task_id: int,
+    start: Annotated[float, Query(ge=0)] = 0.0,
+    end: Annotated[float | None, Query(ge=0)] = None,
+    level: Annotated[int | None, Query(ge=0)] = None,
+    pixels: Annotated[int | None, Query(ge=1, le=100_000)] = None,
+    if_none_match: Annotated[str | None, Header()] = None,
+):
+    """Peaks between ``start`` and ``end`` seconds as int8 (min, max) pairs.
+
+    Pass ``level`` directly, or ``pixels`` to get the coarsest level that
+    still has a peak per pixel for the window.
+    """
+    path, levels = _waveform_levels(task_id)
+    if end is None:
+        end = levels[0].count * levels[0].seconds_per_peak
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+
+    if level is None:
+        chosen = levels[0]
+        if pixels:
+            for candidate in levels:
+                if (end - start) / candidate.seconds_per_peak >= pixels:
+                    chosen = candidate
+    elif level < len(levels):
+        chosen = levels[level]
+    else:
+        raise HTTPException(status_code=400, detail=f"level must be below {len(levels)}")
+
+    first = int(start // chosen.seconds_per_peak)
+    last = -int(-end // chosen.seconds_per_peak)
+    data = waveform.read_peaks(path, chosen, first, last)
+
+    etag = file_etag(path.stat())[:-1] + f"-{chosen.level}-{first}-{last}\""
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "no-cache",
+        "X-Waveform-Level": str(chosen.level),
+        "X-Samples-Per-Peak": str(chosen.samples_per_peak),
+        "X-Sample-Rate": str(waveform.SAMPLE_RATE),
+        "X-Peak-Start": str(first),
+        "X-Peak-Count": str(len(data) // waveform.PEAK_BYTES),
+    }
+    if if_none_match == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=data, media_type="application/octet-stream", headers=headers)
+
+
 @router.get("/tasks/{task_id}/cut-markers", response_model=CutMarkersResponse)
 async def get_cut_markers(task_id: int, db=Depends(get_db)):
     repo = TaskRepository(db)
@@ -258,6 +541,41 @@ async def save_cut_markers(task_id: int, body: CutMarkersUpdateRequest, db=Depen
     )
 
 
+@router.get("/tasks/{task_id}/cut-markers/suggested", response_model=SuggestedCutMarkersResponse)
+async def get_suggested_cut_markers(task_id: int, db=Depends(get_db)):
+    repo = TaskRepository(db)
+    task = repo.get(task_id)
+
+    if not task:
+        raise HTTPException(status_code=404, detail="Not found")
+
+    return SuggestedCutMarkersResponse(
+        task_id=task.id,
+        tempo_bpm=task.tempo_bpm,
+        suggested_cut_markers=task.suggested_cut_markers,
+    )
+
+
+@router.post("/tasks/{task_id}/cut-markers/accept-suggested", response_model=CutMarkersResponse)
+async def accept_suggested_cut_markers(task_id: int, db=Depends(get_db)):
+    repo = TaskRepository(db)
+    task = repo.get(task_id)
+
+    if not task:
+        raise HTTPException(status_code=404, detail="Not found")
+    if task.suggested_cut_markers is None:
+        raise HTTPException(status_code=409, detail="Beat analysis has not finished yet")
+
+    task.cut_markers = list(task.suggested_cut_markers)
+    db.commit()
+    db.refresh(task)
+
+    return CutMarkersResponse(
+        task_id=task.id,
+        cut_markers=task.cut_markers,
+    )
+
+
 @router.put("/tasks/{task_id}")
 async def update_task_name(task_id: int, body: EditProjectRequest, db=Depends(get_db)):
     repo = TaskRepository(db)
@@ -273,15 +591,50 @@ async def update_task_name(task_id: int, body: EditProjectRequest, db=Depends(ge
     return {}
 
 
+@router.get("/tasks/{task_id}/renders", response_model=list[RenderRead])
+def get_renders(task_id: int, db=Depends(get_db)):
+    """Preview and final renders of the task, so the UI can show the
+    preview until the final video is ready."""
+    if not TaskRepository(db).get(task_id):
+        raise HTTPException(status_code=404, detail="Not found")
+
+    renders = []
+    for render in RenderRepository(db).list_for_task(task_id):
+        item = RenderRead.model_validate(render)
+        if render.rendered_at is not None and render.kind in RENDER_OUTPUTS:
+            # The version parameter makes players reload a re-rendered file.
+            item.url = (
+                f"/api/media/{task_id}/{RENDER_OUTPUTS[render.kind]}"
+                f"?v={int(render.rendered_at.timestamp())}"
+            )
+        renders.append(item)
+    return renders
+
+
 @router.get("/tasks/{task_id}/export")
-def export_video(task_id: int, db=Depends(get_db)):
+def export_video(task_id: int, profile: str | None = None):
+    _check_profile(profile)
     video_path = get_directories().media / str(task_id) / "final_video.mp4"
 
     if not video_path.exists():
         raise HTTPException(status_code=404, detail="Video not found")
 
-    return FileResponse(
-        path=video_path,
+    record = read_render_record(str(video_path)) or {}
+    if profile is not None and record.get("profile") != profile:
+        # Rendering is requested with POST /concat, never from a download.
+        raise HTTPException(
+            status_code=409,
+            detail=f"Video was not rendered with profile {profile!r}; "
+                   f"render it with POST /api/tasks/{task_id}/concat?profile={profile}",
+        )
+
+    headers = {}
+    if record.get("profile"):
+        headers["X-Encoder-Profile"] = record["profile"]
+
+    return MediaFileResponse(
+        video_path,
         media_type="video/mp4",
         filename=f"task-{task_id}-final_video.mp4",
+        headers=headers,
     )
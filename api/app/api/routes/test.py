@@ -4,7 +4,9 @@ from sqlalchemy import text
 
 from app.db import get_db
 from app.core.config import get_hpc_config
-from app.services.hpc_client import HpcClient
+from app.services.hpc_client import open_hpc_client
+from app.services.hpc_pool import hpc_pool_stats
+from app.services.render_pool import get_render_cache
 
 router = APIRouter(tags=["test"])
 
@@ -15,13 +17,23 @@ def db_health(db: Session = Depends(get_db)):
     return {"ok": True}
 
 
+@router.get("/health/hpc-pool")
+def hpc_pool_health():
+    return {"pool": hpc_pool_stats()}
+
+
+@router.get("/health/render-cache")
+def render_cache_health():
+    cache = get_render_cache()
+    return {"cache": cache.stats() if cache else None}
+
+
 @router.post("/test-ssh")
 async def test_ssh():
     settings = get_hpc_config()
-    client = HpcClient(settings)
-
     try:
-        result = await client.run_command("ls")
+        async with open_hpc_client(settings) as client:
+            result = await client.run("ls")
         return {"output": result}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"SSH connection failed: {e}")
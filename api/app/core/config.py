@@ -1,7 +1,8 @@
+import json
 import os
 from pathlib import Path
 from dotenv import load_dotenv
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 
 
 @dataclass(frozen=True)
@@ -10,6 +11,16 @@ class Settings:
     hpc_user: str
     known_hosts: str | None
     hpc_ssh_key: str
+    pool_size: int = 4
+    max_channels_per_connection: int = 8
+    health_check_interval: float = 60.0
+    slurm_poll_interval: float = 15.0
+    download_concurrency: int = 4
+    upload_buffer_chunks: int = 16
+    # "ssh" for the cluster, "local" for the in-process simulator.
+    backend: str = "ssh"
+    # Overrides the (long) waits between checks for job output files.
+    file_poll_interval: float | None = None
 
 
 @dataclass(frozen=True)
@@ -18,21 +29,146 @@ class Directories:
     hpc_base: Path
 
 
+@dataclass(frozen=True)
+class RenderSettings:
+    workers: int
+    host_concurrency: int
+    slots_dir: Path
+    cache_dir: Path
+    cache_max_bytes: int
+
+
+@dataclass(frozen=True)
+class EncoderProfile:
+    name: str
+    preset: str
+    crf: int
+    pixel_format: str
+    audio_bitrate: str
+    max_height: int | None = None
+    threads: int | None = None
+
+    def output_settings(self) -> dict:
+        """Settings that change the encoded bytes (thread count does not)."""
+        return {
+            "video_codec": "libx264",
+            "audio_codec": "aac",
+            "preset": self.preset,
+            "crf": self.crf,
+            "pixel_format": self.pixel_format,
+            "audio_bitrate": self.audio_bitrate,
+            "max_height": self.max_height,
+        }
+
+
+ENCODER_PROFILES: dict[str, EncoderProfile] = {
+    "preview": EncoderProfile(
+        name="preview", preset="ultrafast", crf=32,
+        pixel_format="yuv420p", audio_bitrate="64k", max_height=360),
+    "draft": EncoderProfile(
+        name="draft", preset="ultrafast", crf=28,
+        pixel_format="yuv420p", audio_bitrate="96k"),
+    "standard": EncoderProfile(
+        name="standard", preset="veryfast", crf=23,
+        pixel_format="yuv420p", audio_bitrate="160k"),
+    "archive": EncoderProfile(
+        name="archive", preset="slow", crf=18,
+        pixel_format="yuv420p", audio_bitrate="256k"),
+}
+
+
+@dataclass(frozen=True)
+class WorkerSettings:
+    concurrency: int
+    lease_seconds: float
+    poll_interval: float
+    scene_batch_window: float
+    # Port of the worker's Prometheus endpoint; 0 disables it.
+    metrics_port: int
+
+
+@dataclass(frozen=True)
+class PartitionLimits:
+    name: str
+    max_cpus: int
+    max_mem_mb: int
+    max_time_seconds: int
+
+
+@dataclass(frozen=True)
+class SlurmSettings:
+    full_partition: PartitionLimits
+    scene_partition: PartitionLimits
+    # Recent sacct records per job kind used to size new jobs.
+    history_size: int
+    min_history: int
+
+
+@dataclass(frozen=True)
+class HpcSimSettings:
+    # Time a job waits in PENDING before it starts.
+    queue_seconds: float
+    # Time each generated scene takes on top of encoding it.
+    seconds_per_scene: float
+    # Chance that a job ends in FAILED instead of producing output.
+    fail_rate: float
+    video_size: str
+
+
+# What every job used to request; still the ceiling until overridden.
+DEFAULT_PARTITIONS = {
+    "dgx1": {"cpus": 8, "mem_mb": 48 * 1024, "time_hours": 12},
+}
+
+
+HPC_BACKENDS = ("ssh", "local")
+
+
 def get_hpc_config() -> Settings:
     load_dotenv()
 
-    hpc_host = os.getenv("HPC_HOST")
-    hpc_user = os.getenv("HPC_USER")
-    hpc_ssh_key = os.getenv("HPC_SSH_KEY")
+    backend = os.getenv("HPC_BACKEND", "ssh")
+    if backend not in HPC_BACKENDS:
+        raise ValueError(
+            f"Unknown HPC_BACKEND {backend!r}, expected one of {', '.join(HPC_BACKENDS)}")
+    local = backend == "local"
+
+    # The simulator never opens an SSH connection.
+    hpc_host = os.getenv("HPC_HOST", "localhost" if local else "")
+    hpc_user = os.getenv("HPC_USER", "local" if local else "")
+    hpc_ssh_key = os.getenv("HPC_SSH_KEY", "")
 
-    if not hpc_host or not hpc_user or not hpc_ssh_key:
+    if not hpc_host or not hpc_user or (not hpc_ssh_key and not local):
         raise RuntimeError("Missing some variable")
 
+    file_poll_interval = os.getenv("HPC_FILE_POLL_INTERVAL", "1" if local else None)
+
     return Settings(
         hpc_host=hpc_host,
         hpc_user=hpc_user,
         known_hosts=None,
         hpc_ssh_key=hpc_ssh_key,
+        pool_size=int(os.getenv("HPC_POOL_SIZE", "4")),
+        max_channels_per_connection=int(os.getenv("HPC_MAX_CHANNELS", "8")),
+        health_check_interval=float(
+            os.getenv("HPC_HEALTH_CHECK_INTERVAL", "60")),
+        slurm_poll_interval=float(os.getenv("SLURM_POLL_INTERVAL", "1" if local else "15")),
+        download_concurrency=int(os.getenv("HPC_DOWNLOAD_CONCURRENCY", "4")),
+        upload_buffer_chunks=int(os.getenv("HPC_UPLOAD_BUFFER_MB", "16")),
+        backend=backend,
+        file_poll_interval=float(file_poll_interval) if file_poll_interval else None,
+    )
+
+
+def get_hpc_sim_config() -> HpcSimSettings:
+    """Knobs for the ``HPC_BACKEND=local`` Slurm simulator."""
+    load_dotenv()
+
+    return HpcSimSettings(
+        queue_seconds=float(os.getenv("HPC_SIM_QUEUE_SECONDS", "2")),
+        seconds_per_scene=float(os.getenv("HPC_SIM_SECONDS_PER_SCENE", "0.5")),
+        fail_rate=float(os.getenv("HPC_SIM_FAIL_RATE", "0")),
+        video_size=os.getenv("HPC_SIM_VIDEO_SIZE", "640x360"),
     )
 
 
@@ -50,3 +186,84 @@ def get_directories() -> Directories:
         media=media_dir,
         hpc_base=Path(hpc_remote_base),
     )
+
+
+def get_render_config() -> RenderSettings:
+    load_dotenv()
+
+    workers = int(os.getenv("RENDER_WORKERS", "2"))
+    host_concurrency = int(os.getenv("RENDER_HOST_CONCURRENCY", str(workers)))
+    cache_max_mb = int(os.getenv("RENDER_CACHE_MAX_MB", "10240"))
+    media_dir = get_directories().media
+
+    return RenderSettings(
+        workers=max(1, workers),
+        host_concurrency=max(1, host_concurrency),
+        slots_dir=media_dir / ".render-slots",
+        cache_dir=media_dir / ".render-cache",
+        cache_max_bytes=max(0, cache_max_mb) * 1024 * 1024,
+    )
+
+
+def get_worker_config() -> WorkerSettings:
+    load_dotenv()
+
+    return WorkerSettings(
+        concurrency=int(os.getenv("WORKER_CONCURRENCY", "8")),
+        lease_seconds=float(os.getenv("WORKER_LEASE_SECONDS", "120")),
+        poll_interval=float(os.getenv("WORKER_POLL_INTERVAL", "2")),
+        scene_batch_window=float(os.getenv("SCENE_BATCH_WINDOW_SECONDS", "20")),
+        metrics_port=int(os.getenv("WORKER_METRICS_PORT", "9100")),
+    )
+
+
+def get_encoder_profile(name: str | None = None) -> EncoderProfile:
+    """Look up an encoder profile, defaulting to ``RENDER_PROFILE``.
+
+    Unless ``RENDER_THREADS`` is set, each render gets an equal share of the
+    CPUs across the renders allowed to run at once on the host.
+    """
+    load_dotenv()
+
+    name = name or os.getenv("RENDER_PROFILE", "standard")
+    if name not in ENCODER_PROFILES:
+        raise ValueError(
+            f"Unknown encoder profile {name!r}, expected one of {', '.join(ENCODER_PROFILES)}")
+
+    threads = os.getenv("RENDER_THREADS")
+    if threads:
+        threads = int(threads)
+    else:
+        host_concurrency = get_render_config().host_concurrency
+        threads = max(1, (os.cpu_count() or 1) // host_concurrency)
+
+    return replace(ENCODER_PROFILES[name], threads=threads)
+
+
+def get_slurm_config() -> SlurmSettings:
+    """Partition limits come from ``SLURM_PARTITIONS``, a JSON object like
+    ``{"dgx1": {"cpus": 8, "mem_mb": 49152, "time_hours": 12}}``."""
+    load_dotenv()
+
+    partitions = DEFAULT_PARTITIONS
+    if raw := os.getenv("SLURM_PARTITIONS"):
+        partitions = json.loads(raw)
+
+    def limits(env: str) -> PartitionLimits:
+        name = os.getenv(env, next(iter(partitions)))
+        if name not in partitions:
+            raise ValueError(f"{env}={name} is not in SLURM_PARTITIONS")
+        spec = partitions[name]
+        return PartitionLimits(
+            name=name,
+            max_cpus=int(spec["cpus"]),
+            max_mem_mb=int(spec["mem_mb"]),
+            max_time_seconds=int(float(spec["time_hours"]) * 3600),
+        )
+
+    return SlurmSettings(
+        full_partition=limits("SLURM_FULL_PARTITION"),
+        scene_partition=limits("SLURM_SCENE_PARTITION"),
+        history_size=int(os.getenv("SLURM_HISTORY_SIZE", "50")),
+        min_history=int(os.getenv("SLURM_MIN_HISTORY", "5")),
+    )
@@ -1,6 +1,11 @@
+from contextlib import asynccontextmanager
+
 from app.api.router import api_router
+from app.api.routes import metrics
+from app.services.hpc_pool import close_hpc_pool
+from app.services.render_pool import shutdown_render_pool
+from app.services.task_events import close_task_event_broker
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -10,7 +15,16 @@ logging.getLogger("asyncio").setLevel(logging.WARNING)
 
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Video Generation API")
-app.include_router(api_router)
 
-app.mount("/api/media", StaticFiles(directory="media"), name="media")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await close_hpc_pool()
+    shutdown_render_pool()
+    await close_task_event_broker()
+
+
+app = FastAPI(title="Video Generation API", lifespan=lifespan)
+app.include_router(api_router)
+# Outside /api, where Prometheus looks by default.
+app.include_router(metrics.router)
@@ -1,7 +1,7 @@
 from datetime import datetime
 from enum import Enum
 
-from sqlalchemy import DateTime, Enum as SqlEnum, Integer, Text, func, ForeignKey, Float, JSON
+from sqlalchemy import BigInteger, DateTime, Enum as SqlEnum, Integer, Text, func, ForeignKey, Float, JSON, Index, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.ext.mutable import MutableList
 
@@ -21,6 +21,10 @@ class TaskState(str, Enum):
 
 class TaskRecord(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        Index("ix_tasks_updated_at_id", "updated_at", "id"),
+        Index("ix_tasks_state_updated_at_id", "state", "updated_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
 
@@ -50,6 +54,13 @@ class TaskRecord(Base):
         cascade="all, delete-orphan",
     )
 
+    # Deleted by the database's ON DELETE CASCADE, without loading them.
+    events: Mapped[list["TaskEvent"]] = relationship(
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        order_by="TaskEvent.id",
+    )
+
     job_id: Mapped[str | None] = mapped_column(Text, nullable=True)
 
     cut_markers: Mapped[list[float]] = mapped_column(
@@ -58,6 +69,13 @@ class TaskRecord(Base):
         default=list,
     )
 
+    # Filled in by beat analysis after upload; accepted into cut_markers on request.
+    suggested_cut_markers: Mapped[list[float] | None] = mapped_column(JSON, nullable=True)
+    tempo_bpm: Mapped[float | None] = mapped_column(Float, nullable=True)
+
+    audio_sha256: Mapped[str | None] = mapped_column(
+        ForeignKey("audio_blobs.sha256"), nullable=True, index=True)
+
     additional_prompt: Mapped[str | None] = mapped_column(Text, nullable=True)
 
     name: Mapped[str] = mapped_column(Text, nullable=False)
@@ -65,6 +83,9 @@ class TaskRecord(Base):
 
 class Track(Base):
     __tablename__ = "tracks"
+    __table_args__ = (
+        UniqueConstraint("task_id", name="uq_tracks_task_id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
 
@@ -81,6 +102,10 @@ class Track(Base):
 
 class Clip(Base):
     __tablename__ = "clips"
+    __table_args__ = (
+        UniqueConstraint("track_id", "clip_index",
+                         name="uq_clips_track_id_clip_index"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
 
@@ -97,4 +122,184 @@ class Clip(Base):
     aesthetics: Mapped[str] = mapped_column(Text, nullable=False)
     camera_movement: Mapped[str] = mapped_column(Text, nullable=False)
 
+    # Bumped by every regeneration request; only the latest one is kept.
+    generation: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0")
+    # "<array id>_<index>" of the Slurm job generating this clip, if any.
+    scene_job_id: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Content hash of the clip's file, naming its thumbnail sprite and index.
+    thumbnail_digest: Mapped[str | None] = mapped_column(Text, nullable=True)
+
     track: Mapped["Track"] = relationship(back_populates="clips")
+
+
+class TaskEvent(Base):
+    __tablename__ = "task_events"
+    __table_args__ = (
+        Index("ix_task_events_task_id_id", "task_id", "id"),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+
+    task_id: Mapped[int] = mapped_column(
+        ForeignKey("tasks.id", ondelete="CASCADE"), nullable=False)
+
+    state: Mapped[TaskState] = mapped_column(
+        SqlEnum(TaskState, name="task_state"),
+        nullable=False,
+    )
+    progress: Mapped[int] = mapped_column(Integer, nullable=False)
+    message: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=False),
+        server_default=func.now(),
+        nullable=False,
+    )
+
+
+class JobState(str, Enum):
+    queued = "queued"
+    running = "running"
+    done = "done"
+    failed = "failed"
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_state_run_after", "state", "run_after"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+
+    kind: Mapped[str] = mapped_column(Text, nullable=False)
+    payload: Mapped[dict] = mapped_column(JSON, nullable=False, default=dict)
+
+    task_id: Mapped[int | None] = mapped_column(
+        ForeignKey("tasks.id", ondelete="CASCADE"), nullable=True, index=True)
+
+    state: Mapped[JobState] = mapped_column(
+        SqlEnum(JobState, name="job_state"),
+        default=JobState.queued,
+        nullable=False,
+    )
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    max_attempts: Mapped[int] = mapped_column(Integer, default=3, nullable=False)
+
+    run_after: Mapped[datetime] = mapped_column(
+        DateTime(timezone=False),
+        server_default=func.now(),
+        nullable=False,
+    )
+    locked_by: Mapped[str | None] = mapped_column(Text, nullable=True)
+    lease_expires_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=False), nullable=True)
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+    # The running job that took this one into its batch, see take_queued.
+    batch_id: Mapped[int | None] = mapped_column(
+        ForeignKey("jobs.id", ondelete="SET NULL"), nullable=True, index=True)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=False),
+        server_default=func.now(),
+        nullable=False,
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=False),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False,
+    )
+
+
+class RenderState(str, Enum):
+    pending = "pending"
+    rendering = "rendering"
+    ready = "ready"
+    failed = "failed"
+
+
+class Render(Base):
+    """Latest state of one of a task's rendered outputs (preview, final)."""
+
+    __tablename__ = "renders"
+    __table_args__ = (
+        UniqueConstraint("task_id", "kind", name="uq_renders_task_id_kind"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+
+    task_id: Mapped[int] = mapped_column(
+        ForeignKey("tasks.id", ondelete="CASCADE"), nullable=False)
+    kind: Mapped[str] = mapped_column(Text, nullable=False)
+
+    state: Mapped[RenderState] = mapped_column(
+        SqlEnum(RenderState, name="render_state"),
+        default=RenderState.pending,
+        nullable=False,
+    )
+    profile: Mapped[str | None] = mapped_column(Text, nullable=True)
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+    rendered_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=False), nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=False),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False,
+    )
+
+
+class AudioBlob(Base):
+    """Uploaded audio stored once by content hash, locally and on the HPC."""
+
+    __tablename__ = "audio_blobs"
+
+    sha256: Mapped[str] = mapped_column(Text, primary_key=True)
+    ext: Mapped[str] = mapped_column(Text, nullable=False)
+    size: Mapped[int] = mapped_column(BigInteger, nullable=False)
+
+    # Set once the blob exists in the remote store; cleared if it goes missing.
+    remote_staged_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=False), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=False),
+        server_default=func.now(),
+        nullable=False,
+    )
+
+
+class SlurmJobStat(Base):
+    """Accounting record of a finished Slurm job, used to size later jobs."""
+
+    __tablename__ = "slurm_job_stats"
+    __table_args__ = (
+        Index("ix_slurm_job_stats_kind_partition_id", "kind", "partition", "id"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    job_id: Mapped[str] = mapped_column(Text, nullable=False, unique=True)
+    kind: Mapped[str] = mapped_column(Text, nullable=False)
+    partition: Mapped[str] = mapped_column(Text, nullable=False)
+    state: Mapped[str] = mapped_column(Text, nullable=False)
+
+    # Workload size the request was derived from.
+    video_seconds: Mapped[float] = mapped_column(Float, nullable=False)
+    clip_count: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    elapsed_seconds: Mapped[float] = mapped_column(Float, nullable=False)
+    total_cpu_seconds: Mapped[float] = mapped_column(Float, nullable=False)
+    max_rss_mb: Mapped[float] = mapped_column(Float, nullable=False)
+
+    requested_time_seconds: Mapped[int] = mapped_column(Integer, nullable=False)
+    requested_cpus: Mapped[int] = mapped_column(Integer, nullable=False)
+    requested_mem_mb: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    recorded_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=False),
+        server_default=func.now(),
+        nullable=False,
+    )
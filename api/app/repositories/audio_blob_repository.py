@@ -0,0 +1,33 @@
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import AudioBlob
+
+
+class AudioBlobRepository:
+    def __init__(self, db: Session) -> None:
+        self.db = db
+
+    def get(self, sha256: str) -> AudioBlob | None:
+        return self.db.get(AudioBlob, sha256)
+
+    def get_or_create(self, sha256: str, ext: str, size: int) -> AudioBlob:
+        blob = self.get(sha256)
+        if blob is not None:
+            return blob
+
+        try:
+            # A concurrent upload of the same file may insert it first.
+            with self.db.begin_nested():
+                blob = AudioBlob(sha256=sha256, ext=ext, size=size)
+                self.db.add(blob)
+        except IntegrityError:
+            blob = self.get(sha256)
+        return blob
+
+    def set_remote_staged(self, sha256: str, staged: bool) -> None:
+        blob = self.get(sha256)
+        if blob is not None:
+            blob.remote_staged_at = func.now() if staged else None
+            self.db.flush()
@@ -0,0 +1,218 @@
+from contextvars import ContextVar
+from datetime import timedelta
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import Session, aliased
+
+from app.models import Job, JobState
+
+# Kinds that run one at a time per task, in the order they were queued.
+SERIAL_KINDS = ("compose",)
+
+# ID of the job the running handler was started for; set by the worker.
+current_job_id: ContextVar[int | None] = ContextVar("current_job_id", default=None)
+
+
+class JobRepository:
+    def __init__(self, db: Session) -> None:
+        self.db = db
+
+    def enqueue(
+        self,
+        kind: str,
+        payload: dict,
+        *,
+        task_id: int | None = None,
+        max_attempts: int = 3,
+        delay_seconds: float = 0,
+    ) -> Job:
+        job = Job(
+            kind=kind,
+            payload=payload,
+            task_id=task_id,
+            max_attempts=max_attempts,
+            state=JobState.queued,
+            run_after=func.now() + timedelta(seconds=delay_seconds),
+        )
+        self.db.add(job)
+        self.db.flush()
+        return job
+
+    def get(self, id: int) -> Job | None:
+        return self.db.get(Job, id)
+
+    def list_active(self, kind: str, task_id: int) -> list[Job]:
+        """Queued and running jobs of ``kind`` for a task, oldest first."""
+        stmt = (
+            select(Job)
+            .where(
+                Job.kind == kind,
+                Job.task_id == task_id,
+                Job.state.in_((JobState.queued, JobState.running)),
+            )
+            .order_by(Job.id)
+        )
+        return list(self.db.scalars(stmt))
+
+    def claim(self, worker_id: str, lease_seconds: float) -> Job | None:
+        """Lock and lease the next runnable job.
+
+        Runnable means queued and due, or running with an expired lease (its
+        worker died). ``SKIP LOCKED`` lets any number of workers claim
+        concurrently without blocking on each other. A job of a
+        ``SERIAL_KINDS`` kind waits while an older one for the same task is
+        still queued or running.
+        """
+        now = func.now()
+        earlier = aliased(Job)
+        blocked = (
+            select(earlier.id)
+            .where(
+                earlier.kind == Job.kind,
+                earlier.task_id == Job.task_id,
+                earlier.id < Job.id,
+                earlier.state.in_((JobState.queued, JobState.running)),
+            )
+            .exists()
+        )
+        stmt = (
+            select(Job)
+            .where(
+                or_(
+                    and_(Job.state == JobState.queued, Job.run_after <= now),
+                    and_(
+                        Job.state == JobState.running,
+                        Job.lease_expires_at < now,
+                        Job.attempts < Job.max_attempts,
+                    ),
+                ),
+                or_(Job.kind.not_in(SERIAL_KINDS), Job.task_id.is_(None), ~blocked),
+            )
+            .order_by(Job.run_after, Job.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        job = self.db.scalars(stmt).first()
+        if job is None:
+            return None
+
+        job.state = JobState.running
+        job.attempts += 1
+        job.locked_by = worker_id
+        job.lease_expires_at = now + timedelta(seconds=lease_seconds)
+        # Claimed on its own after the batch that held it lost its worker.
+        job.batch_id = None
+        self.db.flush()
+        return job
+
+    def heartbeat(self, id: int, worker_id: str, lease_seconds: float) -> bool:
+        """Extend the lease of a job and the jobs in its batch; returns
+        False if the job is no longer ours."""
+        lease_expires_at = func.now() + timedelta(seconds=lease_seconds)
+        result = self.db.execute(
+            update(Job)
+            .where(Job.id == id, Job.locked_by == worker_id, Job.state == JobState.running)
+            .values(lease_expires_at=lease_expires_at)
+        )
+        if result.rowcount != 1:
+            return False
+
+        self.db.execute(
+            update(Job)
+            .where(Job.batch_id == id, Job.locked_by == worker_id, Job.state == JobState.running)
+            .values(lease_expires_at=lease_expires_at)
+        )
+        return True
+
+    def complete(self, id: int) -> None:
+        """Mark a job done, together with the jobs in its batch."""
+        for job in [self._require(id), *self._batch(id)]:
+            job.state = JobState.done
+            job.locked_by = None
+            job.lease_expires_at = None
+
+    def fail(self, id: int, error: str, retry_base_seconds: float = 30) -> Job:
+        """Record a failed attempt and requeue it with exponential backoff
+        if attempts remain. The jobs in its batch fail with it."""
+        for member in self._batch(id):
+            self.fail(member.id, error, retry_base_seconds)
+
+        job = self._require(id)
+        job.last_error = error
+        job.locked_by = None
+        job.lease_expires_at = None
+
+        if job.attempts < job.max_attempts:
+            delay = retry_base_seconds * 2 ** max(0, job.attempts - 1)
+            job.state = JobState.queued
+            job.run_after = func.now() + timedelta(seconds=delay)
+            job.batch_id = None
+        else:
+            job.state = JobState.failed
+        return job
+
+    def release(self, id: int) -> None:
+        """Hand a job, and the jobs in its batch, back to the queue without
+        counting the attempt."""
+        for job in [self._require(id), *self._batch(id)]:
+            job.state = JobState.queued
+            job.attempts = max(0, job.attempts - 1)
+            job.locked_by = None
+            job.lease_expires_at = None
+            job.run_after = func.now()
+            job.batch_id = None
+
+    def take_queued(self, kind: str, task_id: int, batch_id: int) -> list[Job]:
+        """Add a task's queued jobs of ``kind`` to the batch of the running
+        job ``batch_id`` and return them.
+
+        They run under that job's lease and finish with it (see ``complete``,
+        ``fail`` and ``release``); if its worker dies they are claimed again
+        on their own. Jobs another worker is claiming right now are skipped.
+        """
+        batch = self._require(batch_id)
+        stmt = (
+            select(Job)
+            .where(Job.kind == kind, Job.task_id == task_id, Job.state == JobState.queued)
+            .order_by(Job.id)
+            .with_for_update(skip_locked=True)
+        )
+        jobs = list(self.db.scalars(stmt))
+        for job in jobs:
+            job.state = JobState.running
+            job.attempts += 1
+            job.locked_by = batch.locked_by
+            job.lease_expires_at = batch.lease_expires_at
+            job.batch_id = batch.id
+        self.db.flush()
+        return jobs
+
+    def _batch(self, id: int) -> list[Job]:
+        """Running jobs held by the batch of job ``id``."""
+        stmt = select(Job).where(Job.batch_id == id, Job.state == JobState.running)
+        return list(self.db.scalars(stmt))
+
+    def reap_expired(self) -> list[Job]:
+        """Fail jobs whose worker died on their last allowed attempt."""
+        stmt = (
+            select(Job)
+            .where(
+                Job.state == JobState.running,
+                Job.lease_expires_at < func.now(),
+                Job.attempts >= Job.max_attempts,
+            )
+            .with_for_update(skip_locked=True)
+        )
+        jobs = list(self.db.scalars(stmt))
+        for job in jobs:
+            job.state = JobState.failed
+            job.last_error = "Worker lease expired"
+            job.locked_by = None
+            job.lease_expires_at = None
+        return jobs
+
+    def _require(self, id: int) -> Job:
+        job = self.get(id)
+        if not job:
+            raise KeyError(id)
+        return job
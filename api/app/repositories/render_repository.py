@@ -0,0 +1,42 @@
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models import Render, RenderState
+
+
+class RenderRepository:
+    def __init__(self, db: Session) -> None:
+        self.db = db
+
+    def get(self, task_id: int, kind: str) -> Render | None:
+        return self.db.scalar(
+            select(Render).where(Render.task_id == task_id, Render.kind == kind)
+        )
+
+    def list_for_task(self, task_id: int) -> list[Render]:
+        return list(self.db.scalars(
+            select(Render).where(Render.task_id == task_id).order_by(Render.kind)
+        ))
+
+    def set_state(
+        self,
+        task_id: int,
+        kind: str,
+        state: RenderState,
+        profile: str | None = None,
+        error: str | None = None,
+    ) -> Render:
+        render = self.get(task_id, kind)
+        if render is None:
+            render = Render(task_id=task_id, kind=kind)
+            self.db.add(render)
+
+        render.state = state
+        render.error = error
+        if profile is not None:
+            render.profile = profile
+        if state == RenderState.ready:
+            render.rendered_at = func.now()
+
+        self.db.flush()
+        return render
@@ -0,0 +1,26 @@
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models import SlurmJobStat
+
+
+class SlurmJobStatRepository:
+    def __init__(self, db: Session) -> None:
+        self.db = db
+
+    def add(self, stat: SlurmJobStat) -> SlurmJobStat:
+        existing = self.db.scalar(
+            select(SlurmJobStat).where(SlurmJobStat.job_id == stat.job_id))
+        if existing is not None:
+            return existing
+        self.db.add(stat)
+        self.db.flush()
+        return stat
+
+    def recent(self, kind: str, partition: str, limit: int) -> list[SlurmJobStat]:
+        return list(self.db.scalars(
+            select(SlurmJobStat)
+            .where(SlurmJobStat.kind == kind, SlurmJobStat.partition == partition)
+            .order_by(SlurmJobStat.id.desc())
+            .limit(limit)
+        ))
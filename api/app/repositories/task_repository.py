@@ -1,7 +1,54 @@
+import base64
+import json
+from datetime import datetime
+
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import Row, delete, func, select, tuple_
+
+from app.models import TaskEvent, TaskRecord, TaskState
+
+TASK_EVENTS_CHANNEL = "task_events"
+
+# Events kept per task once it is done or failed; older ones are deleted.
+TASK_EVENTS_KEPT = 50
+
+TaskCursor = tuple[datetime, int]
+
+# Columns of TaskSchema; listing never loads cut markers or other heavy fields.
+LIST_COLUMNS = (
+    TaskRecord.id,
+    TaskRecord.state,
+    TaskRecord.progress,
+    TaskRecord.message,
+    TaskRecord.error,
+    TaskRecord.created_at,
+    TaskRecord.updated_at,
+    TaskRecord.name,
+)
 
-from app.models import TaskRecord, TaskState
+
+def event_payload(event: TaskEvent) -> dict:
+    return {
+        "id": event.id,
+        "task_id": event.task_id,
+        "state": TaskState(event.state).value,
+        "progress": event.progress,
+        "message": event.message,
+    }
+
+
+def encode_cursor(updated_at: datetime, id: int) -> str:
+    raw = f"{updated_at.isoformat()}|{id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> TaskCursor:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        updated_at, id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(updated_at), int(id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
 
 
 class TaskRepository:
@@ -12,13 +59,37 @@ class TaskRepository:
         task = TaskRecord(name=name)
         self.db.add(task)
         self.db.flush()
+        self._publish(task)
         return task
 
     def get(self, id: int) -> TaskRecord | None:
         return self.db.get(TaskRecord, id)
 
-    def list(self) -> list[TaskRecord]:
-        return list(self.db.scalars(select(TaskRecord)))
+    def list_page(
+        self,
+        limit: int,
+        after: TaskCursor | None = None,
+        states: list[TaskState] | None = None,
+    ) -> tuple[list[Row], TaskCursor | None]:
+        """Most recently updated tasks first, using keyset pagination.
+
+        Returns the rows and the cursor of the next page, if there is one.
+        """
+        stmt = select(*LIST_COLUMNS)
+        if states:
+            stmt = stmt.where(TaskRecord.state.in_(states))
+        if after is not None:
+            stmt = stmt.where(
+                tuple_(TaskRecord.updated_at, TaskRecord.id) < tuple_(*after))
+        stmt = stmt.order_by(
+            TaskRecord.updated_at.desc(), TaskRecord.id.desc()).limit(limit + 1)
+
+        rows = self.db.execute(stmt).all()
+        if len(rows) <= limit:
+            return rows, None
+
+        rows = rows[:limit]
+        return rows, (rows[-1].updated_at, rows[-1].id)
 
     def require(self, id: int) -> TaskRecord:
         task = self.get(id)
@@ -49,8 +120,65 @@ class TaskRepository:
         if job_id is not None:
             task.job_id = job_id
 
+        if state is not None or progress is not None or message is not None:
+            self._publish(task)
+
         return task
 
+    def events_after(self, id: int, after_event_id: int | None, limit: int = 500) -> list[TaskEvent]:
+        """Events of a task newer than ``after_event_id``; the latest one if None."""
+        stmt = select(TaskEvent).where(TaskEvent.task_id == id)
+        if after_event_id is None:
+            stmt = stmt.order_by(TaskEvent.id.desc()).limit(1)
+        else:
+            stmt = stmt.where(TaskEvent.id > after_event_id).order_by(
+                TaskEvent.id).limit(limit)
+        return list(self.db.scalars(stmt))
+
+    def _publish(self, task: TaskRecord) -> None:
+        """Record the task's current state as an event and notify listeners.
+
+        NOTIFY is transactional, so listeners only hear about the event once
+        the caller commits.
+        """
+        event = TaskEvent(
+            task_id=task.id,
+            state=task.state,
+            progress=task.progress,
+            message=task.message,
+        )
+        self.db.add(event)
+        self.db.flush()
+
+        if self.db.get_bind().dialect.name == "postgresql":
+            payload = event_payload(event)
+            # NOTIFY payloads are capped at 8000 bytes.
+            payload["message"] = (payload["message"] or "")[:2000] or None
+            self.db.execute(select(func.pg_notify(
+                TASK_EVENTS_CHANNEL, json.dumps(payload))))
+
+        if task.state in (TaskState.done, TaskState.failed):
+            self._prune_events(task.id)
+
+    def _prune_events(self, id: int) -> None:
+        """Delete all but the newest ``TASK_EVENTS_KEPT`` events of a task."""
+        oldest_kept = (
+            select(TaskEvent.id)
+            .where(TaskEvent.task_id == id)
+            .order_by(TaskEvent.id.desc())
+            .offset(TASK_EVENTS_KEPT - 1)
+            .limit(1)
+            .scalar_subquery()
+        )
+        self.db.execute(
+            delete(TaskEvent).where(TaskEvent.task_id == id, TaskEvent.id < oldest_kept))
+
+    def count_by_state(self) -> dict[TaskState, int]:
+        rows = self.db.execute(
+            select(TaskRecord.state, func.count()).group_by(TaskRecord.state)
+        ).all()
+        return {state: 0 for state in TaskState} | {state: count for state, count in rows}
+
     def delete(self, id: int) -> None:
         task = self.require(id)
         self.db.delete(task)
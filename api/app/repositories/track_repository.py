@@ -0,0 +1,103 @@
+from sqlalchemy import Integer, Text, column, delete, select, update, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models import Clip, Track
+from app.schemas.segments import SegmentItem
+
+
+class TrackRepository:
+    def __init__(self, db: Session) -> None:
+        self.db = db
+
+    def get_or_create_track(self, task_id: int) -> int:
+        # A task has one track; concurrent ingests both land on it.
+        self.db.execute(
+            insert(Track).values(task_id=task_id)
+            .on_conflict_do_nothing(index_elements=[Track.task_id])
+        )
+        return self.db.scalar(select(Track.id).where(Track.task_id == task_id))
+
+    def ingest_segments(self, task_id: int, segments: list[SegmentItem]) -> int:
+        """Upsert the clips of a segments.json payload in one statement.
+
+        Idempotent on ``(task_id, clip_index)``: re-ingesting updates clip
+        timing, keeps user-edited scripts and URLs, and drops clips that are
+        no longer in the payload.
+        """
+        track_id = self.get_or_create_track(task_id)
+
+        if segments:
+            stmt = insert(Clip).values([
+                {
+                    "track_id": track_id,
+                    "clip_index": item.index,
+                    "start_seconds": item.start,
+                    "end_seconds": item.end,
+                    "duration_seconds": item.duration,
+                    "url": None,
+                    "script_description": item.script.description,
+                    "aesthetics": item.script.aesthetics,
+                    "camera_movement": item.script.camera_movement,
+                }
+                for item in segments
+            ])
+            self.db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[Clip.track_id, Clip.clip_index],
+                    set_={
+                        "start_seconds": stmt.excluded.start_seconds,
+                        "end_seconds": stmt.excluded.end_seconds,
+                        "duration_seconds": stmt.excluded.duration_seconds,
+                    },
+                )
+            )
+
+        self.db.execute(
+            delete(Clip).where(
+                Clip.track_id == track_id,
+                Clip.clip_index.not_in([item.index for item in segments]),
+            )
+        )
+        return len(segments)
+
+    def set_clip_urls(self, task_id: int, urls: dict[int, str]) -> set[int]:
+        """Set clip URLs by index in a single UPDATE ... FROM (VALUES ...).
+
+        Returns the indexes that matched no clip.
+        """
+        if not urls:
+            return set()
+
+        new_urls = values(
+            column("clip_index", Integer),
+            column("url", Text),
+            name="new_urls",
+        ).data(list(urls.items()))
+
+        updated = self.db.scalars(
+            update(Clip)
+            .where(
+                Clip.track_id == Track.id,
+                Track.task_id == task_id,
+                Clip.clip_index == new_urls.c.clip_index,
+            )
+            .values(url=new_urls.c.url)
+            .returning(Clip.clip_index)
+            .execution_options(synchronize_session=False)
+        ).all()
+
+        return set(urls) - set(updated)
+
+    def set_thumbnail_digests(self, task_id: int, digests: dict[int, str | None]) -> None:
+        """Record the thumbnail sprite of each clip, by index."""
+        if not digests:
+            return
+
+        clips = self.db.scalars(
+            select(Clip)
+            .join(Track)
+            .where(Track.task_id == task_id, Clip.clip_index.in_(digests))
+        )
+        for clip in clips:
+            clip.thumbnail_digest = digests[clip.clip_index]
@@ -0,0 +1,16 @@
+from datetime import datetime
+
+from pydantic import BaseModel, ConfigDict
+
+from app.models import RenderState
+
+
+class RenderRead(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    kind: str
+    state: RenderState
+    profile: str | None = None
+    error: str | None = None
+    rendered_at: datetime | None = None
+    url: str | None = None
@@ -0,0 +1,51 @@
+from pydantic import BaseModel, TypeAdapter, model_validator
+
+
+class SegmentScript(BaseModel):
+    description: str
+    aesthetics: str
+    camera_movement: str
+
+
+class SegmentItem(BaseModel):
+    index: int
+    start: float
+    end: float
+    duration: float
+    audio_clip: str | None = None
+    script: SegmentScript
+
+    @model_validator(mode="after")
+    def check_timing(self) -> "SegmentItem":
+        if self.start < 0 or self.end < self.start:
+            raise ValueError(
+                f"Segment {self.index} has invalid timing {self.start}-{self.end}")
+        return self
+
+
+class ManifestItem(BaseModel):
+    index: int
+    video_path: str
+
+
+_segments_adapter = TypeAdapter(list[SegmentItem])
+_manifest_adapter = TypeAdapter(list[ManifestItem])
+
+
+def _check_unique_indexes(items: list[SegmentItem] | list[ManifestItem], name: str) -> None:
+    indexes = [item.index for item in items]
+    if len(indexes) != len(set(indexes)):
+        raise ValueError(f"{name} contains duplicate indexes")
+
+
+def parse_segments(text: str) -> list[SegmentItem]:
+    """Validate a whole segments.json payload before anything is written."""
+    items = _segments_adapter.validate_json(text)
+    _check_unique_indexes(items, "segments.json")
+    return items
+
+
+def parse_manifest(text: str) -> list[ManifestItem]:
+    items = _manifest_adapter.validate_json(text)
+    _check_unique_indexes(items, "manifest.json")
+    return items
@@ -40,6 +40,13 @@ class CutMarkersResponse(BaseModel):
     cut_markers: list[float]
 
 
+class SuggestedCutMarkersResponse(BaseModel):
+    task_id: int
+    tempo_bpm: float | None
+    # None until beat analysis has run.
+    suggested_cut_markers: list[float] | None
+
+
 class TaskResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     id: int
@@ -21,3 +21,16 @@ class TrackRead(BaseModel):
     id: int
     task_id: int
     clips: list[ClipRead]
+
+
+class ClipThumbnails(BaseModel):
+    clip_id: int
+    clip_index: int
+    sprite_url: str
+    frame_width: int
+    frame_height: int
+    columns: int
+    rows: int
+    count: int
+    interval: float
+    times: list[float]
@@ -0,0 +1,46 @@
+import subprocess
+from typing import Iterator
+
+import numpy as np
+from moviepy.config import FFMPEG_BINARY
+
+
+def iter_pcm_blocks(
+    path: str,
+    sample_rate: int,
+    block_samples: int,
+) -> Iterator[np.ndarray]:
+    """Decode ``path`` to mono float32 PCM, ``block_samples`` at a time.
+
+    ffmpeg does the decoding, downmixing and resampling in a subprocess, so
+    memory stays flat no matter how long the file is. The last block may be
+    shorter.
+    """
+    process = subprocess.Popen(
+        [
+            FFMPEG_BINARY, "-hide_banner", "-loglevel", "error",
+            "-i", str(path),
+            "-vn", "-ac", "1", "-ar", str(sample_rate),
+            "-f", "f32le", "-",
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    block_bytes = block_samples * 4
+
+    try:
+        while True:
+            data = process.stdout.read(block_bytes)
+            if not data:
+                break
+            usable = len(data) - len(data) % 4
+            yield np.frombuffer(data[:usable], dtype="<f4")
+    finally:
+        process.stdout.close()
+        stderr = process.stderr.read()
+        process.stderr.close()
+        returncode = process.wait()
+
+    if returncode != 0:
+        raise RuntimeError(
+            f"ffmpeg failed to decode {path}: {stderr.decode(errors='replace')[-2000:]}")
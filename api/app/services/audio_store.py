@@ -0,0 +1,57 @@
+import os
+import shlex
+from pathlib import Path
+
+from app.core.config import get_directories
+from app.services.hpc_client import HpcBackend
+from app.services.render_cache import link_or_copy
+
+
+def local_blob_path(sha256: str, ext: str) -> Path:
+    return get_directories().media / ".audio" / f"{sha256}{ext}"
+
+
+def remote_blob_path(sha256: str, ext: str) -> str:
+    return f"{get_directories().hpc_base}/audio/{sha256}{ext}"
+
+
+def remote_upload_path(task_id: int, ext: str) -> str:
+    return f"{get_directories().hpc_base}/uploads/{task_id}/input{ext}"
+
+
+def store_local(tmp_path: Path, sha256: str, ext: str, task_path: Path) -> Path:
+    """Move a received file into the store and hardlink it to ``task_path``.
+
+    If the blob is already stored the received copy is dropped.
+    """
+    blob = local_blob_path(sha256, ext)
+    if blob.exists():
+        tmp_path.unlink(missing_ok=True)
+    else:
+        os.replace(tmp_path, blob)
+    link_or_copy(blob, task_path)
+    return blob
+
+
+async def link_remote(client: HpcBackend, sha256: str, blob_ext: str, task_id: int, ext: str) -> bool:
+    """Point the task's remote upload path at a stored blob.
+
+    Returns False if the blob is missing on the HPC (e.g. scratch was purged).
+    """
+    blob = remote_blob_path(sha256, blob_ext)
+    upload = remote_upload_path(task_id, ext)
+    upload_dir = upload.rsplit("/", 1)[0]
+    blob, upload_dir, upload = (shlex.quote(path) for path in (blob, upload_dir, upload))
+    out = await client.run(
+        f"if test -f {blob}; then mkdir -p {upload_dir} && ln -sfn {blob} {upload} && echo linked; fi"
+    )
+    return out.strip() == "linked"
+
+
+async def put_remote_blob(client: HpcBackend, local_path: str, sha256: str, ext: str) -> None:
+    blob = remote_blob_path(sha256, ext)
+    partial = f"{blob}.{os.getpid()}.part"
+    await client.mkdir(blob.rsplit("/", 1)[0])
+    await client.sftp_put(local_path, partial)
+    sftp = await client.sftp()
+    await sftp.posix_rename(partial, blob)
@@ -0,0 +1,192 @@
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator
+
+from sqlalchemy.orm import Session
+
+from app.core.config import Settings, get_directories, get_hpc_config
+from app.models import AudioBlob, TaskRecord
+from app.repositories.audio_blob_repository import AudioBlobRepository
+from app.services.audio_store import link_remote, local_blob_path, remote_blob_path, store_local
+from app.services.hpc_client import open_hpc_client
+from app.services.metrics import TRANSFER_BYTES, track_stage
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class ReceivedAudio:
+    sha256: str
+    size: int
+    local_tmp: Path
+    # Remote copy awaiting its content-addressed name, if one was streamed.
+    remote_partial: str | None
+
+
+async def _coalesce(chunks: AsyncIterator[bytes], size: int) -> AsyncIterator[bytes]:
+    """Regroup small request chunks into ``size``-byte writes."""
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer += chunk
+        while len(buffer) >= size:
+            yield bytes(buffer[:size])
+            del buffer[:size]
+    if buffer:
+        yield bytes(buffer)
+
+
+async def _write_remote(settings: Settings, queue: asyncio.Queue, remote_path: str) -> None:
+    """Drain ``queue`` into ``remote_path`` until a None sentinel arrives."""
+    async with open_hpc_client(settings) as client:
+        await client.mkdir(remote_path.rsplit("/", 1)[0])
+        sftp = await client.sftp()
+        with track_stage("sftp_stream"):
+            async with sftp.open(remote_path, "wb") as f:
+                while (data := await queue.get()) is not None:
+                    await f.write(data)
+                    TRANSFER_BYTES.labels("put").inc(len(data))
+
+
+async def _put(queue: asyncio.Queue, writer: asyncio.Task, item: bytes | None) -> None:
+    """Queue ``item`` for the writer, waiting while the queue is full.
+
+    Returns early if the writer dies, so a failed remote copy never stalls
+    the local one.
+    """
+    try:
+        queue.put_nowait(item)
+        return
+    except asyncio.QueueFull:
+        pass
+
+    put = asyncio.ensure_future(queue.put(item))
+    await asyncio.wait({put, writer}, return_when=asyncio.FIRST_COMPLETED)
+    if not put.done():
+        put.cancel()
+
+
+async def receive_audio(
+    task_id: int,
+    chunks: AsyncIterator[bytes],
+    ext: str,
+    settings: Settings | None,
+) -> ReceivedAudio:
+    """Hash an upload while writing it to a local temp file and, if
+    ``settings`` is given, teeing it to a temp file on the HPC.
+
+    The remote copy is fed through a queue of at most
+    ``upload_buffer_chunks`` MiB. When it is full the request body is not
+    read any further, so a slow SFTP link slows the client down instead of
+    buffering the file in memory.
+    """
+    local_tmp = local_blob_path(f".{task_id}", ".part")
+    local_tmp.parent.mkdir(parents=True, exist_ok=True)
+
+    writer = None
+    remote_partial = None
+    if settings is not None:
+        remote_partial = remote_blob_path(f".{task_id}", f"{ext}.part")
+        queue: asyncio.Queue = asyncio.Queue(maxsize=settings.upload_buffer_chunks)
+        writer = asyncio.create_task(_write_remote(settings, queue, remote_partial))
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with local_tmp.open("wb") as out:
+            async for data in _coalesce(chunks, UPLOAD_CHUNK_SIZE):
+                digest.update(data)
+                size += len(data)
+                await asyncio.to_thread(out.write, data)
+                if writer is not None and not writer.done():
+                    await _put(queue, writer, data)
+
+        if writer is not None:
+            if not writer.done():
+                await _put(queue, writer, None)
+            await asyncio.wait({writer})
+    except BaseException:
+        if writer is not None:
+            writer.cancel()
+        local_tmp.unlink(missing_ok=True)
+        raise
+
+    if writer is not None and writer.exception() is not None:
+        logger.warning("Streaming task %s to HPC failed; staging it afterwards",
+                       task_id, exc_info=writer.exception())
+        remote_partial = None
+
+    return ReceivedAudio(
+        sha256=digest.hexdigest(),
+        size=size,
+        local_tmp=local_tmp,
+        remote_partial=remote_partial,
+    )
+
+
+async def _stage_remote(settings: Settings, blob: AudioBlob, partial: str | None, task_id: int, ext: str) -> bool:
+    """Give the streamed copy its content-addressed name (or drop it if the
+    blob is already stored) and link the task's upload path to the blob."""
+    if partial is None and blob.remote_staged_at is None:
+        return False
+
+    try:
+        async with open_hpc_client(settings) as client:
+            if partial is not None:
+                sftp = await client.sftp()
+                if blob.remote_staged_at is not None:
+                    await sftp.remove(partial)
+                else:
+                    await sftp.posix_rename(partial, remote_blob_path(blob.sha256, blob.ext))
+            return await link_remote(client, blob.sha256, blob.ext, task_id, ext)
+    except Exception:
+        logger.warning("Linking task %s to audio %s on HPC failed",
+                       task_id, blob.sha256, exc_info=True)
+        return False
+
+
+async def store_upload(
+    db: Session,
+    task: TaskRecord,
+    chunks: AsyncIterator[bytes],
+    ext: str,
+    claimed_sha256: str | None = None,
+) -> bool:
+    """Receive an upload into the local and remote audio stores.
+
+    The file ends up at ``media/{task_id}{ext}`` and, on the HPC, at
+    ``uploads/{task_id}/input{ext}``, both links to one stored copy per
+    content hash. When ``claimed_sha256`` names audio that is already on the
+    HPC the body is only hashed and stored locally; nothing goes over SFTP.
+    Returns whether the task's remote input is in place.
+    """
+    try:
+        settings = get_hpc_config()
+    except RuntimeError:
+        logger.warning("HPC is not configured; task %s is only saved locally", task.id)
+        settings = None
+
+    blobs = AudioBlobRepository(db)
+    known = blobs.get(claimed_sha256) if claimed_sha256 else None
+    skip_remote = known is not None and known.remote_staged_at is not None
+
+    received = await receive_audio(
+        task.id, chunks, ext, None if skip_remote else settings)
+
+    blob = blobs.get_or_create(received.sha256, ext, received.size)
+    task.audio_sha256 = blob.sha256
+    store_local(received.local_tmp, blob.sha256, blob.ext,
+                get_directories().media / f"{task.id}{ext}")
+    if skip_remote and blob is known:
+        logger.info("Task %s reuses audio %s; skipped the HPC transfer", task.id, blob.sha256)
+
+    if settings is None:
+        return False
+
+    staged = await _stage_remote(settings, blob, received.remote_partial, task.id, ext)
+    blobs.set_remote_staged(blob.sha256, staged)
+    return staged
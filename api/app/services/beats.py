@@ -0,0 +1,219 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from app.db import SessionLocal
+from app.models import TaskRecord
+from app.services.audio_decode import iter_pcm_blocks
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 22050
+FRAME_SIZE = 2048
+HOP_SIZE = 512
+BLOCK_SAMPLES = HOP_SIZE * 256
+
+MIN_BPM = 60.0
+MAX_BPM = 200.0
+PRIOR_BPM = 120.0
+
+BEATS_PER_BAR = 4
+TARGET_CUT_SECONDS = 4.0
+# Never suggest a cut closer than this to the start or end of the track.
+EDGE_SECONDS = 1.0
+
+
+@dataclass(frozen=True)
+class BeatAnalysis:
+    tempo_bpm: float
+    beats: list[float]
+    onsets: list[float]
+    cut_markers: list[float]
+
+
+def onset_envelope(audio_path: str) -> np.ndarray:
+    """Spectral flux per hop, computed block by block.
+
+    Only the last frame's worth of samples and the previous spectrum carry
+    over between blocks, so memory does not grow with the track length.
+    Frames are centred (half a frame of leading silence), so hop ``i`` of
+    the envelope is at ``i * HOP_SIZE`` samples.
+    """
+    window = np.hanning(FRAME_SIZE).astype(np.float32)
+    carry = np.zeros(FRAME_SIZE // 2, dtype=np.float32)
+    previous = np.zeros((1, FRAME_SIZE // 2 + 1), dtype=np.float32)
+    flux = []
+
+    for block in iter_pcm_blocks(audio_path, SAMPLE_RATE, BLOCK_SAMPLES):
+        samples = np.concatenate([carry, block])
+        if len(samples) < FRAME_SIZE:
+            carry = samples
+            continue
+
+        frames = sliding_window_view(samples, FRAME_SIZE)[::HOP_SIZE]
+        spectrum = np.log1p(100 * np.abs(np.fft.rfft(frames * window, axis=1)))
+
+        flux.append(np.maximum(np.diff(spectrum, axis=0, prepend=previous), 0).sum(axis=1))
+        previous = spectrum[-1:]
+
+        consumed = len(frames) * HOP_SIZE
+        carry = samples[consumed:]
+
+    if not flux:
+        return np.zeros(0, dtype=np.float32)
+
+    envelope = np.concatenate(flux)
+    # Remove slow loudness changes so only attacks remain.
+    local_mean = np.convolve(envelope, np.ones(16) / 16, mode="same")
+    envelope = np.maximum(envelope - local_mean, 0)
+    peak = envelope.max()
+    return envelope / peak if peak > 0 else envelope
+
+
+def estimate_period(envelope: np.ndarray) -> float:
+    """Beat period in hops from the envelope's autocorrelation, weighted
+    towards ``PRIOR_BPM``."""
+    hops_per_second = SAMPLE_RATE / HOP_SIZE
+    min_lag = int(hops_per_second * 60 / MAX_BPM)
+    max_lag = int(hops_per_second * 60 / MIN_BPM)
+
+    centered = envelope - envelope.mean()
+    size = 1 << int(np.ceil(np.log2(2 * len(centered))))
+    spectrum = np.fft.rfft(centered, size)
+    autocorrelation = np.fft.irfft(spectrum * np.conj(spectrum), size)[:len(centered)]
+
+    lags = np.arange(min_lag, min(max_lag, len(autocorrelation) - 1) + 1)
+    if not len(lags):
+        return hops_per_second * 60 / PRIOR_BPM
+
+    prior_lag = hops_per_second * 60 / PRIOR_BPM
+    weights = np.exp(-0.5 * (np.log2(lags / prior_lag) / 0.9) ** 2)
+    scores = autocorrelation[lags] * weights
+    best = int(np.argmax(scores))
+
+    # Parabolic interpolation for a sub-hop period.
+    if 0 < best < len(scores) - 1:
+        left, centre, right = scores[best - 1:best + 2]
+        denominator = left - 2 * centre + right
+        if denominator:
+            return float(lags[best] + 0.5 * (left - right) / denominator)
+    return float(lags[best])
+
+
+def track_beats(envelope: np.ndarray, period: float, tightness: float = 100.0) -> np.ndarray:
+    """Dynamic-programming beat tracker; returns beat positions in hops.
+
+    Each hop's score is its onset strength plus the best predecessor score
+    one period back, penalised by how far the gap strays from the period.
+    """
+    count = len(envelope)
+    if count == 0:
+        return np.zeros(0, dtype=int)
+
+    offsets = np.arange(-int(round(2 * period)), -int(round(period / 2)) + 1)
+    penalty = -tightness * np.log(-offsets / period) ** 2
+
+    score = envelope.astype(np.float64).copy()
+    backlink = np.full(count, -1)
+
+    for t in range(count):
+        candidates = t + offsets
+        valid = candidates >= 0
+        if not valid.any():
+            continue
+        options = score[candidates[valid]] + penalty[valid]
+        best = int(np.argmax(options))
+        score[t] = envelope[t] + options[best]
+        backlink[t] = candidates[valid][best]
+
+    # Start from the best-scoring hop within the last period.
+    tail = max(0, count - int(round(period)))
+    t = tail + int(np.argmax(score[tail:]))
+    beats = []
+    while t >= 0:
+        beats.append(t)
+        t = backlink[t]
+    beats = np.array(beats[::-1], dtype=int)
+
+    # The path runs on through silent intros and outros; trim weak beats
+    # off both ends.
+    strength = envelope[beats]
+    strong = np.flatnonzero(strength >= 0.5 * np.sqrt(np.mean(strength ** 2)))
+    if not len(strong):
+        return beats
+    return beats[strong[0]:strong[-1] + 1]
+
+
+def pick_onsets(envelope: np.ndarray, delta: float = 0.1) -> np.ndarray:
+    if len(envelope) < 3:
+        return np.zeros(0, dtype=int)
+    neighbours = sliding_window_view(envelope, 3)
+    is_peak = (neighbours[:, 1] > neighbours[:, 0]) & (neighbours[:, 1] >= neighbours[:, 2])
+    threshold = envelope.mean() + delta
+    return np.flatnonzero(is_peak & (neighbours[:, 1] > threshold)) + 1
+
+
+def suggest_cut_markers(
+    beats: np.ndarray,
+    envelope: np.ndarray,
+    period: float,
+    duration: float,
+) -> list[float]:
+    """Cut on bar lines, about every ``TARGET_CUT_SECONDS``.
+
+    The bar phase is the one whose beats carry the most onset energy, a
+    cheap stand-in for downbeat detection.
+    """
+    if len(beats) < BEATS_PER_BAR:
+        return []
+
+    hops_per_second = SAMPLE_RATE / HOP_SIZE
+    bar_seconds = BEATS_PER_BAR * period / hops_per_second
+    bars_per_cut = max(1, round(TARGET_CUT_SECONDS / bar_seconds))
+    stride = BEATS_PER_BAR * bars_per_cut
+
+    phase = max(range(BEATS_PER_BAR),
+                key=lambda p: envelope[beats[p::BEATS_PER_BAR]].sum())
+    times = beats[phase::stride] / hops_per_second
+
+    return [
+        round(float(t), 3) for t in times
+        if EDGE_SECONDS <= t <= duration - EDGE_SECONDS
+    ]
+
+
+def analyze_beats(audio_path: str) -> BeatAnalysis:
+    envelope = onset_envelope(audio_path)
+    hops_per_second = SAMPLE_RATE / HOP_SIZE
+    duration = len(envelope) / hops_per_second
+
+    period = estimate_period(envelope)
+    beats = track_beats(envelope, period)
+    onsets = pick_onsets(envelope)
+
+    return BeatAnalysis(
+        tempo_bpm=round(60 * hops_per_second / period, 2),
+        beats=[round(float(b / hops_per_second), 3) for b in beats],
+        onsets=[round(float(o / hops_per_second), 3) for o in onsets],
+        cut_markers=suggest_cut_markers(beats, envelope, period, duration),
+    )
+
+
+async def analyze_task_beats(task_id: int, local_path: str) -> None:
+    """Job handler: store suggested cut markers for an uploaded track."""
+    analysis = await asyncio.to_thread(analyze_beats, local_path)
+
+    with SessionLocal() as db:
+        task = db.get(TaskRecord, task_id)
+        if task is None:
+            return
+        task.tempo_bpm = analysis.tempo_bpm
+        task.suggested_cut_markers = analysis.cut_markers
+        db.commit()
+
+    logger.info("Task %s: %.1f BPM, %d beats, %d suggested cut markers",
+                task_id, analysis.tempo_bpm, len(analysis.beats),
+                len(analysis.cut_markers))
@@ -0,0 +1,600 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import subprocess
+import tempfile
+from dataclasses import dataclass, replace
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Protocol, Sequence
+
+from moviepy import VideoFileClip, CompositeVideoClip, ColorClip
+from moviepy.config import FFMPEG_BINARY
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+from app.core.config import EncoderProfile, get_encoder_profile
+from app.services.render_cache import RenderCache, render_key
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SECONDS = 10.0
+SEGMENT_MANIFEST = "manifest.json"
+
+# "Stream #0:0[0x1](und): Video: h264 (High) (avc1 / 0x31637661), yuv420p(tv, ...), ..."
+PIX_FMT_PATTERN = re.compile(r"Stream #\d+:\d+\S*: Video: [^,]+, (\w+)")
+LEVEL_PATTERN = re.compile(r"\blevel_idc\s+\d+ = (\d+)")
+
+
+class TimelineClip(Protocol):
+    url: str | None
+    clip_index: int
+    start_seconds: float
+    end_seconds: float
+    duration_seconds: float
+
+
+@dataclass(frozen=True)
+class VideoInfo:
+    codec: str | None
+    profile: str | None
+    size: tuple[int, int]
+    fps: float
+    duration: float
+    # Only filled in by probe_stream_format.
+    pix_fmt: str | None = None
+    level: int | None = None
+
+
+def probe_video(path: str) -> VideoInfo:
+    infos = ffmpeg_parse_infos(path)
+    if not infos.get("video_found"):
+        raise ValueError(f"No video stream in {path}")
+
+    return VideoInfo(
+        codec=infos.get("video_codec_name"),
+        profile=(infos.get("video_profile") or "").strip("()") or None,
+        size=tuple(infos["video_size"]),
+        fps=float(infos["video_fps"]),
+        duration=float(infos.get("video_duration") or infos["duration"]),
+    )
+
+
+def probe_stream_format(path: str) -> tuple[str | None, int | None]:
+    """Pixel format and codec level of the first video stream.
+
+    moviepy's probe reports neither and the level is only in the bitstream
+    headers, so this traces the headers of the first packet.
+    """
+    result = subprocess.run(
+        [FFMPEG_BINARY, "-hide_banner", "-i", str(path),
+         "-map", "0:v:0", "-c", "copy", "-bsf:v", "trace_headers",
+         "-frames:v", "1", "-f", "null", "-"],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    pix_fmt = PIX_FMT_PATTERN.search(result.stderr)
+    level = LEVEL_PATTERN.search(result.stderr)
+    return (
+        pix_fmt.group(1) if pix_fmt else None,
+        int(level.group(1)) if level else None,
+    )
+
+
+def probe_duration(path: str) -> float:
+    return float(ffmpeg_parse_infos(path)["duration"])
+
+
+def order_timeline_clips(clips: Sequence[TimelineClip]) -> list[TimelineClip]:
+    ordered_clips = sorted(
+        [c for c in clips if c.url],
+        key=lambda c: (c.start_seconds, c.clip_index)
+    )
+    if not ordered_clips:
+        raise ValueError("No clips with valid URLs provided")
+    return ordered_clips
+
+
+def target_duration_for(timeline_duration: float, audio_duration: float) -> float:
+    if audio_duration > timeline_duration:
+        return audio_duration
+    return max(0, audio_duration - 0.05)
+
+
+def render_timeline(
+    clips: Sequence[TimelineClip],
+    audio_path: str,
+    output_path: str,
+    dirty_range: tuple[float, float] | None = None,
+    progress: Callable[[float], None] | None = None,
+    cache: RenderCache | None = None,
+    profile: EncoderProfile | None = None,
+) -> str:
+    """Render the clips on their timeline positions over the audio track.
+
+    Back-to-back clips that already share codec, profile, level, pixel
+    format, resolution and frame rate are joined with ffmpeg's concat demuxer without re-encoding. Anything
+    else (overlaps, gaps, mismatched formats) is composited with moviepy one
+    timeline segment at a time, re-encoding only the segments whose clips
+    changed or that overlap ``dirty_range``.
+
+    ``progress`` is called with the completed fraction as rendering advances.
+    With a ``cache``, a render whose inputs and encoder settings match an
+    earlier one is served from it instead. The encoder ``profile`` used is
+    recorded next to the output, see ``read_render_record``.
+    """
+    report = progress or (lambda fraction: None)
+    profile = profile or get_encoder_profile()
+    ordered_clips = order_timeline_clips(clips)
+
+    key = None
+    if cache is not None:
+        key = render_key(ordered_clips, audio_path, _encoder_settings(profile))
+        if cache.fetch(key, output_path):
+            _write_render_record(output_path, profile, "cache")
+            report(1.0)
+            return output_path
+
+    method = _render_uncached(ordered_clips, audio_path, output_path,
+                              dirty_range, report, profile)
+
+    if key is not None:
+        cache.store(key, output_path)
+    _write_render_record(output_path, profile, method)
+    report(1.0)
+    return output_path
+
+
+def _encoder_settings(profile: EncoderProfile) -> dict:
+    return {**profile.output_settings(), "segment_seconds": SEGMENT_SECONDS}
+
+
+def render_record_path(output_path: str) -> Path:
+    return Path(output_path).with_suffix(".json")
+
+
+def read_render_record(output_path: str) -> dict | None:
+    """How the video at ``output_path`` was rendered, if it is known."""
+    try:
+        return json.loads(render_record_path(output_path).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def _write_render_record(output_path: str, profile: EncoderProfile, method: str) -> None:
+    record_path = render_record_path(output_path)
+    tmp_path = record_path.with_name(f".{record_path.name}.tmp")
+    tmp_path.write_text(json.dumps({
+        "profile": profile.name,
+        "encoder": profile.output_settings(),
+        "method": method,
+        "rendered_at": datetime.now(timezone.utc).isoformat(),
+    }, indent=2))
+    os.replace(tmp_path, record_path)
+
+
+def _render_uncached(
+    ordered_clips: list[TimelineClip],
+    audio_path: str,
+    output_path: str,
+    dirty_range: tuple[float, float] | None,
+    report: Callable[[float], None],
+    profile: EncoderProfile,
+) -> str:
+
+    try:
+        plan = _stream_copy_plan(ordered_clips, profile)
+    except Exception:
+        logger.warning("Could not probe clips for stream copy",
+                       exc_info=True)
+        plan = None
+
+    if plan is not None:
+        try:
+            _render_stream_copy(ordered_clips, plan, audio_path,
+                                output_path, profile)
+            logger.info("Rendered %s with stream copy (%d clips)",
+                        output_path, len(ordered_clips))
+            return "stream_copy"
+        except subprocess.CalledProcessError as e:
+            logger.warning(
+                "Stream copy render failed, falling back to compositing: %s",
+                (e.stderr or b"").decode(errors="replace")[-2000:],
+            )
+
+    _render_segmented(ordered_clips, audio_path,
+                      output_path, dirty_range, report, profile)
+    return "segmented"
+
+
+@dataclass(frozen=True)
+class _StreamCopyPlan:
+    info: VideoInfo
+    usable_durations: list[float]
+    source_durations: list[float]
+
+
+def _stream_copy_plan(ordered_clips: list[TimelineClip], profile: EncoderProfile) -> _StreamCopyPlan | None:
+    infos = [probe_video(c.url) for c in ordered_clips]
+    base = infos[0]
+
+    if base.codec != "h264":
+        return None
+    if _output_size(base.size, profile) != base.size:
+        return None
+
+    # Half a frame of slack for float timestamps coming from the pipeline.
+    tolerance = 0.5 / base.fps
+    cursor = 0.0
+    usable_durations = []
+
+    for clip, info in zip(ordered_clips, infos):
+        if (info.codec, info.profile, info.size) != (base.codec, base.profile, base.size):
+            return None
+        if abs(info.fps - base.fps) > 0.01:
+            return None
+
+        usable = min(clip.duration_seconds, info.duration)
+        if abs(clip.start_seconds - cursor) > tolerance:
+            return None
+        if abs(clip.start_seconds + usable - clip.end_seconds) > tolerance:
+            return None
+
+        usable_durations.append(usable)
+        cursor = clip.start_seconds + usable
+
+    # The concat demuxer keeps the first clip's parameters for the whole
+    # stream, so clips in another pixel format or level would be misdecoded.
+    formats = {probe_stream_format(c.url) for c in ordered_clips}
+    if len(formats) != 1:
+        return None
+    pix_fmt, level = formats.pop()
+    if pix_fmt is None or level is None:
+        return None
+
+    return _StreamCopyPlan(
+        info=replace(base, pix_fmt=pix_fmt, level=level),
+        usable_durations=usable_durations,
+        source_durations=[info.duration for info in infos],
+    )
+
+
+def _output_size(size: tuple[int, int], profile: EncoderProfile) -> tuple[int, int]:
+    """Scale down to the profile's maximum height, keeping both sides even."""
+    width, height = size
+    if not profile.max_height or height <= profile.max_height:
+        return size
+    scaled_width = max(2, round(width * profile.max_height / height / 2) * 2)
+    return (scaled_width, profile.max_height - profile.max_height % 2)
+
+
+def _concat_entry(path: str, outpoint: float | None = None) -> str:
+    escaped = os.path.abspath(path).replace("'", "'\\''")
+    entry = f"file '{escaped}'\n"
+    if outpoint is not None:
+        entry += f"outpoint {outpoint:.6f}\n"
+    return entry
+
+
+def run_ffmpeg(args: list[str]) -> None:
+    subprocess.run(
+        [FFMPEG_BINARY, "-hide_banner", "-loglevel", "error", "-y", *args],
+        check=True,
+        capture_output=True,
+    )
+
+
+def _encode_black(path: str, info: VideoInfo, duration: float, profile: EncoderProfile) -> None:
+    width, height = info.size
+    args = [
+        "-f", "lavfi",
+        "-i", f"color=c=black:s={width}x{height}:r={info.fps}",
+        "-t", f"{duration:.6f}",
+        "-c:v", "libx264",
+        "-preset", profile.preset,
+        "-crf", str(profile.crf),
+        "-threads", str(profile.threads or 0),
+        # Must match the clips it is concatenated with, not the profile.
+        "-pix_fmt", info.pix_fmt or "yuv420p",
+    ]
+    if info.profile:
+        args += ["-profile:v", info.profile.split()[-1].lower()]
+    if info.level:
+        args += ["-level", f"{info.level / 10:.1f}"]
+    run_ffmpeg([*args, "-an", path])
+
+
+def _concat_with_audio(
+    entries: list[str],
+    audio_path: str,
+    target_duration: float,
+    output_path: str,
+    work_dir: str,
+    profile: EncoderProfile,
+) -> None:
+    list_path = os.path.join(work_dir, "concat.txt")
+    with open(list_path, "w") as f:
+        f.writelines(entries)
+
+    tmp_output = os.path.join(work_dir, "output.mp4")
+    run_ffmpeg([
+        "-f", "concat", "-safe", "0", "-i", list_path,
+        "-i", str(audio_path),
+        "-map", "0:v:0", "-map", "1:a:0",
+        "-c:v", "copy",
+        "-c:a", "aac",
+        "-b:a", profile.audio_bitrate,
+        "-t", f"{target_duration:.6f}",
+        "-movflags", "+faststart",
+        tmp_output,
+    ])
+    os.replace(tmp_output, output_path)
+
+
+def _render_stream_copy(
+    ordered_clips: list[TimelineClip],
+    plan: _StreamCopyPlan,
+    audio_path: str,
+    output_path: str,
+    profile: EncoderProfile,
+) -> None:
+    timeline_duration = max(c.end_seconds for c in ordered_clips)
+    target_duration = target_duration_for(
+        timeline_duration, probe_duration(audio_path))
+
+    output_dir = Path(output_path).parent
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    with tempfile.TemporaryDirectory(dir=output_dir, prefix=".concat-") as work_dir:
+        entries = []
+        for clip, usable, source_duration in zip(
+            ordered_clips, plan.usable_durations, plan.source_durations
+        ):
+            trimmed = source_duration - usable > 0.5 / plan.info.fps
+            entries.append(_concat_entry(
+                clip.url, usable if trimmed else None))
+
+        if target_duration > timeline_duration:
+            padding_path = os.path.join(work_dir, "padding.mp4")
+            _encode_black(padding_path, plan.info,
+                          target_duration - timeline_duration, profile)
+            entries.append(_concat_entry(padding_path))
+
+        _concat_with_audio(entries, audio_path,
+                           target_duration, output_path, work_dir, profile)
+
+
+def segments_dir_for(output_path: str) -> Path:
+    output = Path(output_path)
+    return output.with_name(f".{output.stem}.segments")
+
+
+@dataclass(frozen=True)
+class _Segment:
+    index: int
+    start_frame: int
+    end_frame: int
+    fps: float
+
+    @property
+    def start(self) -> float:
+        return self.start_frame / self.fps
+
+    @property
+    def end(self) -> float:
+        return self.end_frame / self.fps
+
+    @property
+    def file_name(self) -> str:
+        return f"segment_{self.index:04d}.mp4"
+
+
+def _timeline_segments(target_duration: float, fps: float) -> list[_Segment]:
+    frames_per_segment = max(1, round(SEGMENT_SECONDS * fps))
+    total_frames = max(1, round(target_duration * fps))
+
+    return [
+        _Segment(
+            index=i,
+            start_frame=start_frame,
+            end_frame=min(start_frame + frames_per_segment, total_frames),
+            fps=fps,
+        )
+        for i, start_frame in enumerate(range(0, total_frames, frames_per_segment))
+    ]
+
+
+def _overlaps(clip: TimelineClip, start: float, end: float) -> bool:
+    return clip.start_seconds < end and clip.start_seconds + clip.duration_seconds > start
+
+
+def _segment_fingerprint(
+    segment: _Segment,
+    clips: list[TimelineClip],
+    size: tuple[int, int],
+    profile: EncoderProfile,
+) -> str:
+    sources = []
+    for c in clips:
+        if not _overlaps(c, segment.start, segment.end):
+            continue
+        stat = os.stat(c.url)
+        sources.append([
+            os.path.abspath(c.url), stat.st_size, stat.st_mtime_ns,
+            c.clip_index, c.start_seconds, c.end_seconds, c.duration_seconds,
+        ])
+
+    payload = {
+        "version": 2,
+        "frames": [segment.start_frame, segment.end_frame],
+        "fps": segment.fps,
+        "size": list(size),
+        "encoder": profile.output_settings(),
+        "sources": sources,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def _load_segment_manifest(segments_dir: Path) -> dict[str, dict]:
+    try:
+        manifest = json.loads((segments_dir / SEGMENT_MANIFEST).read_text())
+    except (OSError, ValueError):
+        return {}
+    return {entry["file"]: entry for entry in manifest.get("segments", [])}
+
+
+def _render_segmented(
+    ordered_clips: list[TimelineClip],
+    audio_path: str,
+    output_path: str,
+    dirty_range: tuple[float, float] | None = None,
+    report: Callable[[float], None] = lambda fraction: None,
+    profile: EncoderProfile | None = None,
+) -> None:
+    """Composite the timeline as independently encoded segments.
+
+    Every segment starts on a keyframe and is listed in a manifest with a
+    fingerprint of the clips it covers. Segments whose fingerprint is
+    unchanged (and that do not overlap ``dirty_range``) are reused as they
+    are, then everything is joined by stream copy and muxed with the audio.
+    """
+    profile = profile or get_encoder_profile()
+    info = probe_video(ordered_clips[0].url)
+    base_size = _output_size(info.size, profile)
+    fps = info.fps
+
+    timeline_duration = max(c.end_seconds for c in ordered_clips)
+    target_duration = target_duration_for(
+        timeline_duration, probe_duration(audio_path))
+
+    segments_dir = segments_dir_for(output_path)
+    segments_dir.mkdir(parents=True, exist_ok=True)
+    previous = _load_segment_manifest(segments_dir)
+
+    segments = _timeline_segments(target_duration, fps)
+    manifest_entries = []
+    stale = []
+
+    for segment in segments:
+        fingerprint = _segment_fingerprint(
+            segment, ordered_clips, base_size, profile)
+        entry = previous.get(segment.file_name)
+        forced = dirty_range is not None and segment.start < dirty_range[1] and segment.end > dirty_range[0]
+
+        if (
+            forced
+            or entry is None
+            or entry.get("fingerprint") != fingerprint
+            or not (segments_dir / segment.file_name).exists()
+        ):
+            stale.append(segment)
+
+        manifest_entries.append({
+            "file": segment.file_name,
+            "start": segment.start,
+            "end": segment.end,
+            "fingerprint": fingerprint,
+        })
+
+    logger.info("Rendering %d of %d timeline segments for %s",
+                len(stale), len(segments), output_path)
+
+    source_clips: dict[str, VideoFileClip] = {}
+    try:
+        for done, segment in enumerate(stale, start=1):
+            _render_segment(segment, ordered_clips, source_clips,
+                            base_size, segments_dir / segment.file_name, profile)
+            # Leave the last few percent for the final concat.
+            report(0.95 * done / len(stale))
+    finally:
+        for source in source_clips.values():
+            source.close()
+
+    (segments_dir / SEGMENT_MANIFEST).write_text(json.dumps({
+        "fps": fps,
+        "size": list(base_size),
+        "duration": target_duration,
+        "segments": manifest_entries,
+    }, indent=2))
+
+    wanted = {entry["file"] for entry in manifest_entries} | {SEGMENT_MANIFEST}
+    for path in segments_dir.iterdir():
+        if path.name not in wanted:
+            path.unlink(missing_ok=True)
+
+    with tempfile.TemporaryDirectory(dir=Path(output_path).parent, prefix=".concat-") as work_dir:
+        entries = [_concat_entry(str(segments_dir / entry["file"]))
+                   for entry in manifest_entries]
+        _concat_with_audio(entries, audio_path,
+                           target_duration, output_path, work_dir, profile)
+
+
+def _render_segment(
+    segment: _Segment,
+    ordered_clips: list[TimelineClip],
+    source_clips: dict[str, VideoFileClip],
+    base_size: tuple[int, int],
+    segment_path: Path,
+    profile: EncoderProfile,
+) -> None:
+    layers = []
+    composite = None
+
+    try:
+        for c in ordered_clips:
+            if not _overlaps(c, segment.start, segment.end):
+                continue
+
+            source = source_clips.get(c.url)
+            if source is None:
+                # Let ffmpeg scale while decoding; far cheaper than resizing
+                # every frame afterwards, which matters most for previews.
+                target = None
+                if probe_video(c.url).size != tuple(base_size):
+                    target = tuple(base_size)
+                source = source_clips[c.url] = VideoFileClip(
+                    c.url, target_resolution=target)
+
+            usable_duration = min(c.duration_seconds, source.duration)
+            clip_from = max(0.0, segment.start - c.start_seconds)
+            clip_to = min(usable_duration, segment.end - c.start_seconds)
+            if clip_to <= clip_from:
+                continue
+
+            layer = source.subclipped(clip_from, clip_to)
+            if tuple(source.size) != tuple(base_size):
+                layer = layer.resized(base_size)
+            layers.append(layer.with_start(
+                max(0.0, c.start_seconds - segment.start)))
+
+        frame_count = segment.end_frame - segment.start_frame
+        # moviepy writes int(duration * fps) frames; the extra half frame
+        # keeps float error from dropping the last one.
+        duration = (frame_count + 0.5) / segment.fps
+
+        composite = CompositeVideoClip(
+            [ColorClip(size=base_size, color=(0, 0, 0), duration=duration), *layers],
+            size=base_size,
+        ).with_duration(duration)
+
+        tmp_path = segment_path.with_suffix(".tmp.mp4")
+        composite.write_videofile(
+            str(tmp_path),
+            fps=segment.fps,
+            codec="libx264",
+            preset=profile.preset,
+            threads=profile.threads,
+            pixel_format=profile.pixel_format,
+            ffmpeg_params=["-crf", str(profile.crf)],
+            audio=False,
+            logger=None,
+        )
+        os.replace(tmp_path, segment_path)
+
+    finally:
+        if composite is not None:
+            composite.close()
+        for layer in layers:
+            layer.close()
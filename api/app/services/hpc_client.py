@@ -1,64 +1,121 @@
-import asyncssh
+import os
+import shlex
+import tempfile
 from typing import Optional
 
+import asyncssh
 
-class HpcClient:
-    def __init__(self, settings):
-        self.settings = settings
-        self._conn: Optional[asyncssh.SSHClientConnection] = None
-        self._sftp: Optional[asyncssh.SFTPClient] = None
+from app.core.config import Settings
+from app.services.hpc_pool import PooledConnection, get_hpc_pool
+from app.services.metrics import TRANSFER_BYTES, command_stage, track_stage
+
+
+class HpcBackend:
+    """What the app needs from the cluster: shell commands and file transfer.
+
+    Subclasses are async context managers and implement ``run`` and
+    ``sftp``; the SFTP object must support ``open``, ``put``, ``get``,
+    ``remove`` and ``posix_rename`` like ``asyncssh.SFTPClient``.
+    """
 
     async def __aenter__(self):
-        self._conn = await asyncssh.connect(
-            self.settings.hpc_host,
-            username=self.settings.hpc_user,
-            client_keys=[self.settings.hpc_ssh_key],
-            known_hosts=self.settings.known_hosts,
-            login_timeout=15,
-            keepalive_interval=30,
-            keepalive_count_max=3,
-        )
         return self
 
     async def __aexit__(self, exc_type, exc, tb):
-        if self._sftp:
-            self._sftp.exit()
-            self._sftp = None
-        if self._conn:
-            self._conn.close()
-            await self._conn.wait_closed()
-            self._conn = None
+        pass
 
     async def run(self, command: str, check: bool = True) -> str:
-        assert self._conn is not None
+        raise NotImplementedError
 
-        result = await self._conn.run(command, check=check)
-
-        rc, out, err = result.returncode, result.stdout, result.stderr
-        if rc != 0:
-            raise RuntimeError(
-                f"command failed rc={rc}, stderr={err.strip()}, stdout={out.strip()}"
-            )
-        return out
-
-    async def sftp(self) -> asyncssh.SFTPClient:
-        assert self._conn is not None
-        if not self._sftp:
-            self._sftp = await self._conn.start_sftp_client()
-        return self._sftp
+    async def sftp(self):
+        raise NotImplementedError
 
     async def mkdir(self, remote_dir: str) -> None:
-        await self.run(f"mkdir -p {remote_dir}")
+        await self.run(f"mkdir -p {shlex.quote(str(remote_dir))}")
 
     async def sftp_put(self, local_path: str, remote_path: str) -> None:
         sftp = await self.sftp()
-        await sftp.put(local_path, remote_path)
+        with track_stage("sftp_put"):
+            await sftp.put(local_path, remote_path)
+        TRANSFER_BYTES.labels("put").inc(os.path.getsize(local_path))
 
     async def sftp_get(self, remote_path: str, local_path: str) -> None:
+        """Download into a temp file next to ``local_path`` and rename it
+        into place, so readers never see a partly written file."""
         sftp = await self.sftp()
-        await sftp.get(remote_path, local_path)
+        directory, name = os.path.split(os.path.abspath(local_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}.", suffix=".tmp")
+        os.close(fd)
+        try:
+            with track_stage("sftp_get"):
+                await sftp.get(remote_path, tmp_path)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, local_path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        TRANSFER_BYTES.labels("get").inc(size)
 
     async def sftp_put_text(self, text: str, remote_path: str, encoding: str = "utf-8") -> None:
         sftp = await self.sftp()
         async with sftp.open(remote_path, "w", encoding=encoding) as f:
             await f.write(text)
+
+
+def open_hpc_client(settings: Settings) -> HpcBackend:
+    """Client for the backend selected by ``HPC_BACKEND``."""
+    if settings.backend == "local":
+        from app.services.hpc_local import LocalHpcClient
+
+        return LocalHpcClient(settings)
+    return HpcClient(settings)
+
+
+class HpcClient(HpcBackend):
+    """Lease on a pooled SSH connection.
+
+    Entering the context borrows an already authenticated connection from the
+    process-wide pool instead of doing a fresh SSH handshake; exiting returns
+    it. Exec channels and the SFTP session are multiplexed over that
+    connection.
+    """
+
+    def __init__(self, settings):
+        self.settings = settings
+        self._conn: Optional[PooledConnection] = None
+
+    async def __aenter__(self):
+        self._conn = await get_hpc_pool(self.settings).acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._conn:
+            get_hpc_pool(self.settings).release(self._conn)
+            self._conn = None
+
+    async def _connection(self) -> PooledConnection:
+        assert self._conn is not None
+        if not self._conn.usable:
+            self._conn = await get_hpc_pool(self.settings).replace(self._conn)
+        return self._conn
+
+    async def run(self, command: str, check: bool = True) -> str:
+        pooled = await self._connection()
+
+        async with pooled.channel() as conn:
+            with track_stage(command_stage(command)):
+                result = await conn.run(command, check=check)
+
+        rc, out, err = result.returncode, result.stdout, result.stderr
+        if rc != 0:
+            raise RuntimeError(
+                f"command failed rc={rc}, stderr={err.strip()}, stdout={out.strip()}"
+            )
+        return out
+
+    async def sftp(self) -> asyncssh.SFTPClient:
+        pooled = await self._connection()
+        return await pooled.sftp()
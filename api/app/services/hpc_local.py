@@ -0,0 +1,84 @@
+import asyncio
+import os
+import shlex
+import shutil
+
+from app.services import slurm_sim
+from app.services.hpc_client import HpcBackend
+from app.services.metrics import command_stage, track_stage
+
+
+class LocalFile:
+    def __init__(self, path: str, mode: str, encoding: str | None) -> None:
+        self._file = open(path, mode, encoding=None if "b" in mode else encoding)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._file.close()
+
+    async def write(self, data) -> None:
+        await asyncio.to_thread(self._file.write, data)
+
+    async def read(self, size: int = -1):
+        return await asyncio.to_thread(self._file.read, size)
+
+
+class LocalSftp:
+    """The subset of ``asyncssh.SFTPClient`` the app uses, on local files."""
+
+    def open(self, path: str, mode: str = "r", encoding: str | None = "utf-8") -> LocalFile:
+        return LocalFile(str(path), mode, encoding)
+
+    async def put(self, local_path: str, remote_path: str) -> None:
+        await asyncio.to_thread(shutil.copyfile, local_path, remote_path)
+
+    async def get(self, remote_path: str, local_path: str) -> None:
+        await asyncio.to_thread(shutil.copyfile, remote_path, local_path)
+
+    async def remove(self, path: str) -> None:
+        os.unlink(path)
+
+    async def posix_rename(self, old_path: str, new_path: str) -> None:
+        os.replace(old_path, new_path)
+
+
+class LocalHpcClient(HpcBackend):
+    """Runs the cluster side on this machine.
+
+    Remote paths are local paths, so ``HPC_BASE`` should point at a scratch
+    directory that the API and the worker share. ``sbatch``, ``sacct`` and
+    ``scancel`` are answered by the simulator in ``slurm_sim``; any other
+    command runs in a local bash.
+    """
+
+    def __init__(self, settings):
+        self.settings = settings
+
+    async def run(self, command: str, check: bool = True) -> str:
+        try:
+            argv = shlex.split(command)
+        except ValueError:
+            argv = []
+
+        with track_stage(command_stage(command)):
+            if argv and argv[0] in slurm_sim.COMMANDS:
+                rc, out, err = await asyncio.to_thread(slurm_sim.dispatch, argv)
+            else:
+                process = await asyncio.create_subprocess_exec(
+                    "bash", "-c", command,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                )
+                stdout, stderr = await process.communicate()
+                rc, out, err = process.returncode, stdout.decode(), stderr.decode()
+
+            if rc != 0:
+                raise RuntimeError(
+                    f"command failed rc={rc}, stderr={err.strip()}, stdout={out.strip()}"
+                )
+        return out
+
+    async def sftp(self) -> LocalSftp:
+        return LocalSftp()
@@ -0,0 +1,280 @@
+import asyncio
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import asyncssh
+
+from app.core.config import Settings
+from app.services.metrics import track_stage
+
+logger = logging.getLogger(__name__)
+
+
+class PooledConnection:
+    """An authenticated SSH connection shared by several HpcClient leases.
+
+    Exec channels are capped by a semaphore so we never exceed the server's
+    MaxSessions. The SFTP session is opened lazily, shared by every lease and
+    holds one of the channel slots for as long as it lives.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, conn: asyncssh.SSHClientConnection, max_channels: int) -> None:
+        self.id = next(self._ids)
+        self.conn = conn
+        self.max_channels = max_channels
+        self.leases = 0
+        self.active_channels = 0
+        self.created_at = time.monotonic()
+        self.last_checked = self.created_at
+        # Failed a health check while leased; no new leases, closed once
+        # the last one is returned.
+        self.unhealthy = False
+        self._channels = asyncio.Semaphore(max_channels)
+        self._sftp: Optional[asyncssh.SFTPClient] = None
+        self._sftp_lock = asyncio.Lock()
+
+    @property
+    def closed(self) -> bool:
+        return self.conn.is_closed()
+
+    @property
+    def usable(self) -> bool:
+        return not self.closed and not self.unhealthy
+
+    @asynccontextmanager
+    async def channel(self) -> AsyncIterator[asyncssh.SSHClientConnection]:
+        async with self._channels:
+            self.active_channels += 1
+            try:
+                yield self.conn
+            finally:
+                self.active_channels -= 1
+
+    async def sftp(self) -> asyncssh.SFTPClient:
+        async with self._sftp_lock:
+            if self._sftp is None:
+                await self._channels.acquire()
+                try:
+                    self._sftp = await self.conn.start_sftp_client()
+                except BaseException:
+                    self._channels.release()
+                    raise
+            return self._sftp
+
+    async def close(self) -> None:
+        if self._sftp is not None:
+            self._sftp.exit()
+            self._sftp = None
+        self.conn.close()
+        await self.conn.wait_closed()
+
+    def stats(self) -> dict:
+        return {
+            "id": self.id,
+            "age_seconds": round(time.monotonic() - self.created_at, 1),
+            "leases": self.leases,
+            "active_channels": self.active_channels,
+            "max_channels": self.max_channels,
+            "sftp_open": self._sftp is not None,
+            "closed": self.closed,
+            "unhealthy": self.unhealthy,
+        }
+
+
+class HpcConnectionPool:
+    def __init__(self, settings: Settings) -> None:
+        self.settings = settings
+        self.size = max(1, settings.pool_size)
+        self.max_channels = max(2, settings.max_channels_per_connection)
+        self._connections: list[PooledConnection] = []
+        self._lock = asyncio.Lock()
+        self._connects = 0
+        self._reconnects = 0
+        self._closed = False
+
+    async def _connect(self) -> PooledConnection:
+        started = time.monotonic()
+        with track_stage("hpc_connect"):
+            conn = await asyncssh.connect(
+                self.settings.hpc_host,
+                username=self.settings.hpc_user,
+                client_keys=[self.settings.hpc_ssh_key],
+                known_hosts=self.settings.known_hosts,
+                login_timeout=15,
+                keepalive_interval=30,
+                keepalive_count_max=3,
+            )
+        self._connects += 1
+        pooled = PooledConnection(conn, self.max_channels)
+        logger.info("Opened pooled SSH connection %s to %s in %.2fs",
+                    pooled.id, self.settings.hpc_host, time.monotonic() - started)
+        return pooled
+
+    def _check_due(self, pooled: PooledConnection) -> bool:
+        return time.monotonic() - pooled.last_checked >= self.settings.health_check_interval
+
+    async def _is_healthy(self, pooled: PooledConnection) -> bool:
+        if pooled.closed:
+            return False
+
+        async def probe() -> None:
+            async with pooled.channel() as conn:
+                await conn.run("true", check=True)
+
+        try:
+            # Waiting for a free channel counts against the timeout too.
+            await asyncio.wait_for(probe(), timeout=15)
+        except Exception:
+            logger.warning(
+                "Pooled SSH connection %s failed health check", pooled.id, exc_info=True)
+            return False
+
+        pooled.last_checked = time.monotonic()
+        return True
+
+    async def _discard(self, pooled: PooledConnection) -> None:
+        if pooled in self._connections:
+            self._connections.remove(pooled)
+            self._reconnects += 1
+        try:
+            await pooled.close()
+        except Exception:
+            logger.debug("Error closing pooled SSH connection %s",
+                         pooled.id, exc_info=True)
+
+    async def acquire(self) -> PooledConnection:
+        if self._closed:
+            raise RuntimeError("HPC connection pool is closed")
+
+        # Health checks are round trips, so they run concurrently and
+        # without the lock. Bumping last_checked first keeps concurrent
+        # callers from checking the same connection again.
+        async with self._lock:
+            due = [c for c in self._connections if c.usable and self._check_due(c)]
+            for pooled in due:
+                pooled.last_checked = time.monotonic()
+
+        if due:
+            results = await asyncio.gather(*(self._is_healthy(c) for c in due))
+            for pooled, healthy in zip(due, results):
+                if not healthy:
+                    pooled.unhealthy = True
+
+        async with self._lock:
+            # Connections others still hold leases on are closed later, so
+            # their commands and transfers are not cut off.
+            for pooled in list(self._connections):
+                if not pooled.usable and pooled.leases == 0:
+                    await self._discard(pooled)
+
+            usable = [c for c in self._connections if c.usable]
+            idle = [c for c in usable if c.leases == 0]
+            if idle:
+                pooled = idle[0]
+            elif len(usable) < self.size:
+                pooled = await self._connect()
+                self._connections.append(pooled)
+            else:
+                pooled = min(usable, key=lambda c: c.leases)
+
+            pooled.leases += 1
+            return pooled
+
+    def release(self, pooled: PooledConnection) -> None:
+        pooled.leases = max(0, pooled.leases - 1)
+
+    async def replace(self, pooled: PooledConnection) -> PooledConnection:
+        """Swap a lease on a dead connection for one on a healthy connection."""
+        self.release(pooled)
+        async with self._lock:
+            if pooled.leases == 0:
+                await self._discard(pooled)
+            else:
+                pooled.unhealthy = True
+        return await self.acquire()
+
+    async def close(self) -> None:
+        self._closed = True
+        async with self._lock:
+            connections, self._connections = self._connections, []
+            for pooled in connections:
+                await pooled.close()
+
+    def abort(self) -> None:
+        """Drop the connections without a clean close, for a pool whose
+        event loop is no longer running."""
+        self._closed = True
+        connections, self._connections = self._connections, []
+        for pooled in connections:
+            try:
+                pooled.conn.abort()
+            except Exception:
+                logger.debug("Failed to abort pooled SSH connection %s",
+                             pooled.id, exc_info=True)
+
+    def stats(self) -> dict:
+        return {
+            "host": self.settings.hpc_host,
+            "size": self.size,
+            "max_channels_per_connection": self.max_channels,
+            "open_connections": len(self._connections),
+            "leases": sum(c.leases for c in self._connections),
+            "active_channels": sum(c.active_channels for c in self._connections),
+            "connects_total": self._connects,
+            "reconnects_total": self._reconnects,
+            "connections": [c.stats() for c in self._connections],
+        }
+
+
+_pool: HpcConnectionPool | None = None
+_pool_loop: asyncio.AbstractEventLoop | None = None
+# Closes of replaced pools that are still running, kept until they finish.
+_retiring: set[asyncio.Task] = set()
+
+
+def _retire_pool(pool: HpcConnectionPool, loop: asyncio.AbstractEventLoop) -> None:
+    """Close a replaced pool on the loop its connections are bound to."""
+    if loop is asyncio.get_running_loop():
+        task = loop.create_task(pool.close())
+        _retiring.add(task)
+        task.add_done_callback(_retiring.discard)
+    elif loop.is_running():
+        asyncio.run_coroutine_threadsafe(pool.close(), loop)
+    else:
+        pool.abort()
+
+
+def get_hpc_pool(settings: Settings) -> HpcConnectionPool:
+    """Return the process-wide pool, creating it on first use.
+
+    asyncssh connections are bound to the event loop they were opened on, so
+    a new pool is created if we are called from a different loop; the old
+    one is closed on its own loop.
+    """
+    global _pool, _pool_loop
+
+    loop = asyncio.get_running_loop()
+    if _pool is None or _pool_loop is not loop or _pool.settings != settings:
+        if _pool is not None:
+            _retire_pool(_pool, _pool_loop)
+        _pool = HpcConnectionPool(settings)
+        _pool_loop = loop
+    return _pool
+
+
+def hpc_pool_stats() -> dict | None:
+    return _pool.stats() if _pool is not None else None
+
+
+async def close_hpc_pool() -> None:
+    global _pool, _pool_loop
+
+    if _pool is not None:
+        await _pool.close()
+    _pool = None
+    _pool_loop = None
@@ -0,0 +1,219 @@
+import logging
+import math
+import shlex
+import statistics
+from dataclasses import dataclass
+
+from app.core.config import PartitionLimits, get_slurm_config
+from app.db import SessionLocal
+from app.models import SlurmJobStat
+from app.repositories.slurm_job_stat_repository import SlurmJobStatRepository
+from app.services.hpc_client import open_hpc_client
+
+logger = logging.getLogger(__name__)
+
+FULL_JOB = "full"
+SCENE_JOB = "scene"
+
+# Per-clip setup (model load, encode) in seconds-of-video equivalents.
+CLIP_OVERHEAD_SECONDS = 2.0
+
+QUANTILE = 0.9
+TIME_HEADROOM = 1.5
+MEM_HEADROOM = 1.25
+CPU_HEADROOM = 1.25
+MIN_TIME_SECONDS = 15 * 60
+MIN_MEM_MB = 4 * 1024
+
+# Runs that finished or hit a limit say something about what a job needs.
+LEARNABLE_STATES = {"COMPLETED", "TIMEOUT", "OUT_OF_MEMORY"}
+
+
+@dataclass(frozen=True)
+class ResourceRequest:
+    partition: str
+    time_seconds: int
+    cpus: int
+    mem_mb: int
+
+    def sbatch_directives(self) -> str:
+        return "\n".join([
+            f"#SBATCH --time={format_slurm_time(self.time_seconds)}",
+            "#SBATCH --ntasks=1",
+            "#SBATCH --nodes=1",
+            f"#SBATCH --partition={self.partition}",
+            f"#SBATCH --cpus-per-task={self.cpus}",
+            f"#SBATCH --mem={self.mem_mb}M",
+        ])
+
+
+def format_slurm_time(seconds: int) -> str:
+    days, rest = divmod(int(seconds), 86400)
+    hours, rest = divmod(rest, 3600)
+    minutes, secs = divmod(rest, 60)
+    clock = f"{hours:02d}:{minutes:02d}:{secs:02d}"
+    return f"{days}-{clock}" if days else clock
+
+
+def parse_slurm_time(value: str) -> float | None:
+    """``[D-][HH:]MM:SS[.mmm]`` to seconds; None for empty or UNLIMITED."""
+    value = value.strip()
+    if not value or not value[0].isdigit():
+        return None
+    days, _, clock = value.rpartition("-")
+    parts = [float(part) for part in clock.split(":")]
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + part
+    return seconds + int(days or 0) * 86400
+
+
+def parse_slurm_memory(value: str) -> float | None:
+    """``"1234.5K"``, ``"48G"``, ``"48Gn"`` to MiB."""
+    value = value.strip().rstrip("nc")
+    if not value:
+        return None
+    scale = {"K": 1 / 1024, "M": 1, "G": 1024, "T": 1024 * 1024}
+    if value[-1].upper() in scale:
+        return float(value[:-1]) * scale[value[-1].upper()]
+    # Plain numbers are bytes.
+    return float(value) / (1024 * 1024)
+
+
+def work_units(video_seconds: float, clip_count: int) -> float:
+    return max(1.0, video_seconds + CLIP_OVERHEAD_SECONDS * clip_count)
+
+
+def _quantile(values: list[float]) -> float:
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[round(QUANTILE * 100) - 1]
+
+
+def estimate_resources(
+    limits: PartitionLimits,
+    video_seconds: float | None,
+    clip_count: int,
+    history: list[SlurmJobStat],
+    min_history: int,
+) -> ResourceRequest:
+    """Size a job from past runs of the same kind on the same partition.
+
+    Time scales with the workload at the 90th percentile of past seconds
+    per work unit; memory and CPUs are the 90th percentile of past peak
+    RSS and average CPU use. Runs that hit their time or memory limit count
+    double, since they needed more than they got. Without enough history,
+    or without a known workload, the partition's limits are requested.
+    """
+    ceiling = ResourceRequest(
+        partition=limits.name,
+        time_seconds=limits.max_time_seconds,
+        cpus=limits.max_cpus,
+        mem_mb=limits.max_mem_mb,
+    )
+
+    usable = [
+        stat for stat in history
+        if stat.state in LEARNABLE_STATES and stat.elapsed_seconds > 0
+    ]
+    if video_seconds is None or len(usable) < min_history:
+        return ceiling
+
+    rates = [
+        stat.elapsed_seconds / work_units(stat.video_seconds, stat.clip_count)
+        * (2 if stat.state == "TIMEOUT" else 1)
+        for stat in usable
+    ]
+    memory = [
+        max(stat.max_rss_mb, stat.requested_mem_mb * 2) if stat.state == "OUT_OF_MEMORY"
+        else stat.max_rss_mb
+        for stat in usable
+    ]
+    cpu_use = [stat.total_cpu_seconds / stat.elapsed_seconds for stat in usable]
+
+    time_seconds = _quantile(rates) * work_units(video_seconds, clip_count) * TIME_HEADROOM
+    mem_mb = _quantile(memory) * MEM_HEADROOM
+    cpus = math.ceil(_quantile(cpu_use) * CPU_HEADROOM)
+
+    return ResourceRequest(
+        partition=limits.name,
+        time_seconds=int(min(max(time_seconds, MIN_TIME_SECONDS), limits.max_time_seconds)),
+        cpus=min(max(cpus, 1), limits.max_cpus),
+        mem_mb=int(min(max(mem_mb, MIN_MEM_MB), limits.max_mem_mb)),
+    )
+
+
+def resources_for(kind: str, video_seconds: float | None, clip_count: int) -> ResourceRequest:
+    settings = get_slurm_config()
+    limits = settings.full_partition if kind == FULL_JOB else settings.scene_partition
+
+    with SessionLocal() as db:
+        history = SlurmJobStatRepository(db).recent(kind, limits.name, settings.history_size)
+        request = estimate_resources(
+            limits, video_seconds, clip_count, history, settings.min_history)
+
+    logger.info("Requesting %s for %s job (%.1fs of video, %d clips, %d past runs)",
+                request, kind, video_seconds or 0, clip_count, len(history))
+    return request
+
+
+async def record_job_stats(
+    settings,
+    job_id: str,
+    kind: str,
+    video_seconds: float | None,
+    clip_count: int,
+) -> None:
+    """Store the ``sacct`` accounting of a finished job. Best effort."""
+    if video_seconds is None:
+        return
+
+    cmd = (
+        f"sacct -j {shlex.quote(job_id)} --units=M --parsable2 --noheader "
+        "--format=JobID,State,Partition,Elapsed,TotalCPU,MaxRSS,Timelimit,ReqCPUS,ReqMem"
+    )
+    try:
+        async with open_hpc_client(settings) as client:
+            output = await client.run(cmd)
+
+        stat = parse_sacct_stats(output, job_id)
+        if stat is None:
+            logger.warning("No accounting found for Slurm job %s", job_id)
+            return
+        stat.kind = kind
+        stat.video_seconds = video_seconds
+        stat.clip_count = clip_count
+
+        with SessionLocal() as db:
+            SlurmJobStatRepository(db).add(stat)
+            db.commit()
+    except Exception:
+        logger.warning("Failed to record accounting for Slurm job %s", job_id, exc_info=True)
+
+
+def parse_sacct_stats(output: str, job_id: str) -> SlurmJobStat | None:
+    """Build a stat from the job's own line plus the peak RSS of its steps."""
+    stat = None
+    max_rss = 0.0
+    for line in output.strip().splitlines():
+        fields = line.split("|")
+        if len(fields) != 9:
+            continue
+        line_id, state, partition, elapsed, total_cpu, rss, timelimit, cpus, mem = fields
+        max_rss = max(max_rss, parse_slurm_memory(rss) or 0.0)
+        if line_id.strip() != job_id:
+            continue
+        stat = SlurmJobStat(
+            job_id=job_id,
+            state=state.strip().upper().split()[0] if state.strip() else "UNKNOWN",
+            partition=partition.strip(),
+            elapsed_seconds=parse_slurm_time(elapsed) or 0.0,
+            total_cpu_seconds=parse_slurm_time(total_cpu) or 0.0,
+            requested_time_seconds=int(parse_slurm_time(timelimit) or 0),
+            requested_cpus=int(cpus or 0),
+            requested_mem_mb=int(parse_slurm_memory(mem) or 0),
+        )
+
+    if stat is not None:
+        stat.max_rss_mb = max_rss
+    return stat
@@ -0,0 +1,59 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from prometheus_client import Counter, Histogram
+
+# From a quick sacct call up to a long Slurm job.
+STAGE_BUCKETS = (
+    0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60,
+    120, 300, 600, 1800, 3600, 7200, 14400, 43200,
+)
+
+# Commands whose latency is reported as a stage of its own.
+SLURM_COMMANDS = ("sbatch", "sacct", "scancel")
+
+STAGE_SECONDS = Histogram(
+    "pipeline_stage_seconds",
+    "Time spent in a pipeline stage.",
+    ["stage", "outcome"],
+    buckets=STAGE_BUCKETS,
+)
+TRANSFER_BYTES = Counter(
+    "hpc_transfer_bytes",
+    "Bytes copied to or from the HPC.",
+    ["direction"],
+)
+REMOTE_FILE_POLLS = Counter(
+    "remote_file_polls",
+    "Checks for a job output file on the HPC.",
+    ["file", "found"],
+)
+
+
+def observe_stage(stage: str, seconds: float, outcome: str = "ok") -> None:
+    STAGE_SECONDS.labels(stage, outcome).observe(seconds)
+
+
+@contextmanager
+def track_stage(stage: str) -> Iterator[None]:
+    """Time the block as ``stage``; the outcome is ok, error or cancelled."""
+    started = time.monotonic()
+    outcome = "ok"
+    try:
+        yield
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        observe_stage(stage, time.monotonic() - started, outcome)
+
+
+def command_stage(command: str) -> str:
+    """``"sbatch job.sbatch"`` -> ``"sbatch"``; other commands are ``"hpc_command"``."""
+    program = command.split(maxsplit=1)[0] if command.strip() else ""
+    return program if program in SLURM_COMMANDS else "hpc_command"
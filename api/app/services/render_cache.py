@@ -0,0 +1,178 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Sequence
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+STATS_FILE = "stats.json"
+
+# path -> (size, mtime_ns, sha256), so unchanged files are hashed once per
+# process. One entry per path, least recently used dropped past the limit.
+_digests: OrderedDict[str, tuple[int, int, str]] = OrderedDict()
+DIGEST_MEMO_SIZE = 4096
+_digests_lock = threading.Lock()
+
+
+def file_digest(path: str) -> str:
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+
+    with _digests_lock:
+        memo = _digests.get(path)
+        if memo is not None and memo[:2] == (stat.st_size, stat.st_mtime_ns):
+            _digests.move_to_end(path)
+            return memo[2]
+
+    with open(path, "rb") as f:
+        digest = hashlib.file_digest(f, "sha256").hexdigest()
+
+    with _digests_lock:
+        _digests[path] = (stat.st_size, stat.st_mtime_ns, digest)
+        _digests.move_to_end(path)
+        while len(_digests) > DIGEST_MEMO_SIZE:
+            _digests.popitem(last=False)
+    return digest
+
+
+def render_key(clips: Sequence, audio_path: str, encoder: dict) -> str:
+    """Key a render on the content and placement of its inputs.
+
+    ``clips`` must already be in timeline order. Paths are not part of the
+    key, so identical inputs at different locations share a cache entry.
+    """
+    payload = {
+        "version": CACHE_VERSION,
+        "clips": [
+            [file_digest(c.url), c.clip_index, c.start_seconds,
+             c.end_seconds, c.duration_seconds]
+            for c in clips
+        ],
+        "audio": file_digest(audio_path),
+        "encoder": encoder,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+class RenderCache:
+    """Finished renders stored by key, evicted least recently used first.
+
+    Entries are hard-linked to and from the outputs, so a hit costs no copy.
+    Hit and miss counters live in a stats file next to the entries because
+    renders run in several processes.
+    """
+
+    def __init__(self, root: Path, max_bytes: int) -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+
+    def entry_path(self, key: str) -> Path:
+        return self.root / f"{key}.mp4"
+
+    def fetch(self, key: str, output_path: str) -> bool:
+        """Place the cached render at ``output_path``; False on a miss."""
+        entry = self.entry_path(key)
+        try:
+            # Touch first so a concurrent eviction cannot pick the entry.
+            os.utime(entry)
+            link_or_copy(entry, Path(output_path))
+        except FileNotFoundError:
+            self._count("misses")
+            return False
+
+        self._count("hits")
+        logger.info("Render cache hit %s for %s", key[:12], output_path)
+        return True
+
+    def store(self, key: str, output_path: str) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        link_or_copy(Path(output_path), self.entry_path(key))
+        self.evict()
+
+    def evict(self) -> list[str]:
+        evicted = []
+        with self._locked():
+            entries = sorted(
+                (p.stat().st_mtime_ns, p.stat().st_size, p)
+                for p in self.root.glob("*.mp4")
+            )
+            total = sum(size for _, size, _ in entries)
+
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+                evicted.append(path.stem)
+
+        if evicted:
+            self._count("evictions", len(evicted))
+            logger.info("Evicted %d render cache entries", len(evicted))
+        return evicted
+
+    def stats(self) -> dict:
+        entries = [p.stat().st_size for p in self.root.glob("*.mp4")]
+        counters = self._read_counters()
+        lookups = counters.get("hits", 0) + counters.get("misses", 0)
+
+        return {
+            "entries": len(entries),
+            "bytes": sum(entries),
+            "max_bytes": self.max_bytes,
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "evictions": counters.get("evictions", 0),
+            "hit_ratio": counters.get("hits", 0) / lookups if lookups else None,
+        }
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / ".lock", "a+") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _read_counters(self) -> dict[str, int]:
+        try:
+            return json.loads((self.root / STATS_FILE).read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        try:
+            with self._locked():
+                counters = self._read_counters()
+                counters[name] = counters.get(name, 0) + amount
+                tmp_path = self.root / f"{STATS_FILE}.tmp"
+                tmp_path.write_text(json.dumps(counters))
+                os.replace(tmp_path, self.root / STATS_FILE)
+        except OSError:
+            logger.warning("Failed to update render cache stats", exc_info=True)
+
+
+def link_or_copy(src: Path, dst: Path) -> None:
+    if dst.exists() and os.path.samefile(src, dst):
+        return
+
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = dst.with_name(f".{dst.name}.{os.getpid()}.tmp")
+    try:
+        os.link(src, tmp_path)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        # Different filesystem or a leftover temp file.
+        tmp_path.unlink(missing_ok=True)
+        shutil.copy2(src, tmp_path)
+    os.replace(tmp_path, dst)
@@ -0,0 +1,198 @@
+import asyncio
+import fcntl
+import logging
+import multiprocessing
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Sequence
+
+from app.core.config import get_encoder_profile, get_render_config
+from app.db import SessionLocal
+from app.repositories.task_repository import TaskRepository
+from app.services.compositor import TimelineClip, render_timeline
+from app.services.render_cache import RenderCache
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RenderClip:
+    """Picklable snapshot of the clip fields the compositor needs."""
+
+    url: str | None
+    clip_index: int
+    start_seconds: float
+    end_seconds: float
+    duration_seconds: float
+
+
+def snapshot_clips(clips: Sequence[TimelineClip]) -> list[RenderClip]:
+    return [
+        RenderClip(
+            url=c.url,
+            clip_index=c.clip_index,
+            start_seconds=c.start_seconds,
+            end_seconds=c.end_seconds,
+            duration_seconds=c.duration_seconds,
+        )
+        for c in clips
+    ]
+
+
+_executor: ProcessPoolExecutor | None = None
+
+
+def get_render_pool() -> ProcessPoolExecutor:
+    global _executor
+
+    if _executor is None:
+        settings = get_render_config()
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+    return _executor
+
+
+def shutdown_render_pool() -> None:
+    global _executor
+
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+    _executor = None
+
+
+def submit_render(
+    task_id: int,
+    clips: Sequence[TimelineClip],
+    audio_path: str,
+    output_path: str,
+    dirty_range: tuple[float, float] | None = None,
+    profile: str | None = None,
+    label: str = "final video",
+) -> Future:
+    return get_render_pool().submit(
+        _render_job,
+        int(task_id),
+        snapshot_clips(clips),
+        str(audio_path),
+        str(output_path),
+        dirty_range,
+        profile,
+        label,
+    )
+
+
+async def render(
+    task_id: int,
+    clips: Sequence[TimelineClip],
+    audio_path: str,
+    output_path: str,
+    dirty_range: tuple[float, float] | None = None,
+    profile: str | None = None,
+    label: str = "final video",
+) -> str:
+    """Render in a worker process without blocking the event loop."""
+    future = submit_render(task_id, clips, audio_path,
+                           output_path, dirty_range, profile, label)
+    return await asyncio.wrap_future(future)
+
+
+def get_render_cache() -> RenderCache | None:
+    settings = get_render_config()
+    if settings.cache_max_bytes <= 0:
+        return None
+    return RenderCache(settings.cache_dir, settings.cache_max_bytes)
+
+
+def _init_worker() -> None:
+    logging.basicConfig(level=logging.INFO)
+
+
+@contextmanager
+def _host_render_slot(slots_dir: Path, limit: int) -> Iterator[int]:
+    """Hold one of ``limit`` host-wide render slots.
+
+    The slots are flock'ed files, so the limit applies across every API and
+    worker process on the machine, not just this pool.
+    """
+    slots_dir.mkdir(parents=True, exist_ok=True)
+
+    while True:
+        for slot in range(limit):
+            handle = open(slots_dir / f"slot-{slot}.lock", "a+")
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                handle.close()
+                continue
+
+            try:
+                yield slot
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+                handle.close()
+            return
+
+        time.sleep(1.0)
+
+
+class _ProgressReporter:
+    def __init__(self, task_id: int, label: str, min_interval: float = 2.0) -> None:
+        self.task_id = task_id
+        self.label = label
+        self.min_interval = min_interval
+        self._last = 0.0
+
+    def __call__(self, fraction: float) -> None:
+        now = time.monotonic()
+        if fraction < 1.0 and now - self._last < self.min_interval:
+            return
+        self._last = now
+
+        try:
+            with SessionLocal() as db:
+                TaskRepository(db).update_state(
+                    self.task_id,
+                    message=f"Rendering {self.label} ({fraction:.0%})",
+                    progress=90 + int(9 * fraction),
+                )
+                db.commit()
+        except Exception:
+            logger.warning("Failed to report render progress for task %s",
+                           self.task_id, exc_info=True)
+
+
+def _render_job(
+    task_id: int,
+    clips: list[RenderClip],
+    audio_path: str,
+    output_path: str,
+    dirty_range: tuple[float, float] | None,
+    profile_name: str | None,
+    label: str,
+) -> str:
+    settings = get_render_config()
+    profile = get_encoder_profile(profile_name)
+
+    with _host_render_slot(settings.slots_dir, settings.host_concurrency) as slot:
+        logger.info("Rendering %s for task %s in slot %s (%s profile, %s threads)",
+                    output_path, task_id, slot, profile.name, profile.threads)
+        started = time.monotonic()
+        render_timeline(
+            clips=clips,
+            audio_path=audio_path,
+            output_path=output_path,
+            dirty_range=dirty_range,
+            progress=_ProgressReporter(task_id, label),
+            cache=get_render_cache(),
+            profile=profile,
+        )
+        logger.info("Rendered %s for task %s in %.1fs",
+                    output_path, task_id, time.monotonic() - started)
+
+    return output_path
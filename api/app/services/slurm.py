@@ -1,19 +1,40 @@
 from pathlib import Path
-from app.core.config import get_hpc_config, get_directories
-from app.services.hpc_client import HpcClient
+from app.core.config import ENCODER_PROFILES, get_hpc_config, get_directories
+from app.services.hpc_client import open_hpc_client
+from app.services.slurm_tracker import get_slurm_tracker
 from app.db import SessionLocal
+from app.repositories.audio_blob_repository import AudioBlobRepository
+from app.repositories.job_repository import JobRepository, current_job_id
+from app.repositories.render_repository import RenderRepository
 from app.repositories.task_repository import TaskRepository
+from app.repositories.track_repository import TrackRepository
+from app.schemas.segments import parse_manifest, parse_segments
 from app.models import Clip, Track, TaskRecord
 import logging
-from moviepy import VideoFileClip, AudioFileClip, CompositeVideoClip, ColorClip, concatenate_videoclips
-from app.models import TaskState
+from app.services import render_pool
+from app.services.audio_store import link_remote, put_remote_blob
+from app.services import waveform
+from app.services.beats import TARGET_CUT_SECONDS
+from app.services.metrics import REMOTE_FILE_POLLS, track_stage
+from app.services.job_templates import FULL_JOB, SCENE_JOB, ResourceRequest, record_job_stats, resources_for
+from app.services.compositor import read_render_record
+from app.services.thumbnails import generate_clip_thumbnails
+from app.models import RenderState, TaskState
 
 import asyncio
-import json
+import math
 import shlex
+import time
 
 logger = logging.getLogger(__name__)
 
+# Rendered outputs per task, in media/{task_id}/.
+RENDER_OUTPUTS = {
+    "preview": "preview_video.mp4",
+    "final": "final_video.mp4",
+}
+PREVIEW_PROFILE = "preview"
+
 
 def _set_task_state(
     task_id: int,
@@ -34,7 +55,7 @@ def _set_task_state(
         db.commit()
 
 
-async def run_and_poll_task(task_id: int, additional_prompt: str, task: TaskRecord) -> None:
+async def run_and_poll_task(task_id: int, additional_prompt: str) -> None:
 
     db = SessionLocal()
     try:
@@ -49,59 +70,226 @@ async def run_and_poll_task(task_id: int, additional_prompt: str, task: TaskReco
     finally:
         db.close()
 
-    await run_full_video_job(task_id=task_id, additional_prompt=additional_prompt, task=task)
+    await run_full_video_job(task_id=task_id, additional_prompt=additional_prompt)
 
-    await poll_video_segments(
-        task_id=task_id,
+    with SessionLocal() as db:
+        job_id = TaskRepository(db).require(task_id).job_id
+        # Waiting is a job of its own so a retry reattaches to this Slurm
+        # job instead of submitting another one.
+        JobRepository(db).enqueue(
+            "poll_full_job",
+            {"task_id": task_id, "job_id": job_id},
+            task_id=task_id,
+            max_attempts=3,
+        )
+        db.commit()
+
+
+async def poll_full_video_job(task_id: int, job_id: str) -> None:
+    """Wait for a submitted full job, then ingest and download its output."""
+    _set_task_state(
+        task_id,
+        state=TaskState.running,
+        message=f"Waiting for Slurm job {job_id}",
+        progress=50,
     )
 
-    await poll_and_store_videos(task_id, job_id=task.job_id)
+    await poll_video_segments(task_id=task_id)
+
+    await poll_and_store_videos(task_id, job_id=job_id)
+
 
+SCENE_KEYS = ("clip_id", "scene_number", "prompt", "duration_seconds", "generation")
 
-async def run_and_poll_scene_task(task_id: str, clip_id: str, scene_number: int, prompt: str, duration_seconds: float) -> None:
+
+def _current_scenes(scenes: list[dict]) -> list[dict]:
+    """Drop scenes whose clip has been regenerated again since they were
+    requested."""
+    with SessionLocal() as db:
+        return [
+            scene for scene in scenes
+            if (clip := db.get(Clip, scene["clip_id"])) is not None
+            and scene["generation"] == clip.generation
+        ]
+
+
+async def _cancel_scene_jobs(settings, job_ids: list[str]) -> None:
+    if not job_ids:
+        return
+    try:
+        async with open_hpc_client(settings) as client:
+            await client.run(f"scancel {' '.join(shlex.quote(job_id) for job_id in job_ids)}")
+        logger.info("Cancelled superseded scene jobs %s", ", ".join(job_ids))
+    except Exception:
+        logger.warning("Failed to cancel superseded scene jobs %s",
+                       ", ".join(job_ids), exc_info=True)
+
+
+async def run_and_poll_scene_task(
+    task_id: str,
+    clip_id: str,
+    scene_number: int,
+    prompt: str,
+    duration_seconds: float,
+    generation: int | None = None,
+) -> None:
+    """Regenerate a scene together with every other regeneration queued for
+    the task, as one Slurm job array.
+
+    Each array index is one scene. Clips are downloaded as their index
+    finishes and the preview and final video are recomposed once at the end.
+    Every request bumps the clip's ``generation``; Slurm jobs for an older
+    generation are cancelled, and their results are never downloaded or
+    composed.
+    """
     settings = get_hpc_config()
     directories = get_directories()
 
-    # slurm_destination = Path(directories.hpc_base) / "Music-Visualization-Generation-Pipeline" / \
-    #     "intermediate_files" / \
-    #     f"test_run_{task_id}" / f"scene_{scene_number}.mp4"
-    file_name = f"scene_{scene_number}.mp4"
+    with SessionLocal() as db:
+        if generation is None:
+            clip = db.get(Clip, int(clip_id))
+            if clip is None:
+                logger.info("Clip %s of task %s was deleted before its regeneration ran",
+                            clip_id, task_id)
+                return
+            generation = clip.generation
+        scenes = {int(clip_id): {
+            "clip_id": int(clip_id),
+            "scene_number": scene_number,
+            "prompt": prompt,
+            "duration_seconds": duration_seconds,
+            "generation": generation,
+        }}
+        batch_id = current_job_id.get()
+        queued = (JobRepository(db).take_queued("regenerate_scene", int(task_id), batch_id)
+                  if batch_id is not None else [])
+        for job in queued:
+            scene = {key: job.payload.get(key) for key in SCENE_KEYS}
+            previous = scenes.get(int(scene["clip_id"]))
+            if previous is None or (scene["generation"] or 0) >= previous["generation"]:
+                scenes[int(scene["clip_id"])] = scene
+        db.commit()
+
+    batch = _current_scenes(list(scenes.values()))
+    if not batch:
+        logger.info("Scene regeneration for task %s was superseded before it started", task_id)
+        return
+
+    with SessionLocal() as db:
+        superseded = [
+            clip.scene_job_id for clip in (db.get(Clip, scene["clip_id"]) for scene in batch)
+            if clip.scene_job_id
+        ]
+    await _cancel_scene_jobs(settings, superseded)
+
     slurm_destination = Path(directories.hpc_base) / "Music-Visualization-Generation-Pipeline" / \
         "intermediate_files" / \
         f"test_run_{task_id}"
-    slurm_file = slurm_destination / file_name
 
-    job_id = await run_scene_job(task_id=task_id, scene_number=scene_number, prompt=prompt, duration_seconds=duration_seconds, slurm_destination=slurm_destination)
-    await wait_for_slurm_completion(job_id=job_id, poll_interval_seconds=60.0 * 10)
+    array_id = await run_scene_array_job(task_id=task_id, scenes=batch, slurm_destination=slurm_destination)
 
-    local_file = Path(directories.media) / str(task_id) / file_name
+    with SessionLocal() as db:
+        for index, scene in enumerate(batch):
+            clip = db.get(Clip, scene["clip_id"])
+            if clip.generation == scene["generation"]:
+                clip.scene_job_id = f"{array_id}_{index}"
+        db.commit()
 
-    async with HpcClient(settings) as client:
-        # TODO: make sure it overwrites
-        await client.sftp_get(str(slurm_file), str(local_file))
+    tracker = get_slurm_tracker(settings)
 
-    with SessionLocal() as db:
-        clips = db.query(Clip).join(Track).filter(
-            Track.task_id == task_id).all()
+    async def finish(index: int, scene: dict) -> bool:
+        """Wait for one array index; returns False if it was superseded."""
+        job_id = f"{array_id}_{index}"
+        try:
+            await tracker.wait(job_id, timeout_seconds=60 * 60 * 12)
+        except RuntimeError:
+            if not _current_scenes([scene]):
+                return False
+            await record_job_stats(settings, job_id, SCENE_JOB, float(scene["duration_seconds"]), 1)
+            raise
+        finally:
+            with SessionLocal() as db:
+                clip = db.get(Clip, scene["clip_id"])
+                if clip is not None and clip.scene_job_id == job_id:
+                    clip.scene_job_id = None
+                    db.commit()
 
-        compose_videos_on_timeline(
-            clips=clips,
-            audio_path=str(Path(directories.media) / f"{task_id}.mp3"),
-            output_path=str(Path(directories.media)
-                            / str(task_id) / "final_video.mp4"),
-            task_id=task_id
-        )
+        await record_job_stats(settings, job_id, SCENE_JOB, float(scene["duration_seconds"]), 1)
+        if not _current_scenes([scene]):
+            return False
 
+        file_name = f"scene_{scene['scene_number']}.mp4"
+        local_file = Path(directories.media) / str(task_id) / file_name
+        async with open_hpc_client(settings) as client:
+            await client.sftp_get(str(slurm_destination / file_name), str(local_file))
+        digests = await generate_clip_thumbnails([str(local_file)])
+        with SessionLocal() as db:
+            clip = db.get(Clip, scene["clip_id"])
+            if clip is not None:
+                clip.thumbnail_digest = digests[str(local_file)]
+                db.commit()
+        logger.info("Scene %s of task %s regenerated (array task %s)",
+                    scene["scene_number"], task_id, job_id)
+        return True
+
+    results = await asyncio.gather(
+        *(finish(index, scene) for index, scene in enumerate(batch)),
+        return_exceptions=True,
+    )
+    failed = [(scene, result) for scene, result in zip(batch, results)
+              if isinstance(result, BaseException)]
+    regenerated = _current_scenes([scene for scene, result in zip(batch, results)
+                                   if result is True])
 
-async def run_full_video_job(task_id: int, additional_prompt: str, task: TaskRecord) -> None:
+    if regenerated:
+        regenerated_ids = {scene["clip_id"] for scene in regenerated}
+        with SessionLocal() as db:
+            clips = db.query(Clip).join(Track).filter(
+                Track.task_id == task_id).all()
+            changed = [c for c in clips if c.id in regenerated_ids]
+
+            await compose_preview_then_final(
+                task_id=int(task_id),
+                clips=clips,
+                dirty_range=(
+                    min(c.start_seconds for c in changed),
+                    max(c.end_seconds for c in changed),
+                ),
+            )
+
+    if failed:
+        numbers = ", ".join(str(scene["scene_number"]) for scene, _ in failed)
+        raise RuntimeError(f"Regenerating scene(s) {numbers} failed: {failed[0][1]}")
+
+
+def _full_job_workload(task_id: int) -> tuple[float | None, int]:
+    """Seconds of video and number of clips a full job generates.
+
+    Before the job has segmented the song the clip count is estimated from
+    the cut markers, or from the typical scene length.
+    """
+    duration = waveform.audio_duration(task_id)
+    with SessionLocal() as db:
+        clip_count = db.query(Clip).join(Track).filter(Track.task_id == task_id).count()
+        if not clip_count:
+            markers = TaskRepository(db).require(task_id).cut_markers
+            if markers:
+                clip_count = len(markers) + 1
+            elif duration is not None:
+                clip_count = math.ceil(duration / TARGET_CUT_SECONDS)
+    return duration, clip_count
+
+
+async def run_full_video_job(task_id: int, additional_prompt: str) -> None:
     directories = get_directories()
     settings = get_hpc_config()
     db = SessionLocal()
 
     try:
         repo = TaskRepository(db)
+        task = repo.require(task_id)
 
-        async with HpcClient(settings) as client:
+        async with open_hpc_client(settings) as client:
             remote_dir = f"{directories.hpc_base}/uploads/{task_id}"
             remote_job_script = f"{remote_dir}/job.sbatch"
 
@@ -125,6 +313,7 @@ async def run_full_video_job(task_id: int, additional_prompt: str, task: TaskRec
                 remote_audio_path=remote_audio_path,
                 additional_prompt=additional_prompt,
                 task=task,
+                resources=resources_for(FULL_JOB, *_full_job_workload(task_id)),
             )
             await client.sftp_put_text(job_contents, remote_job_script)
 
@@ -149,6 +338,7 @@ async def run_full_video_job(task_id: int, additional_prompt: str, task: TaskRec
                 progress=100,
                 error=str(e),
             )
+            db.commit()
         except Exception:
             logger.exception(
                 "Failed to persist failed state for task %s", task_id)
@@ -157,7 +347,9 @@ async def run_full_video_job(task_id: int, additional_prompt: str, task: TaskRec
         db.close()
 
 
-async def run_scene_job(task_id: int, scene_number: int, prompt: str, duration_seconds: float, slurm_destination: Path) -> str:
+async def run_scene_array_job(task_id: int, scenes: list[dict], slurm_destination: Path) -> str:
+    """Submit one array job for ``scenes``; index ``i`` generates
+    ``scenes[i]``. Returns the array job ID."""
     directories = get_directories()
     settings = get_hpc_config()
     db = SessionLocal()
@@ -165,16 +357,18 @@ async def run_scene_job(task_id: int, scene_number: int, prompt: str, duration_s
     try:
         repo = TaskRepository(db)
 
-        async with HpcClient(settings) as client:
+        async with open_hpc_client(settings) as client:
             remote_dir = f"{directories.hpc_base}/uploads/{task_id}"
-            remote_job_script = f"{remote_dir}/scene_{scene_number}.sbatch"
+            remote_job_script = f"{remote_dir}/scenes_{time.time_ns()}.sbatch"
 
-            job_contents = scene_job_script(
+            # Every array task gets the same allocation, sized for the longest scene.
+            resources = resources_for(
+                SCENE_JOB, max(float(scene["duration_seconds"]) for scene in scenes), 1)
+            job_contents = scene_array_job_script(
                 remote_dir=remote_dir,
-                scene_number=scene_number,
-                prompt=prompt,
-                duration_seconds=duration_seconds,
+                scenes=scenes,
                 destination_folder=slurm_destination,
+                resources=resources,
             )
             await client.sftp_put_text(job_contents, remote_job_script)
 
@@ -184,7 +378,7 @@ async def run_scene_job(task_id: int, scene_number: int, prompt: str, duration_s
             repo.update_state(
                 task_id,
                 state=TaskState.running,
-                message=f"Job submitted (ID: {job_id})",
+                message=f"Job submitted (ID: {job_id}, {len(scenes)} scene(s))",
                 progress=50,
                 job_id=job_id,
             )
@@ -200,6 +394,7 @@ async def run_scene_job(task_id: int, scene_number: int, prompt: str, duration_s
                 progress=100,
                 error=str(e),
             )
+            db.commit()
         except Exception:
             logger.exception(
                 "Failed to persist failed state for task %s", task_id)
@@ -208,10 +403,10 @@ async def run_scene_job(task_id: int, scene_number: int, prompt: str, duration_s
         db.close()
 
 
-async def stage_audio(task_id: str, local_path: str, ext: str) -> None:
+async def stage_audio(task_id: str, local_path: str, ext: str, sha256: str | None = None) -> None:
     """
     Background worker function:
-    - Upload audio file to HPC
+    - Upload audio file to HPC (once per content hash when ``sha256`` is set)
     - Upload Slurm job script
     - Update in-memory task status
     """
@@ -224,8 +419,7 @@ async def stage_audio(task_id: str, local_path: str, ext: str) -> None:
 
         remote_dir = f"{directories.hpc_base}/uploads/{task_id}"
         remote_audio_path = f"{remote_dir}/input{ext}"
-        client = HpcClient(settings)
-        async with HpcClient(settings) as client:
+        async with open_hpc_client(settings) as client:
             repo.update_state(
                 task_id,
                 state=TaskState.staging,
@@ -234,8 +428,16 @@ async def stage_audio(task_id: str, local_path: str, ext: str) -> None:
             )
             db.commit()
 
-            await client.mkdir(remote_dir)
-            await client.sftp_put(local_path, remote_audio_path)
+            blob = AudioBlobRepository(db).get(sha256) if sha256 else None
+            if blob is None:
+                await client.mkdir(remote_dir)
+                await client.sftp_put(local_path, remote_audio_path)
+            elif not await link_remote(client, blob.sha256, blob.ext, task_id, ext):
+                await put_remote_blob(client, local_path, blob.sha256, blob.ext)
+                if not await link_remote(client, blob.sha256, blob.ext, task_id, ext):
+                    raise RuntimeError(f"Audio {blob.sha256} is missing on HPC after upload")
+            if blob is not None:
+                AudioBlobRepository(db).set_remote_staged(blob.sha256, True)
 
             repo.update_state(
                 task_id,
@@ -260,7 +462,7 @@ async def stage_audio(task_id: str, local_path: str, ext: str) -> None:
         db.close()
 
 
-def full_video_job_script(remote_dir: str, remote_audio_path: str, additional_prompt: str, task: TaskRecord) -> str:
+def full_video_job_script(remote_dir: str, remote_audio_path: str, additional_prompt: str, task: TaskRecord, resources: ResourceRequest) -> str:
     job_name = f"audio_{Path(remote_dir).name}"
 
     markers = ",".join(str(m) for m in task.cut_markers) if task.cut_markers else ""
@@ -269,12 +471,7 @@ def full_video_job_script(remote_dir: str, remote_audio_path: str, additional_pr
 #SBATCH --job-name={job_name}
 #SBATCH --output={remote_dir}/clap-%j.out
 #SBATCH --error={remote_dir}/clap-%j.err
-#SBATCH --time=12:00:00
-#SBATCH --ntasks=1
-#SBATCH --nodes=1
-#SBATCH --partition=dgx1
-#SBATCH --cpus-per-task=8 # 16
-#SBATCH --mem=48G # 96G
+{resources.sbatch_directives()}
 
 
 set -euo pipefail
@@ -300,23 +497,26 @@ python src/main.py "$TEST_RUN_NAME" "$AUDIO_PATH" "$RUN_DESCRIPTION" "$ADDITIONA
 """
 
 
-def scene_job_script(remote_dir: str, scene_number: int, prompt: str, duration_seconds: float, destination_folder: Path) -> str:
+def scene_array_job_script(remote_dir: str, scenes: list[dict], destination_folder: Path, resources: ResourceRequest) -> str:
     job_name = f"audio_{Path(remote_dir).name}"
 
+    def bash_array(values) -> str:
+        return " ".join(shlex.quote(str(value)) for value in values)
+
     return f"""#!/bin/bash
 #SBATCH --job-name={job_name}
-#SBATCH --output={remote_dir}/clap-%j.out
-#SBATCH --error={remote_dir}/clap-%j.err
-#SBATCH --time=12:00:00
-#SBATCH --ntasks=1
-#SBATCH --nodes=1
-#SBATCH --partition=dgx1
-#SBATCH --cpus-per-task=8 # 16
-#SBATCH --mem=48G # 96G
-
-SCENE_NUMBER={scene_number}
-PROMPT="{prompt}"
-DURATION_SECONDS={duration_seconds}
+#SBATCH --output={remote_dir}/clap-%A_%a.out
+#SBATCH --error={remote_dir}/clap-%A_%a.err
+#SBATCH --array=0-{len(scenes) - 1}
+{resources.sbatch_directives()}
+
+SCENE_NUMBERS=({bash_array(scene["scene_number"] for scene in scenes)})
+PROMPTS=({bash_array(scene["prompt"] for scene in scenes)})
+DURATIONS=({bash_array(scene["duration_seconds"] for scene in scenes)})
+
+SCENE_NUMBER="${{SCENE_NUMBERS[$SLURM_ARRAY_TASK_ID]}}"
+PROMPT="${{PROMPTS[$SLURM_ARRAY_TASK_ID]}}"
+DURATION_SECONDS="${{DURATIONS[$SLURM_ARRAY_TASK_ID]}}"
 DESTINATION_FOLDER="{destination_folder}"
 
 set -euo pipefail
@@ -343,6 +543,7 @@ async def poll_video_segments(
 ) -> None:
     settings = get_hpc_config()
     directories = get_directories()
+    poll_interval_seconds = settings.file_poll_interval or poll_interval_seconds
     result_file = directories.hpc_base / "Music-Visualization-Generation-Pipeline" / \
         "outputs" / f"test_run_{str(task_id)}" / "segments.json"
 
@@ -354,47 +555,17 @@ async def poll_video_segments(
             timeout_seconds=timeout_seconds,
         )
 
-        payload = json.loads(file_contents)
-
-        if not isinstance(payload, list):
-            raise ValueError("JSON is not a list")
+        segments = parse_segments(file_contents)
 
         with SessionLocal() as db:
             repo = TaskRepository(db)
 
-            track = Track(task_id=task_id)
-
-            for item in payload:
-                index = item.get("index")
-                start = item.get("start")
-                end = item.get("end")
-                duration = item.get("duration")
-                audio_clip = item.get("audio_clip")  # TODO: not needed?
-
-                script = item.get("script")
-                description = script.get("description")
-                aesthetics = script.get("aesthetics")
-                camera_movement = script.get("camera_movement")
-
-                track.clips.append(
-                    Clip(
-                        clip_index=index,
-                        start_seconds=start,
-                        end_seconds=end,
-                        duration_seconds=duration,
-                        url=None,
-                        script_description=description,
-                        aesthetics=aesthetics,
-                        camera_movement=camera_movement,
-                    )
-                )
-
-            db.add(track)
+            clip_count = TrackRepository(db).ingest_segments(task_id, segments)
 
             repo.update_state(
                 task_id,
                 state=TaskState.videos_segmented,
-                message=f"Created 1 track with {len(track.clips)} clips",
+                message=f"Created 1 track with {clip_count} clips",
                 progress=60,
             )
             db.commit()
@@ -429,69 +600,40 @@ async def _wait_for_remote_file(
     elapsed = 0.0
 
     quoted_path = shlex.quote(str(remote_result_file))
+    file_name = Path(remote_result_file).name
 
-    async with HpcClient(settings) as client:
-        while elapsed < timeout_seconds:
-            exists = (await client.run(f"test -f {quoted_path} && echo 1 || echo 0")).strip()
+    with track_stage(f"wait_{Path(remote_result_file).stem}"):
+        async with open_hpc_client(settings) as client:
+            while elapsed < timeout_seconds:
+                exists = (await client.run(f"test -f {quoted_path} && echo 1 || echo 0")).strip()
+                REMOTE_FILE_POLLS.labels(file_name, str(exists == "1").lower()).inc()
 
-            if exists == "1":
-                logger.info(f"Remote file found: {
-                            remote_result_file} (elapsed: {elapsed:.1f}s)")
-                return await client.run(f"cat {quoted_path}")
+                if exists == "1":
+                    logger.info(f"Remote file found: {
+                                remote_result_file} (elapsed: {elapsed:.1f}s)")
+                    return await client.run(f"cat {quoted_path}")
 
-            logger.info(f"Remote file not found yet: {
-                        remote_result_file} (elapsed: {elapsed:.1f}s)")
-            await asyncio.sleep(poll_interval_seconds)
-            elapsed += poll_interval_seconds
+                logger.info(f"Remote file not found yet: {
+                            remote_result_file} (elapsed: {elapsed:.1f}s)")
+                await asyncio.sleep(poll_interval_seconds)
+                elapsed += poll_interval_seconds
 
-    raise TimeoutError(
-        f"Remote file not found after {
-            timeout_seconds} seconds: {remote_result_file}"
-    )
+        raise TimeoutError(
+            f"Remote file not found after {
+                timeout_seconds} seconds: {remote_result_file}"
+        )
 
 
 async def wait_for_slurm_completion(
     job_id: str,
-    poll_interval_seconds: float = 60 * 30.0,
     timeout_seconds: float = 60 * 60 * 12,
 ) -> None:
     settings = get_hpc_config()
-    elapsed = 0.0
-
-    terminal_success = {"COMPLETED"}
-    terminal_failure = {"FAILED", "CANCELLED", "TIMEOUT", "OUT_OF_MEMORY"}
-
-    async with HpcClient(settings) as client:
-        while elapsed < timeout_seconds:
-            cmd = (f"sacct -j {shlex.quote(job_id)
-                               } --format=JobIDRaw,State --parsable2 --noheader")
+    tracker = get_slurm_tracker(settings)
 
-            output = (await client.run(cmd)).strip().upper()
-
-            state = None
-            for line in output.splitlines():
-                parts = line.split("|")
-                if len(parts) != 2:
-                    continue
-                job_id_raw, state_str = parts
-                if job_id_raw == job_id:
-                    state = state_str.strip().upper()
-                    break
-
-            logger.info("Slurm job %s state=%s", job_id, state)
-
-            if state in terminal_success:
-                logger.info("Slurm job %s completed successfully", job_id)
-                return
-
-            if state in terminal_failure:
-                raise RuntimeError(
-                    f"Slurm job ended in failure state: {state}")
-
-            await asyncio.sleep(poll_interval_seconds)
-            elapsed += poll_interval_seconds
-
-    raise TimeoutError(f"Timed out waiting for Slurm job {job_id} to complete")
+    with track_stage("slurm_wait"):
+        await tracker.wait(job_id, timeout_seconds=timeout_seconds)
+    logger.info("Slurm job %s completed successfully", job_id)
 
 
 async def poll_and_store_videos(task_id: int, job_id: int) -> None:
@@ -506,7 +648,13 @@ async def poll_and_store_videos(task_id: int, job_id: int) -> None:
     )
 
     try:
-        await wait_for_slurm_completion(str(job_id))
+        try:
+            await wait_for_slurm_completion(str(job_id))
+        except RuntimeError:
+            # Ended in a failure state; a timeout or OOM still informs sizing.
+            await record_job_stats(settings, str(job_id), FULL_JOB, *_full_job_workload(task_id))
+            raise
+        await record_job_stats(settings, str(job_id), FULL_JOB, *_full_job_workload(task_id))
     except Exception as e:
         _set_task_state(
             task_id,
@@ -523,52 +671,48 @@ async def poll_and_store_videos(task_id: int, job_id: int) -> None:
         manifest_text = await _wait_for_remote_file(
             settings=settings,
             remote_result_file=remote_manifest,
-            poll_interval_seconds=30.0 * 60,
+            poll_interval_seconds=settings.file_poll_interval or 30.0 * 60,
             timeout_seconds=60 * 60 * 10,
         )
 
-        payload = json.loads(manifest_text)
-        if not isinstance(payload, list):
-            raise ValueError("segments.json is not a list")
+        manifest = parse_manifest(manifest_text)
 
         local_media_dir = Path(directories.media) / str(task_id)
         local_media_dir.mkdir(parents=True, exist_ok=True)
 
-        video_paths = []
-        async with HpcClient(settings) as client:
-            for item in payload:
-                clip_index = item["index"]
-
-                # remote_file = remote_output_dir / f"scene-{clip_index + 1}.mp4"
-                remote_file = Path(
-                    directories.hpc_base) / "Music-Visualization-Generation-Pipeline" / item["video_path"]
-
-                # file_name = f"clip_{clip_index + 1}.mp4"
-                file_name = remote_file.name
-
-                local_file = local_media_dir / file_name
-                video_paths.append(str(local_file))
-
-                logger.info("Downloading video for clip_index=%s from %s to %s",
-                            clip_index, remote_file, local_file)
-                await client.sftp_get(str(remote_file), str(local_file))
-
-                with SessionLocal() as db:
-                    clip = (
-                        db.query(Clip)
-                        .join(Track)
-                        .filter(Track.task_id == task_id, Clip.clip_index == clip_index)
-                        .one_or_none()
-                    )
-                    if clip is None:
-                        logger.warning(
-                            "No clip found for task=%s clip_index=%s", task_id, clip_index)
-                        continue
-
-                    clip.url = str(local_file)
-                    db.commit()
+        downloads = []
+        for item in manifest:
+            clip_index = item.index
+
+            # remote_file = remote_output_dir / f"scene-{clip_index + 1}.mp4"
+            remote_file = Path(
+                directories.hpc_base) / "Music-Visualization-Generation-Pipeline" / item.video_path
+
+            # file_name = f"clip_{clip_index + 1}.mp4"
+            file_name = remote_file.name
+
+            downloads.append(
+                (clip_index, remote_file, local_media_dir / file_name))
 
-        audio_path = str(Path(directories.media) / f"{task_id}.mp3")
+        clip_urls = await _download_clips(
+            task_id=task_id,
+            settings=settings,
+            downloads=downloads,
+        )
+
+        with SessionLocal() as db:
+            missing = TrackRepository(db).set_clip_urls(task_id, clip_urls)
+            for clip_index in sorted(missing):
+                logger.warning(
+                    "No clip found for task=%s clip_index=%s", task_id, clip_index)
+            db.commit()
+
+        digests = await generate_clip_thumbnails(list(clip_urls.values()))
+        with SessionLocal() as db:
+            TrackRepository(db).set_thumbnail_digests(task_id, {
+                clip_index: digests[path] for clip_index, path in clip_urls.items()
+            })
+            db.commit()
 
         with SessionLocal() as db:
             clips = (
@@ -578,14 +722,14 @@ async def poll_and_store_videos(task_id: int, job_id: int) -> None:
                 .order_by(Clip.clip_index)
                 .all()
             )
-            compose_videos_on_timeline(clips=clips, audio_path=audio_path, output_path=str(
-                local_media_dir / "final_video.mp4"), task_id=task_id)
+            await compose_preview_then_final(task_id=task_id, clips=clips)
 
+        # The task is done once the queued final render has finished.
         _set_task_state(
             task_id,
-            state=TaskState.done,
-            message="Videos downloaded and clip URLs updated",
-            progress=100,
+            state=TaskState.running,
+            message="Preview ready, rendering the final video",
+            progress=90,
         )
     except Exception as e:
         _set_task_state(
@@ -598,100 +742,181 @@ async def poll_and_store_videos(task_id: int, job_id: int) -> None:
         raise
 
 
-def compose_videos_on_timeline(
-    clips: list[Clip],
-    audio_path: str,
-    output_path: str,
+async def _download_clips(
     task_id: int,
-) -> str:
-    ordered_clips = sorted(
-        [c for c in clips if c.url],
-        key=lambda c: (c.start_seconds, c.clip_index)
-    )
-    if not ordered_clips:
-        raise ValueError("No clips with valid URLs provided")
+    settings,
+    downloads: list[tuple[int, Path, Path]],
+) -> dict[int, str]:
+    """Download ``(clip_index, remote_file, local_file)`` entries concurrently.
 
-    moviepy_clips = []
-    source_clips = []
-    audio_clip = None
-    final_video = None
+    At most ``settings.download_concurrency`` transfers run at once; each one
+    takes its own pooled connection lease so large batches are spread over
+    the pool. Returns the local path of every downloaded clip by index.
+    """
+    semaphore = asyncio.Semaphore(max(1, settings.download_concurrency))
+    total = len(downloads)
+    completed = 0
+    total_bytes = 0
+    started = time.monotonic()
+    clip_urls: dict[int, str] = {}
+
+    async def fetch(clip_index: int, remote_file: Path, local_file: Path) -> None:
+        nonlocal completed, total_bytes
+
+        async with semaphore:
+            logger.info("Downloading video for clip_index=%s from %s to %s",
+                        clip_index, remote_file, local_file)
+            file_started = time.monotonic()
+            with track_stage("clip_download"):
+                async with open_hpc_client(settings) as client:
+                    await client.sftp_get(str(remote_file), str(local_file))
+            file_elapsed = max(time.monotonic() - file_started, 1e-6)
+
+        size = local_file.stat().st_size
+        completed += 1
+        total_bytes += size
+        clip_urls[clip_index] = str(local_file)
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        message = (
+            f"Downloaded {local_file.name} ({size / 1e6:.1f} MB in {file_elapsed:.1f}s, "
+            f"{size / 1e6 / file_elapsed:.1f} MB/s); "
+            f"{completed}/{total} clips, {total_bytes / 1e6:.1f} MB at "
+            f"{total_bytes / 1e6 / elapsed:.1f} MB/s"
+        )
+        logger.info("Task %s: %s", task_id, message)
+        _set_task_state(
+            task_id,
+            state=TaskState.videos_segmented,
+            message=message,
+            progress=60 + (30 * completed) // max(total, 1),
+        )
 
-    try:
-        first_db_clip = ordered_clips[0]
-        first_source = VideoFileClip(first_db_clip.url)
-        source_clips.append(first_source)
+    await asyncio.gather(*(fetch(*download) for download in downloads))
+    return clip_urls
 
-        base_size = first_source.size
 
-        first_usable_duration = min(first_db_clip.duration_seconds, first_source.duration)
+def render_output_path(task_id: int, kind: str) -> Path:
+    return Path(get_directories().media) / str(task_id) / RENDER_OUTPUTS[kind]
 
-        first_timeline_clip = (
-            first_source
-            .subclipped(0, first_usable_duration)
-            .with_start(first_db_clip.start_seconds)
-        )
-        moviepy_clips.append(first_timeline_clip)
 
-        for c in ordered_clips[1:]:
-            source = VideoFileClip(c.url)
-            source_clips.append(source)
+def _set_render_state(
+    task_id: int,
+    kind: str,
+    state: RenderState,
+    profile: str | None = None,
+    error: str | None = None,
+) -> None:
+    with SessionLocal() as db:
+        RenderRepository(db).set_state(
+            task_id, kind, state, profile=profile, error=error)
+        db.commit()
 
-            usable_duration = min(c.duration_seconds, source.duration)
 
-            timeline_clip = (
-                source
-                .subclipped(0, usable_duration)
-                .resized(base_size)
-                .with_start(c.start_seconds)
-            )
-            moviepy_clips.append(timeline_clip)
+async def compose_preview_then_final(
+    task_id: int,
+    clips: list[Clip],
+    dirty_range: tuple[float, float] | None = None,
+) -> None:
+    """Render the low-resolution preview now and queue the final render.
 
-        timeline_duration = max(c.end_seconds for c in ordered_clips)
+    The preview is best effort: if it fails the final render still runs.
+    """
+    _set_render_state(task_id, "final", RenderState.pending)
 
-        audio_clip = AudioFileClip(audio_path)
-        audio_duration = audio_clip.duration
+    try:
+        await compose_videos_on_timeline(
+            clips=clips,
+            audio_path=str(Path(get_directories().media) / f"{task_id}.mp3"),
+            output_path=str(render_output_path(task_id, "preview")),
+            task_id=task_id,
+            dirty_range=dirty_range,
+            profile=PREVIEW_PROFILE,
+            kind="preview",
+        )
+    except Exception:
+        logger.exception("Preview render failed for task %s", task_id)
 
-        if audio_duration > timeline_duration:
-            padding = (
-                ColorClip(
-                    size=base_size,
-                    color=(0, 0, 0),
-                    duration=audio_duration - timeline_duration,
-                )
-                .with_start(timeline_duration)
-            )
-            moviepy_clips.append(padding)
-            target_duration = audio_duration
-        else:
-            target_duration = max(0, audio_duration - 0.05)
-
-        final_video = (
-            CompositeVideoClip(moviepy_clips, size=base_size)
-            .with_duration(target_duration)
-            .with_audio(audio_clip)
+    with SessionLocal() as db:
+        JobRepository(db).enqueue(
+            "compose",
+            {"task_id": task_id,
+             "dirty_range": list(dirty_range) if dirty_range else None},
+            task_id=task_id,
+            max_attempts=2,
         )
+        db.commit()
+
 
-        final_video.write_videofile(
-            output_path,
-            codec="libx264",
-            audio_codec="aac",
+async def compose_task_video(
+    task_id: int,
+    profile: str | None = None,
+    dirty_range: list[float] | None = None,
+) -> None:
+    directories = get_directories()
+
+    with SessionLocal() as db:
+        clips = (
+            db.query(Clip)
+            .join(Track)
+            .filter(Track.task_id == task_id)
+            .order_by(Clip.clip_index)
+            .all()
         )
 
+    await compose_videos_on_timeline(
+        clips=clips,
+        audio_path=str(Path(directories.media) / f"{task_id}.mp3"),
+        output_path=str(render_output_path(task_id, "final")),
+        task_id=task_id,
+        dirty_range=tuple(dirty_range) if dirty_range else None,
+        profile=profile,
+    )
+
+
+async def compose_videos_on_timeline(
+    clips: list[Clip],
+    audio_path: str,
+    output_path: str,
+    task_id: int,
+    dirty_range: tuple[float, float] | None = None,
+    profile: str | None = None,
+    kind: str = "final",
+) -> str:
+    if profile is None:
+        # Re-renders after a regeneration keep the profile last asked for.
+        record = read_render_record(output_path) or {}
+        if record.get("profile") in ENCODER_PROFILES:
+            profile = record["profile"]
+
+    _set_render_state(task_id, kind, RenderState.rendering)
+    try:
+        with track_stage(f"compose_{kind}"):
+            await render_pool.render(task_id=task_id, clips=clips, audio_path=str(audio_path),
+                                     output_path=str(output_path), dirty_range=dirty_range,
+                                     profile=profile, label=f"{kind} video")
+    except Exception as e:
+        _set_render_state(task_id, kind, RenderState.failed, error=str(e))
+        if kind == "final":
+            _set_task_state(
+                task_id,
+                state=TaskState.failed,
+                message="Failed to render the final video",
+                progress=100,
+                error=str(e),
+            )
+        raise
+
+    record = read_render_record(output_path) or {}
+    _set_render_state(task_id, kind, RenderState.ready,
+                      profile=record.get("profile"))
+
+    if kind == "final":
         _set_task_state(
             task_id,
             state=TaskState.done,
-            message="Videos downloaded and clip URLs updated",
+            message="Final video rendered",
             progress=100,
         )
 
-        return output_path
-
-    finally:
-        if final_video is not None:
-            final_video.close()
-        if audio_clip is not None:
-            audio_clip.close()
-        for clip in moviepy_clips:
-            clip.close()
-        for source in source_clips:
-            source.close()
+    return output_path
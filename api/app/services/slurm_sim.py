@@ -0,0 +1,485 @@
+"""A stand-in for Slurm and the video pipeline, used by ``HPC_BACKEND=local``.
+
+``sbatch`` reads the same job scripts the app submits to the cluster and
+starts one detached runner process per (array) task. Runners wait in
+PENDING for ``HPC_SIM_QUEUE_SECONDS``, then do what the pipeline would:
+the full job writes ``segments.json``, one small test-pattern MP4 per
+segment and ``manifest.json``; a scene job writes ``scene_{n}.mp4``.
+Scripts that are neither are run with bash. Job state lives in
+``{HPC_BASE}/.slurm`` so ``sacct`` and ``scancel`` answer the same from the
+API and the worker.
+"""
+import fcntl
+import json
+import logging
+import os
+import random
+import re
+import resource
+import shlex
+import signal
+import subprocess
+import sys
+import time
+import traceback
+from contextlib import contextmanager
+from dataclasses import asdict
+from pathlib import Path
+
+from moviepy.config import FFMPEG_BINARY
+
+from app.core.config import HpcSimSettings, get_directories, get_hpc_sim_config
+from app.services.audio_decode import iter_pcm_blocks
+from app.services.job_templates import format_slurm_time, parse_slurm_memory, parse_slurm_time
+
+logger = logging.getLogger(__name__)
+
+COMMANDS = ("sbatch", "sacct", "scancel")
+
+PIPELINE_DIR = "Music-Visualization-Generation-Pipeline"
+FULL_ENTRY_POINT = "src/main.py"
+SCENE_ENTRY_POINT = "src/generate_video_cli.py"
+
+# Scene length when a full job is submitted without cut markers.
+DEFAULT_SCENE_SECONDS = 4.0
+DURATION_SAMPLE_RATE = 1000
+
+TERMINAL_STATES = {"COMPLETED", "FAILED", "CANCELLED", "TIMEOUT", "OUT_OF_MEMORY"}
+
+_ASSIGNMENT = re.compile(r"^([A-Za-z_][A-Za-z0-9_]*)=(.*)$")
+
+
+class JobTimeout(Exception):
+    pass
+
+
+# -- State -------------------------------------------------------------------
+
+def _state_dir(base: Path) -> Path:
+    return Path(base) / ".slurm"
+
+
+def _job_dir(base: Path, job_id: str) -> Path:
+    return _state_dir(base) / "jobs" / job_id
+
+
+@contextmanager
+def _locked(path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _read_json(path: Path):
+    return json.loads(path.read_text())
+
+
+def _write_json(path: Path, value) -> None:
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(value, indent=2))
+    os.replace(tmp, path)
+
+
+def _next_job_id(base: Path) -> str:
+    counter = _state_dir(base) / "next_id"
+    with _locked(_state_dir(base) / "next_id.lock"):
+        job_id = int(counter.read_text()) if counter.exists() else 1
+        counter.write_text(str(job_id + 1))
+    return str(job_id)
+
+
+def _update_task(base: Path, job_id: str, index: int, **changes) -> dict:
+    """Apply ``changes`` to a task unless it already ended (e.g. cancelled)."""
+    job_dir = _job_dir(base, job_id)
+    with _locked(job_dir / "lock"):
+        path = job_dir / f"{index}.json"
+        task = _read_json(path)
+        if task["state"] not in TERMINAL_STATES:
+            task.update(changes)
+            _write_json(path, task)
+        return task
+
+
+# -- Job scripts -------------------------------------------------------------
+
+def parse_directives(script: str) -> dict[str, str]:
+    directives = {}
+    for line in script.splitlines():
+        if not line.startswith("#SBATCH"):
+            continue
+        for option in shlex.split(line[len("#SBATCH"):]):
+            key, _, value = option.lstrip("-").partition("=")
+            directives[key] = value
+    return directives
+
+
+def parse_variables(script: str) -> dict[str, str | list[str]]:
+    """Shell assignments with literal values; bash arrays become lists.
+
+    Values that need expansion (``"${PROMPTS[$i]}"``) are skipped, and a
+    quoted value may span several lines.
+    """
+    variables: dict[str, str | list[str]] = {}
+    lines = iter(script.splitlines())
+    for line in lines:
+        match = _ASSIGNMENT.match(line)
+        if not match:
+            continue
+        name, value = match.groups()
+        while True:
+            try:
+                words = shlex.split(value.strip("()") if value.startswith("(") else value)
+                break
+            except ValueError:
+                # Unterminated quote; the value continues on the next line.
+                value += "\n" + next(lines, "")
+        if "$" in value:
+            continue
+        variables[name] = words if value.startswith("(") else " ".join(words)
+    return variables
+
+
+def parse_markers(script: str) -> list[float]:
+    match = re.search(r"--markers ([0-9.,]*)\s*$", script, re.MULTILINE)
+    if not match or not match.group(1):
+        return []
+    return sorted(float(marker) for marker in match.group(1).split(",") if marker)
+
+
+def _array_indices(spec: str | None) -> list[int] | None:
+    """``"0-3,5%2"`` -> ``[0, 1, 2, 3, 5]``; None for a plain job."""
+    if not spec:
+        return None
+    indices = []
+    for part in spec.split("%")[0].split(","):
+        first, _, last = part.partition("-")
+        indices.extend(range(int(first), int(last or first) + 1))
+    return indices
+
+
+def _job_kind(script: str) -> str:
+    if FULL_ENTRY_POINT in script:
+        return "full"
+    if SCENE_ENTRY_POINT in script:
+        return "scene"
+    return "script"
+
+
+# -- Commands ----------------------------------------------------------------
+
+def dispatch(argv: list[str], base: Path | None = None) -> tuple[int, str, str]:
+    """Run a Slurm command; returns ``(returncode, stdout, stderr)``."""
+    base = Path(base or get_directories().hpc_base)
+    handlers = {"sbatch": sbatch, "sacct": sacct, "scancel": scancel}
+    try:
+        return handlers[argv[0]](base, argv[1:])
+    except Exception as e:
+        logger.exception("Simulated %s failed", argv[0])
+        return 1, "", f"{argv[0]}: error: {e}\n"
+
+
+def sbatch(base: Path, args: list[str]) -> tuple[int, str, str]:
+    script_path = Path(args[-1])
+    script = script_path.read_text()
+    directives = parse_directives(script)
+    indices = _array_indices(directives.get("array"))
+
+    job_id = _next_job_id(base)
+    job_dir = _job_dir(base, job_id)
+    job_dir.mkdir(parents=True)
+
+    time_limit = parse_slurm_time(directives.get("time", ""))
+    _write_json(job_dir / "job.json", {
+        "job_id": job_id,
+        "name": directives.get("job-name", script_path.name),
+        "kind": _job_kind(script),
+        "script_path": str(script_path),
+        "array": indices is not None,
+        "partition": directives.get("partition", "local"),
+        "time_limit_seconds": int(time_limit) if time_limit else None,
+        "cpus": int(directives.get("cpus-per-task", "1")),
+        "mem_mb": int(parse_slurm_memory(directives.get("mem", "")) or 0),
+        "output": directives.get("output", str(script_path.parent / "slurm-%j.out")),
+        "variables": parse_variables(script),
+        "markers": parse_markers(script),
+        # Taken from the submitting process so every runner agrees.
+        "sim": asdict(get_hpc_sim_config()),
+    })
+
+    now = time.time()
+    for index in indices if indices is not None else [0]:
+        _write_json(job_dir / f"{index}.json", {
+            "index": index,
+            "state": "PENDING",
+            "submitted_at": now,
+            "started_at": None,
+            "ended_at": None,
+            "pid": None,
+            "total_cpu_seconds": 0.0,
+            "max_rss_mb": 0.0,
+        })
+        subprocess.Popen(
+            [sys.executable, "-m", __name__, str(base), job_id, str(index)],
+            cwd=Path(__file__).resolve().parents[2],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+
+    logger.info("Simulated sbatch of %s as job %s (%s task(s))",
+                script_path, job_id, len(indices) if indices is not None else 1)
+    return 0, f"Submitted batch job {job_id}\n", ""
+
+
+def _parse_job_ids(value: str) -> list[tuple[str, int | None]]:
+    """``"12,13_2"`` -> ``[("12", None), ("13", 2)]``."""
+    ids = []
+    for part in value.split(","):
+        job_id, sep, index = part.strip().partition("_")
+        if job_id:
+            ids.append((job_id, int(index) if sep else None))
+    return ids
+
+
+def _selected_tasks(base: Path, job_id: str, index: int | None) -> list[tuple[dict, dict]]:
+    job_dir = _job_dir(base, job_id)
+    if not (job_dir / "job.json").exists():
+        return []
+    job = _read_json(job_dir / "job.json")
+    paths = [job_dir / f"{index}.json"] if index is not None else \
+        sorted(job_dir.glob("[0-9]*.json"), key=lambda path: int(path.stem))
+    return [(job, _read_json(path)) for path in paths if path.exists()]
+
+
+def _sacct_field(field: str, job: dict, task: dict, mega: bool) -> str:
+    started, ended = task["started_at"], task["ended_at"]
+    elapsed = (ended or time.time()) - started if started else 0
+    job_id = f"{job['job_id']}_{task['index']}" if job["array"] else job["job_id"]
+    rss_mb = task["max_rss_mb"]
+    values = {
+        "JobID": job_id,
+        "JobIDRaw": job_id,
+        "JobName": job["name"],
+        "State": task["state"],
+        "Partition": job["partition"],
+        "Elapsed": format_slurm_time(elapsed),
+        "TotalCPU": format_slurm_time(task["total_cpu_seconds"]),
+        "MaxRSS": (f"{rss_mb:.2f}M" if mega else f"{rss_mb * 1024:.0f}K") if ended else "",
+        "Timelimit": format_slurm_time(job["time_limit_seconds"])
+        if job["time_limit_seconds"] else "UNLIMITED",
+        "ReqCPUS": str(job["cpus"]),
+        "ReqMem": f"{job['mem_mb']}M",
+        "ExitCode": f"{task.get('exit_code', 0)}:0",
+    }
+    return values.get(field, "")
+
+
+def sacct(base: Path, args: list[str]) -> tuple[int, str, str]:
+    options = {}
+    for arg in args:
+        key, _, value = arg.partition("=")
+        options[key] = value
+    job_ids = _parse_job_ids(options.get("-j", "") or args[args.index("-j") + 1])
+    fields = options.get("--format", "JobID,JobName,Partition,State,ExitCode").split(",")
+    mega = options.get("--units", "").upper() == "M"
+
+    lines = []
+    for job_id, index in job_ids:
+        for job, task in _selected_tasks(base, job_id, index):
+            lines.append("|".join(_sacct_field(field, job, task, mega) for field in fields))
+
+    if "--noheader" not in options:
+        lines.insert(0, "|".join(fields))
+    return 0, "".join(f"{line}\n" for line in lines), ""
+
+
+def scancel(base: Path, args: list[str]) -> tuple[int, str, str]:
+    errors = []
+    for job_id, index in _parse_job_ids(",".join(arg for arg in args if not arg.startswith("-"))):
+        tasks = _selected_tasks(base, job_id, index)
+        if not tasks:
+            errors.append(f"scancel: error: Invalid job id {job_id}\n")
+        for job, task in tasks:
+            if task["state"] in TERMINAL_STATES:
+                continue
+            if task["pid"]:
+                try:
+                    os.killpg(task["pid"], signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+            _update_task(base, job["job_id"], task["index"],
+                         state="CANCELLED", ended_at=time.time())
+    return (1 if errors else 0), "", "".join(errors)
+
+
+# -- Runners -----------------------------------------------------------------
+
+def audio_duration(path: str) -> float:
+    samples = sum(len(block) for block in iter_pcm_blocks(
+        path, DURATION_SAMPLE_RATE, DURATION_SAMPLE_RATE * 60))
+    return samples / DURATION_SAMPLE_RATE
+
+
+def write_scene_video(path: Path, duration: float, seed: int, sim: HpcSimSettings, log) -> None:
+    """A short test pattern, tinted per scene so clips are easy to tell apart."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(f".{path.name}.part")
+    subprocess.run(
+        [
+            FFMPEG_BINARY, "-hide_banner", "-loglevel", "error", "-y",
+            "-f", "lavfi",
+            "-i", f"testsrc2=size={sim.video_size}:rate=24:duration={max(duration, 0.1):.3f}",
+            "-vf", f"hue=h={(seed * 47) % 360}",
+            "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+            "-f", "mp4", str(partial),
+        ],
+        check=True,
+        stdout=log,
+        stderr=log,
+    )
+    os.replace(partial, path)
+
+
+def _pause(seconds: float, started: float) -> None:
+    """Sleep until ``seconds`` after ``started``."""
+    time.sleep(max(0.0, started + seconds - time.monotonic()))
+
+
+def simulate_full_job(base: Path, job: dict, sim: HpcSimSettings, log) -> None:
+    variables = job["variables"]
+    run_name = variables["TEST_RUN_NAME"]
+    pipeline = base / PIPELINE_DIR
+
+    duration = audio_duration(variables["AUDIO_PATH"])
+    cuts = [marker for marker in job["markers"] if 0 < marker < duration]
+    if not cuts:
+        count = max(1, round(duration / DEFAULT_SCENE_SECONDS))
+        cuts = [duration * i / count for i in range(1, count)]
+    bounds = list(zip([0.0, *cuts], [*cuts, duration]))
+
+    prompt = variables.get("ADDITIONAL_PROMPT", "")
+    segments = [
+        {
+            "index": index,
+            "start": round(start, 3),
+            "end": round(end, 3),
+            "duration": round(end - start, 3),
+            "script": {
+                "description": f"Simulated scene {index + 1}" + (f": {prompt}" if prompt else ""),
+                "aesthetics": "Test pattern",
+                "camera_movement": "Static",
+            },
+        }
+        for index, (start, end) in enumerate(bounds)
+    ]
+    started = time.monotonic()
+    segments_path = pipeline / "outputs" / run_name / "segments.json"
+    segments_path.parent.mkdir(parents=True, exist_ok=True)
+    _pause(sim.seconds_per_scene, started)
+    _write_json(segments_path, segments)
+    print(f"Wrote {len(segments)} segments to {segments_path}", file=log, flush=True)
+
+    scenes_dir = pipeline / "intermediate_files" / run_name
+    manifest = []
+    for segment in segments:
+        started = time.monotonic()
+        path = scenes_dir / f"scene_{segment['index'] + 1}.mp4"
+        write_scene_video(path, segment["duration"], segment["index"], sim, log)
+        _pause(sim.seconds_per_scene, started)
+        manifest.append({"index": segment["index"], "video_path": str(path.relative_to(pipeline))})
+        print(f"Generated {path}", file=log, flush=True)
+    _write_json(scenes_dir / "manifest.json", manifest)
+
+
+def simulate_scene_job(job: dict, index: int, sim: HpcSimSettings, log) -> None:
+    variables = job["variables"]
+    scene_number = int(variables["SCENE_NUMBERS"][index])
+    started = time.monotonic()
+    path = Path(variables["DESTINATION_FOLDER"]) / f"scene_{scene_number}.mp4"
+    write_scene_video(path, float(variables["DURATIONS"][index]), scene_number - 1, sim, log)
+    _pause(sim.seconds_per_scene, started)
+    print(f"Generated {path}", file=log, flush=True)
+
+
+def run_script(job: dict, index: int, log) -> None:
+    env = dict(os.environ, SLURM_JOB_ID=job["job_id"], SLURM_CPUS_PER_TASK=str(job["cpus"]))
+    if job["array"]:
+        env.update(SLURM_ARRAY_JOB_ID=job["job_id"], SLURM_ARRAY_TASK_ID=str(index))
+    script = Path(job["script_path"])
+    subprocess.run(["bash", str(script)], cwd=script.parent, env=env,
+                   check=True, stdout=log, stderr=log)
+
+
+def _output_path(job: dict, index: int) -> str:
+    job_id = job["job_id"]
+    task_id = f"{job_id}_{index}" if job["array"] else job_id
+    return job["output"].replace("%A", job_id).replace("%a", str(index)).replace("%j", task_id)
+
+
+def _on_time_limit(signum, frame):
+    raise JobTimeout()
+
+
+def _usage() -> tuple[float, float]:
+    """CPU seconds and peak RSS in MiB of this runner and its children."""
+    cpu, rss = 0.0, 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        cpu += usage.ru_utime + usage.ru_stime
+        rss = max(rss, usage.ru_maxrss / 1024)
+    return cpu, rss
+
+
+def run_task(base: Path, job_id: str, index: int) -> None:
+    job = _read_json(_job_dir(base, job_id) / "job.json")
+    sim = HpcSimSettings(**job["sim"])
+
+    time.sleep(sim.queue_seconds)
+    task = _update_task(base, job_id, index, state="RUNNING",
+                        started_at=time.time(), pid=os.getpid())
+    if task["state"] != "RUNNING":
+        return
+
+    if job["time_limit_seconds"]:
+        signal.signal(signal.SIGALRM, _on_time_limit)
+        signal.alarm(job["time_limit_seconds"])
+
+    output = Path(_output_path(job, index))
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with output.open("a") as log:
+        print(f"Running on {os.uname().nodename} (simulated job {job_id}, task {index})",
+              file=log, flush=True)
+        try:
+            if random.random() < sim.fail_rate:
+                raise RuntimeError("Simulated failure (HPC_SIM_FAIL_RATE)")
+            if job["kind"] == "full":
+                simulate_full_job(base, job, sim, log)
+            elif job["kind"] == "scene":
+                simulate_scene_job(job, index, sim, log)
+            else:
+                run_script(job, index, log)
+            state, exit_code = "COMPLETED", 0
+        except JobTimeout:
+            state, exit_code = "TIMEOUT", 0
+        except Exception:
+            traceback.print_exc(file=log)
+            state, exit_code = "FAILED", 1
+        finally:
+            signal.alarm(0)
+
+    # Like Slurm, take down whatever the job left running.
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    os.killpg(os.getpgrp(), signal.SIGTERM)
+
+    cpu, rss = _usage()
+    _update_task(base, job_id, index, state=state, exit_code=exit_code,
+                 ended_at=time.time(), total_cpu_seconds=cpu, max_rss_mb=rss)
+
+
+if __name__ == "__main__":
+    run_task(Path(sys.argv[1]), sys.argv[2], int(sys.argv[3]))
@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import shlex
+import time
+from typing import Awaitable, Callable
+
+from app.core.config import Settings
+from app.services.hpc_client import open_hpc_client
+from app.services.metrics import observe_stage
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_SUCCESS = {"COMPLETED"}
+TERMINAL_FAILURE = {
+    "FAILED",
+    "CANCELLED",
+    "TIMEOUT",
+    "OUT_OF_MEMORY",
+    "NODE_FAIL",
+    "BOOT_FAIL",
+    "DEADLINE",
+    "PREEMPTED",
+}
+
+StateCallback = Callable[[str, str], Awaitable[None] | None]
+
+
+class _Watch:
+    def __init__(self) -> None:
+        self.future: asyncio.Future[str] = asyncio.get_running_loop().create_future()
+        self.callbacks: list[StateCallback] = []
+        self.waiters = 0
+        self.watched_at = time.monotonic()
+        self.running_at: float | None = None
+
+
+class SlurmJobTracker:
+    """Single poller for every Slurm job the process is waiting on.
+
+    All watched job IDs are queried with one ``sacct`` call per interval.
+    State transitions are published to the callbacks registered for the job,
+    and the future returned to waiters resolves once the job reaches a
+    terminal state.
+    """
+
+    def __init__(self, settings: Settings) -> None:
+        self.settings = settings
+        self.poll_interval = settings.slurm_poll_interval
+        self._watches: dict[str, _Watch] = {}
+        self._states: dict[str, str] = {}
+        self._task: asyncio.Task | None = None
+        self._wakeup = asyncio.Event()
+
+    async def wait(
+        self,
+        job_id: str,
+        timeout_seconds: float | None = None,
+        on_state: StateCallback | None = None,
+    ) -> str:
+        """Wait for ``job_id`` to finish and return its final state.
+
+        Raises ``RuntimeError`` if the job ends in a failure state and
+        ``TimeoutError`` if it is still active after ``timeout_seconds``.
+        """
+        watch = self._watches.get(job_id)
+        if watch is None:
+            watch = self._watches[job_id] = _Watch()
+            self._wakeup.set()
+        if on_state is not None:
+            watch.callbacks.append(on_state)
+        watch.waiters += 1
+        self._ensure_running()
+
+        try:
+            state = await asyncio.wait_for(asyncio.shield(watch.future), timeout_seconds)
+        except asyncio.TimeoutError:
+            raise TimeoutError(
+                f"Timed out waiting for Slurm job {job_id} to complete")
+        finally:
+            watch.waiters -= 1
+            if on_state is not None and on_state in watch.callbacks:
+                watch.callbacks.remove(on_state)
+            if watch.waiters == 0 and self._watches.get(job_id) is watch:
+                del self._watches[job_id]
+                self._states.pop(job_id, None)
+
+        if state in TERMINAL_FAILURE:
+            raise RuntimeError(f"Slurm job ended in failure state: {state}")
+        return state
+
+    def state(self, job_id: str) -> str | None:
+        return self._states.get(job_id)
+
+    def _ensure_running(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while self._watches:
+            self._wakeup.clear()
+            try:
+                await self._poll_once()
+            except Exception:
+                logger.exception("Failed to query Slurm job states")
+
+            if not self._watches:
+                break
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _poll_once(self) -> None:
+        job_ids = list(self._watches)
+        if not job_ids:
+            return
+
+        states = await self.query(job_ids)
+
+        for job_id in job_ids:
+            state = states.get(job_id)
+            watch = self._watches.get(job_id)
+            if state is None or watch is None:
+                continue
+
+            previous = self._states.get(job_id)
+            if state != previous:
+                self._states[job_id] = state
+                logger.info("Slurm job %s state %s -> %s",
+                            job_id, previous, state)
+                _observe_transition(watch, state)
+                for callback in list(watch.callbacks):
+                    try:
+                        result = callback(job_id, state)
+                        if asyncio.iscoroutine(result):
+                            await result
+                    except Exception:
+                        logger.exception(
+                            "Slurm state callback failed for job %s", job_id)
+
+            if (state in TERMINAL_SUCCESS or state in TERMINAL_FAILURE) and not watch.future.done():
+                watch.future.set_result(state)
+
+    async def query(self, job_ids: list[str]) -> dict[str, str]:
+        """Return the current state of each job known to ``sacct``.
+
+        Array tasks are watched as ``<array id>_<index>``. ``sacct`` reports
+        them under that JobID once they start, and pending ones as a single
+        ``<array id>_[0-3,5]`` line that is expanded here.
+        """
+        cmd = (
+            f"sacct -j {shlex.quote(','.join(job_ids))} "
+            "--format=JobID,JobIDRaw,State --parsable2 --noheader"
+        )
+        async with open_hpc_client(self.settings) as client:
+            output = await client.run(cmd)
+
+        wanted = set(job_ids)
+        states: dict[str, str] = {}
+        for line in output.strip().splitlines():
+            parts = line.split("|")
+            if len(parts) != 3:
+                continue
+            job_id, job_id_raw, state_str = (part.strip() for part in parts)
+            if not state_str:
+                continue
+            # e.g. "CANCELLED by 1234"
+            state = state_str.upper().split()[0]
+            for candidate in (job_id_raw, *_expand_array_ids(job_id)):
+                if candidate in wanted:
+                    states[candidate] = state
+        return states
+
+
+def _observe_transition(watch: _Watch, state: str) -> None:
+    """Record queue wait and run time, as seen at the poll interval.
+
+    Queue wait counts from when the job was first watched, i.e. submitted.
+    """
+    now = time.monotonic()
+    if state == "RUNNING" and watch.running_at is None:
+        watch.running_at = now
+        observe_stage("slurm_queue", now - watch.watched_at)
+    elif state in TERMINAL_SUCCESS or state in TERMINAL_FAILURE:
+        outcome = "ok" if state in TERMINAL_SUCCESS else state.lower()
+        if watch.running_at is None:
+            # Ended before a poll saw it running (cancelled while pending,
+            # or shorter than the poll interval).
+            observe_stage("slurm_queue", now - watch.watched_at, outcome)
+        else:
+            observe_stage("slurm_run", now - watch.running_at, outcome)
+
+
+def _expand_array_ids(job_id: str) -> list[str]:
+    """``"12_[0-2,5%4]"`` -> ``["12_0", "12_1", "12_2", "12_5"]``."""
+    base, sep, indices = job_id.partition("_")
+    if not sep or not indices.startswith("["):
+        return [job_id]
+
+    expanded = []
+    for part in indices.strip("[]").split("%")[0].split(","):
+        first, _, last = part.partition("-")
+        try:
+            start, end = int(first), int(last or first)
+        except ValueError:
+            continue
+        expanded.extend(f"{base}_{index}" for index in range(start, end + 1))
+    return expanded
+
+
+_tracker: SlurmJobTracker | None = None
+_tracker_loop: asyncio.AbstractEventLoop | None = None
+
+
+def get_slurm_tracker(settings: Settings) -> SlurmJobTracker:
+    global _tracker, _tracker_loop
+
+    loop = asyncio.get_running_loop()
+    if _tracker is None or _tracker_loop is not loop or _tracker.settings != settings:
+        _tracker = SlurmJobTracker(settings)
+        _tracker_loop = loop
+    return _tracker
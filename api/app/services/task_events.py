@@ -0,0 +1,100 @@
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import psycopg
+
+from app.db import engine
+from app.repositories.task_repository import TASK_EVENTS_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+
+class TaskEventBroker:
+    """Fans task events out to the streams open in this process.
+
+    One connection LISTENs on the task events channel for the whole process,
+    so the number of open editors does not change the database load.
+    """
+
+    def __init__(self, conninfo: str) -> None:
+        self.conninfo = conninfo
+        self._subscribers: dict[int, set[asyncio.Queue]] = defaultdict(set)
+        self._listener: asyncio.Task | None = None
+
+    @asynccontextmanager
+    async def subscribe(self, task_id: int) -> AsyncIterator[asyncio.Queue]:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=100)
+        self._subscribers[task_id].add(queue)
+        self._ensure_listening()
+        try:
+            yield queue
+        finally:
+            self._subscribers[task_id].discard(queue)
+            if not self._subscribers[task_id]:
+                del self._subscribers[task_id]
+
+    def _ensure_listening(self) -> None:
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    def _dispatch(self, event: dict) -> None:
+        for queue in self._subscribers.get(event.get("task_id"), ()):
+            if queue.full():
+                # Slow consumer: drop the oldest update, it is superseded anyway.
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(
+                    self.conninfo, autocommit=True
+                ) as conn:
+                    await conn.execute(f"LISTEN {TASK_EVENTS_CHANNEL}")
+                    logger.info("Listening for task events")
+                    async for notify in conn.notifies():
+                        try:
+                            self._dispatch(json.loads(notify.payload))
+                        except ValueError:
+                            logger.warning(
+                                "Ignoring malformed task event: %s", notify.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning(
+                    "Task event listener disconnected, reconnecting", exc_info=True)
+                await asyncio.sleep(1.0)
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+
+_broker: TaskEventBroker | None = None
+
+
+def get_task_event_broker() -> TaskEventBroker:
+    global _broker
+
+    if _broker is None:
+        conninfo = engine.url.set(drivername="postgresql").render_as_string(
+            hide_password=False)
+        _broker = TaskEventBroker(conninfo)
+    return _broker
+
+
+async def close_task_event_broker() -> None:
+    global _broker
+
+    if _broker is not None:
+        await _broker.close()
+    _broker = None
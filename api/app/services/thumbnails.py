@@ -0,0 +1,130 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import tempfile
+from pathlib import Path
+
+from app.core.config import get_directories
+from app.services.compositor import probe_video, run_ffmpeg
+from app.services.render_cache import file_digest
+
+logger = logging.getLogger(__name__)
+
+FRAME_HEIGHT = 72
+FRAME_INTERVAL = 1.0
+MAX_FRAMES = 100
+SPRITE_COLUMNS = 10
+SPRITE_QUALITY = 5
+
+
+def thumbnails_dir() -> Path:
+    return get_directories().media / ".thumbnails"
+
+
+def sprite_path(digest: str) -> Path:
+    return thumbnails_dir() / f"{digest}.jpg"
+
+
+def index_path(digest: str) -> Path:
+    return thumbnails_dir() / f"{digest}.json"
+
+
+def read_thumbnail_index(digest: str) -> dict | None:
+    """The sprite index stored under ``digest``, or None if it is missing."""
+    try:
+        return json.loads(index_path(digest).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def generate_thumbnails(clip_path: str) -> dict:
+    """Extract evenly spaced frames into one sprite sheet and index.
+
+    The frames come out of a single ffmpeg decode pass that picks the first
+    frame at or after the middle of each interval; the sprite is then tiled
+    from the frames that pass actually produced. Results are keyed by the
+    clip's content hash, so identical or unchanged clips are never decoded
+    twice.
+    """
+    digest = file_digest(clip_path)
+    index = index_path(digest)
+    if index.exists() and sprite_path(digest).exists():
+        return json.loads(index.read_text())
+
+    info = probe_video(clip_path)
+    width, height = info.size
+    frame_width = max(2, round(width * FRAME_HEIGHT / height / 2) * 2)
+
+    wanted = max(1, min(MAX_FRAMES, math.ceil(info.duration / FRAME_INTERVAL)))
+    interval = info.duration / wanted
+
+    out_dir = thumbnails_dir()
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    with tempfile.TemporaryDirectory(dir=out_dir, prefix=".tmp-") as work_dir:
+        run_ffmpeg([
+            "-i", str(clip_path),
+            "-an",
+            "-vf",
+            # selected_n counts the frames picked so far.
+            f"select='gte(t\\,(selected_n+0.5)*{interval:.6f})',"
+            f"scale={frame_width}:{FRAME_HEIGHT}",
+            "-fps_mode", "passthrough",
+            "-frames:v", str(wanted),
+            "-q:v", str(SPRITE_QUALITY),
+            os.path.join(work_dir, "frame-%03d.jpg"),
+        ])
+        # The container can outlast the video stream, leaving fewer frames.
+        count = len(list(Path(work_dir).glob("frame-*.jpg")))
+        if count == 0:
+            raise RuntimeError(f"No frames extracted from {clip_path}")
+
+        columns = min(SPRITE_COLUMNS, count)
+        rows = math.ceil(count / columns)
+        tmp_sprite = os.path.join(work_dir, "sprite.jpg")
+        run_ffmpeg([
+            "-i", os.path.join(work_dir, "frame-%03d.jpg"),
+            "-vf", f"tile={columns}x{rows}",
+            "-frames:v", "1",
+            "-q:v", str(SPRITE_QUALITY),
+            tmp_sprite,
+        ])
+        os.replace(tmp_sprite, sprite_path(digest))
+
+    payload = {
+        "digest": digest,
+        "frame_width": frame_width,
+        "frame_height": FRAME_HEIGHT,
+        "columns": columns,
+        "rows": rows,
+        "count": count,
+        "interval": interval,
+        "times": [round((i + 0.5) * interval, 3) for i in range(count)],
+    }
+    tmp_index = index.with_name(f".{index.name}.{os.getpid()}.tmp")
+    tmp_index.write_text(json.dumps(payload))
+    os.replace(tmp_index, index)
+    return payload
+
+
+async def generate_clip_thumbnails(clip_paths: list[str], concurrency: int = 2) -> dict[str, str | None]:
+    """Generate sprites for downloaded clips; failures are only logged.
+
+    Returns the sprite digest of each path, None where generation failed.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(path: str) -> str | None:
+        async with semaphore:
+            try:
+                index = await asyncio.to_thread(generate_thumbnails, path)
+            except Exception:
+                logger.warning("Failed to generate thumbnails for %s",
+                               path, exc_info=True)
+                return None
+            return index["digest"]
+
+    digests = await asyncio.gather(*(one(path) for path in clip_paths))
+    return dict(zip(clip_paths, digests))
@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import os
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from app.core.config import get_directories
+from app.services.audio_decode import iter_pcm_blocks
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 22050
+BASE_SAMPLES_PER_PEAK = 256
+LEVEL_FACTOR = 4
+LEVELS = 5
+
+# Decode blocks hold a whole number of coarsest-level peaks, so every level
+# can be reduced block by block without carrying partial peaks across.
+BLOCK_SAMPLES = BASE_SAMPLES_PER_PEAK * LEVEL_FACTOR ** (LEVELS - 1) * 4
+
+MAGIC = b"PEAK"
+VERSION = 1
+# magic, version, sample rate, level count
+HEADER = struct.Struct("<4sHIH")
+# samples per peak, peak count, byte offset
+LEVEL_ENTRY = struct.Struct("<IIQ")
+# Each peak is an int8 (min, max) pair.
+PEAK_BYTES = 2
+
+
+@dataclass(frozen=True)
+class PeakLevel:
+    level: int
+    samples_per_peak: int
+    count: int
+    offset: int
+
+    @property
+    def seconds_per_peak(self) -> float:
+        return self.samples_per_peak / SAMPLE_RATE
+
+
+def peaks_path(task_id: int) -> Path:
+    return get_directories().media / f"{task_id}.peaks"
+
+
+def _reduce(samples: np.ndarray, samples_per_peak: int) -> tuple[np.ndarray, np.ndarray]:
+    """Min and max of every ``samples_per_peak`` run; the tail is padded."""
+    remainder = len(samples) % samples_per_peak
+    if remainder:
+        samples = np.concatenate(
+            [samples, np.full(samples_per_peak - remainder, samples[-1], dtype=samples.dtype)])
+    frames = samples.reshape(-1, samples_per_peak)
+    return frames.min(axis=1), frames.max(axis=1)
+
+
+def _quantize(values: np.ndarray) -> np.ndarray:
+    return np.clip(np.round(values * 127), -128, 127).astype(np.int8)
+
+
+def compute_peaks(audio_path: str) -> list[np.ndarray]:
+    """Build the min/max pyramid, finest level first.
+
+    Returns one ``(count, 2)`` int8 array per level. Level ``n`` covers
+    ``BASE_SAMPLES_PER_PEAK * LEVEL_FACTOR ** n`` samples per peak.
+    """
+    levels: list[list[np.ndarray]] = [[] for _ in range(LEVELS)]
+
+    for block in iter_pcm_blocks(audio_path, SAMPLE_RATE, BLOCK_SAMPLES):
+        if not len(block):
+            continue
+        mins, maxs = _reduce(block, BASE_SAMPLES_PER_PEAK)
+        for level in range(LEVELS):
+            if level:
+                mins = _reduce(mins, LEVEL_FACTOR)[0]
+                maxs = _reduce(maxs, LEVEL_FACTOR)[1]
+            levels[level].append(np.stack([mins, maxs], axis=1))
+
+    return [
+        _quantize(np.concatenate(parts)) if parts else np.zeros((0, 2), dtype=np.int8)
+        for parts in levels
+    ]
+
+
+def write_peaks(path: Path, levels: list[np.ndarray]) -> None:
+    offset = HEADER.size + LEVEL_ENTRY.size * len(levels)
+    header = [HEADER.pack(MAGIC, VERSION, SAMPLE_RATE, len(levels))]
+    for level, peaks in enumerate(levels):
+        header.append(LEVEL_ENTRY.pack(
+            BASE_SAMPLES_PER_PEAK * LEVEL_FACTOR ** level, len(peaks), offset))
+        offset += peaks.size
+
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with tmp_path.open("wb") as f:
+        f.write(b"".join(header))
+        for peaks in levels:
+            f.write(np.ascontiguousarray(peaks).tobytes())
+    os.replace(tmp_path, path)
+
+
+def read_levels(path: Path) -> list[PeakLevel]:
+    with path.open("rb") as f:
+        magic, version, sample_rate, count = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION or sample_rate != SAMPLE_RATE:
+            raise ValueError(f"Unsupported peaks file {path}")
+        return [
+            PeakLevel(level, *LEVEL_ENTRY.unpack(f.read(LEVEL_ENTRY.size)))
+            for level in range(count)
+        ]
+
+
+def read_peaks(path: Path, level: PeakLevel, start: int, end: int) -> bytes:
+    """Raw int8 (min, max) pairs for peaks ``[start, end)`` of one level."""
+    start = max(0, min(start, level.count))
+    end = max(start, min(end, level.count))
+    with path.open("rb") as f:
+        f.seek(level.offset + start * PEAK_BYTES)
+        return f.read((end - start) * PEAK_BYTES)
+
+
+def audio_duration(task_id: int) -> float | None:
+    """Track length from the peaks file, or None if it was not extracted."""
+    try:
+        base = read_levels(peaks_path(task_id))[0]
+    except (OSError, ValueError, IndexError):
+        return None
+    return base.count * base.seconds_per_peak
+
+
+def extract_waveform(audio_path: str, task_id: int) -> Path:
+    path = peaks_path(task_id)
+    levels = compute_peaks(audio_path)
+    write_peaks(path, levels)
+    logger.info("Wrote %d waveform levels (%d base peaks) to %s",
+                len(levels), len(levels[0]), path)
+    return path
+
+
+async def extract_task_waveform(task_id: int, local_path: str) -> None:
+    """Job handler: build the peaks file for an uploaded audio file."""
+    await asyncio.to_thread(extract_waveform, local_path, task_id)
@@ -0,0 +1,194 @@
+import asyncio
+import logging
+import os
+import signal
+import socket
+from typing import Awaitable, Callable
+
+from prometheus_client import start_http_server
+
+from app.core.config import get_worker_config
+from app.db import SessionLocal
+from app.models import JobState, TaskState
+from app.repositories.job_repository import JobRepository, current_job_id
+from app.repositories.task_repository import TaskRepository
+from app.services.beats import analyze_task_beats
+from app.services.hpc_pool import close_hpc_pool
+from app.services.metrics import track_stage
+from app.services.render_pool import shutdown_render_pool
+from app.services.slurm import (
+    compose_task_video,
+    poll_and_store_videos,
+    poll_full_video_job,
+    poll_video_segments,
+    run_and_poll_scene_task,
+    run_and_poll_task,
+    stage_audio,
+)
+from app.services.waveform import extract_task_waveform
+
+logging.basicConfig(level=logging.INFO)
+logging.getLogger("asyncssh").setLevel(logging.WARNING)
+
+logger = logging.getLogger(__name__)
+
+JOB_HANDLERS: dict[str, Callable[..., Awaitable[None]]] = {
+    "stage_audio": stage_audio,
+    "run_task": run_and_poll_task,
+    "poll_full_job": poll_full_video_job,
+    "poll_segments": poll_video_segments,
+    "poll_videos": poll_and_store_videos,
+    "regenerate_scene": run_and_poll_scene_task,
+    "compose": compose_task_video,
+    "extract_waveform": extract_task_waveform,
+    "analyze_beats": analyze_task_beats,
+}
+
+
+class Worker:
+    """Claims jobs from the ``jobs`` table and runs them.
+
+    Each claimed job holds a lease that a heartbeat keeps extending while the
+    handler runs. If the process dies the lease runs out and another worker
+    picks the job up again.
+    """
+
+    def __init__(self) -> None:
+        self.settings = get_worker_config()
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._slots = asyncio.Semaphore(self.settings.concurrency)
+        self._running: set[asyncio.Task] = set()
+        self._stopping = asyncio.Event()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    async def run(self) -> None:
+        logger.info("Worker %s started (concurrency=%s)",
+                    self.worker_id, self.settings.concurrency)
+        if self.settings.metrics_port:
+            start_http_server(self.settings.metrics_port)
+            logger.info("Serving metrics on port %s", self.settings.metrics_port)
+
+        while not self._stopping.is_set():
+            await self._slots.acquire()
+            self._reap_expired()
+
+            claimed = self._claim()
+            if claimed is None:
+                self._slots.release()
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), self.settings.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            task = asyncio.create_task(self._execute(*claimed))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+        for task in list(self._running):
+            task.cancel()
+        await asyncio.gather(*self._running, return_exceptions=True)
+
+    def _claim(self) -> tuple[int, str, dict, int | None] | None:
+        with SessionLocal() as db:
+            job = JobRepository(db).claim(
+                self.worker_id, self.settings.lease_seconds)
+            if job is None:
+                db.commit()
+                return None
+            claimed = (job.id, job.kind, dict(job.payload), job.task_id)
+            db.commit()
+            return claimed
+
+    def _reap_expired(self) -> None:
+        with SessionLocal() as db:
+            jobs = JobRepository(db).reap_expired()
+            for job in jobs:
+                logger.warning("Job %s (%s) lost its worker on the last attempt",
+                               job.id, job.kind)
+                if job.task_id is not None:
+                    TaskRepository(db).update_state(
+                        job.task_id,
+                        state=TaskState.failed,
+                        message=f"Worker stopped while running {job.kind}",
+                        progress=100,
+                        error=job.last_error,
+                    )
+            db.commit()
+
+    async def _heartbeat(self, job_id: int, handler_task: asyncio.Task) -> None:
+        interval = self.settings.lease_seconds / 3
+        while True:
+            await asyncio.sleep(interval)
+            with SessionLocal() as db:
+                owned = JobRepository(db).heartbeat(
+                    job_id, self.worker_id, self.settings.lease_seconds)
+                db.commit()
+            if not owned:
+                logger.warning("Lost lease on job %s, cancelling it", job_id)
+                handler_task.cancel()
+                return
+
+    async def _execute(self, job_id: int, kind: str, payload: dict, task_id: int | None) -> None:
+        try:
+            handler = JOB_HANDLERS.get(kind)
+            if handler is None:
+                raise ValueError(f"Unknown job kind: {kind}")
+
+            logger.info("Running job %s (%s) %s", job_id, kind, payload)
+            # The handler's task copies the context, and with it the job ID.
+            current_job_id.set(job_id)
+            handler_task = asyncio.create_task(handler(**payload))
+            heartbeat = asyncio.create_task(
+                self._heartbeat(job_id, handler_task))
+            try:
+                with track_stage(f"job_{kind}"):
+                    await handler_task
+            finally:
+                heartbeat.cancel()
+
+        except asyncio.CancelledError:
+            if self._stopping.is_set():
+                logger.info("Releasing job %s (%s) on shutdown", job_id, kind)
+                with SessionLocal() as db:
+                    JobRepository(db).release(job_id)
+                    db.commit()
+            raise
+
+        except Exception as e:
+            logger.exception("Job %s (%s) failed", job_id, kind)
+            with SessionLocal() as db:
+                job = JobRepository(db).fail(job_id, error=str(e))
+                if job.state == JobState.queued:
+                    logger.info("Job %s will be retried (attempt %s of %s)",
+                                job_id, job.attempts, job.max_attempts)
+                db.commit()
+
+        else:
+            logger.info("Job %s (%s) done", job_id, kind)
+            with SessionLocal() as db:
+                JobRepository(db).complete(job_id)
+                db.commit()
+
+        finally:
+            self._slots.release()
+
+
+async def main() -> None:
+    worker = Worker()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+
+    try:
+        await worker.run()
+    finally:
+        await close_hpc_pool()
+        shutdown_render_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,338 @@
+"""Benchmark the timeline compositor on synthetic clip sets.
+
+Run from the ``api`` directory::
+
+    python -m benchmarks.compose                      # every case
+    python -m benchmarks.compose -k gaps -k overlap   # cases matching a name
+    python -m benchmarks.compose --compare OLD.json NEW.json
+
+Each case renders with ``render_timeline`` (no render cache) in a fresh
+process and records wall time, output frames per second, peak RSS of the
+process and of its ffmpeg children, and how many ffmpeg processes it
+started.
+Results are written as JSON, tagged with the git commit, so runs from two
+commits can be compared. Input clips and audio are generated once with
+ffmpeg and reused from the work directory.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, replace
+from datetime import datetime, timezone
+from pathlib import Path
+
+from moviepy.config import FFMPEG_BINARY
+
+from app.core.config import ENCODER_PROFILES
+from app.services.compositor import probe_video, render_timeline
+
+API_DIR = Path(__file__).resolve().parents[1]
+RESULTS_DIR = API_DIR / "benchmarks" / "results"
+WORK_DIR = Path(tempfile.gettempdir()) / "compose-bench"
+
+FPS = 24
+
+
+@dataclass(frozen=True)
+class BenchClip:
+    """Satisfies ``TimelineClip`` without a database row."""
+
+    url: str
+    clip_index: int
+    start_seconds: float
+    end_seconds: float
+    duration_seconds: float
+
+
+@dataclass(frozen=True)
+class Case:
+    name: str
+    clip_count: int
+    clip_seconds: float
+    size: str = "640x360"
+    # Seconds between the end of one clip and the start of the next;
+    # negative values overlap clips.
+    gap_seconds: float = 0.0
+    # Every other clip uses this size instead, forcing a resize.
+    alternate_size: str | None = None
+    # Audio length relative to the timeline.
+    audio_ratio: float = 1.0
+
+
+CASES = [
+    Case("concat-8x4s-360p", clip_count=8, clip_seconds=4),
+    Case("concat-32x2s-360p", clip_count=32, clip_seconds=2),
+    Case("concat-4x4s-720p", clip_count=4, clip_seconds=4, size="1280x720"),
+    Case("gaps-8x4s-360p", clip_count=8, clip_seconds=4, gap_seconds=1.0),
+    Case("overlap-8x4s-360p", clip_count=8, clip_seconds=4, gap_seconds=-1.0),
+    Case("mixed-sizes-8x4s", clip_count=8, clip_seconds=4, alternate_size="480x270"),
+    Case("long-audio-8x4s-360p", clip_count=8, clip_seconds=4, audio_ratio=2.0),
+    Case("long-song-60x4s-360p", clip_count=60, clip_seconds=4),
+]
+
+
+def _ffmpeg(args: list[str]) -> None:
+    subprocess.run([FFMPEG_BINARY, "-hide_banner", "-loglevel", "error", "-y", *args],
+                   check=True)
+
+
+def _cached(path: Path, generate) -> Path:
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_name(f".{path.name}.part{path.suffix}")
+        generate(str(partial))
+        os.replace(partial, path)
+    return path
+
+
+def synthetic_clip(size: str, seconds: float, seed: int) -> Path:
+    def generate(path: str) -> None:
+        _ffmpeg([
+            "-f", "lavfi", "-i", f"testsrc2=size={size}:rate={FPS}:duration={seconds}",
+            "-vf", f"hue=h={(seed * 47) % 360}",
+            "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", path,
+        ])
+
+    return _cached(WORK_DIR / "clips" / f"{size}-{seconds:g}s-{seed}.mp4", generate)
+
+
+def synthetic_audio(seconds: float) -> Path:
+    def generate(path: str) -> None:
+        _ffmpeg(["-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds:.3f}",
+                 "-c:a", "libmp3lame", "-b:a", "128k", path])
+
+    return _cached(WORK_DIR / "audio" / f"{seconds:.3f}s.mp3", generate)
+
+
+def build_timeline(case: Case) -> tuple[list[BenchClip], Path]:
+    clips = []
+    start = 0.0
+    for index in range(case.clip_count):
+        size = case.alternate_size if case.alternate_size and index % 2 else case.size
+        path = synthetic_clip(size, case.clip_seconds, index)
+        clips.append(BenchClip(
+            url=str(path),
+            clip_index=index,
+            start_seconds=start,
+            end_seconds=start + case.clip_seconds,
+            duration_seconds=case.clip_seconds,
+        ))
+        start += case.clip_seconds + case.gap_seconds
+
+    timeline = max(clip.end_seconds for clip in clips)
+    return clips, synthetic_audio(timeline * case.audio_ratio)
+
+
+class FfmpegMonitor:
+    """Track the ffmpeg processes started from this process (moviepy's too).
+
+    ``RUSAGE_CHILDREN`` is no use for their memory: a child is charged the
+    parent's RSS at fork time. Instead their RSS is sampled from ``/proc``
+    while they run (Linux only; elsewhere it stays 0).
+    """
+
+    def __init__(self, interval: float = 0.05) -> None:
+        self.started = 0
+        self.peak_running = 0
+        self.peak_rss_mb = 0.0
+        self._running: list[subprocess.Popen] = []
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def __enter__(self) -> "FfmpegMonitor":
+        popen_init = self._popen_init = subprocess.Popen.__init__
+        monitor = self
+
+        def init(popen, args, *rest, **kwargs):
+            popen_init(popen, args, *rest, **kwargs)
+            program = args[0] if isinstance(args, (list, tuple)) else args
+            if os.path.basename(str(program)).startswith("ffmpeg"):
+                monitor.started += 1
+                monitor._running.append(popen)
+
+        subprocess.Popen.__init__ = init
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._stop.set()
+        self._thread.join()
+        subprocess.Popen.__init__ = self._popen_init
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self._interval):
+            self._running = [p for p in self._running if p.returncode is None]
+            self.peak_running = max(self.peak_running, len(self._running))
+            self.peak_rss_mb = max(self.peak_rss_mb, sum(map(_rss_mb, self._running)))
+
+
+def _rss_mb(process: subprocess.Popen) -> float:
+    try:
+        with open(f"/proc/{process.pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def run_case(case: Case, profile_name: str, threads: int) -> dict:
+    """Render one case; runs in its own process so RSS is per case."""
+    clips, audio = build_timeline(case)
+    profile = replace(ENCODER_PROFILES[profile_name], threads=threads)
+
+    output_dir = Path(tempfile.mkdtemp(dir=WORK_DIR, prefix="out-"))
+    try:
+        with FfmpegMonitor() as ffmpeg:
+            started = time.perf_counter()
+            output = render_timeline(clips, str(audio), str(output_dir / "out.mp4"),
+                                     profile=profile)
+            wall = time.perf_counter() - started
+
+        record = json.loads(Path(output).with_suffix(".json").read_text())
+        info = probe_video(output)
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    frames = round(info.duration * info.fps)
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu_seconds = own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+    return {
+        "case": asdict(case),
+        "method": record["method"],
+        "wall_seconds": round(wall, 3),
+        "output_seconds": round(info.duration, 3),
+        "output_size": list(info.size),
+        "output_frames": frames,
+        "output_fps": round(frames / wall, 2),
+        "peak_rss_mb": round(own.ru_maxrss / 1024, 1),
+        "ffmpeg_peak_rss_mb": round(ffmpeg.peak_rss_mb, 1),
+        "cpu_seconds": round(cpu_seconds, 2),
+        "ffmpeg_processes": ffmpeg.started,
+        "ffmpeg_peak_running": ffmpeg.peak_running,
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=API_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(cases: list[Case], profile: str, threads: int, repeat: int) -> dict:
+    results = []
+    # One process per render: peak RSS and child counts are per run, and no
+    # imports or open clips carry over between cases.
+    context = multiprocessing.get_context("spawn")
+    for case in cases:
+        build_timeline(case)
+        runs = []
+        for _ in range(repeat):
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                runs.append(executor.submit(run_case, case, profile, threads).result())
+        best = min(runs, key=lambda result: result["wall_seconds"])
+        best["wall_seconds_all"] = [result["wall_seconds"] for result in runs]
+        results.append(best)
+        print(_format_row(best), flush=True)
+
+    return {
+        "commit": _git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "profile": profile,
+        "threads": threads,
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def _format_row(result: dict) -> str:
+    return (
+        f"{result['case']['name']:<24} {result['method']:<12} "
+        f"{result['wall_seconds']:>8.2f}s {result['output_fps']:>8.1f} fps "
+        f"{result['peak_rss_mb']:>7.0f} MB {result['ffmpeg_peak_rss_mb']:>7.0f} MB "
+        f"{result['ffmpeg_processes']:>5} ffmpeg"
+    )
+
+
+def compare(old_path: Path, new_path: Path) -> None:
+    old, new = (json.loads(Path(path).read_text()) for path in (old_path, new_path))
+    before = {result["case"]["name"]: result for result in old["results"]}
+
+    print(f"{'case':<24} {old['commit'] or 'old':>10} {new['commit'] or 'new':>10} {'change':>8}"
+          f"  peak RSS  ffmpeg")
+    for result in new["results"]:
+        name = result["case"]["name"]
+        previous = before.get(name)
+        if previous is None:
+            print(f"{name:<24} {'-':>10} {result['wall_seconds']:>9.2f}s")
+            continue
+        change = result["wall_seconds"] / previous["wall_seconds"] - 1
+        print(
+            f"{name:<24} {previous['wall_seconds']:>9.2f}s {result['wall_seconds']:>9.2f}s "
+            f"{change:>+8.1%}  {previous['peak_rss_mb']:.0f}->{result['peak_rss_mb']:.0f} MB"
+            f"  {previous['ffmpeg_processes']}->{result['ffmpeg_processes']}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-k", dest="patterns", action="append",
+                        help="only run cases whose name contains this (repeatable)")
+    parser.add_argument("--profile", default="draft", choices=sorted(ENCODER_PROFILES))
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="renders per case; the fastest is reported")
+    parser.add_argument("-o", "--output", type=Path,
+                        help="results file (default: benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--list", action="store_true", help="list the cases and exit")
+    parser.add_argument("--compare", nargs=2, type=Path, metavar=("OLD", "NEW"),
+                        help="compare two results files instead of running")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    cases = [case for case in CASES
+             if not args.patterns or any(pattern in case.name for pattern in args.patterns)]
+    if args.list:
+        for case in cases:
+            print(case.name)
+        return
+    if not cases:
+        sys.exit("No benchmark case matches")
+
+    WORK_DIR.mkdir(parents=True, exist_ok=True)
+    report = run(cases, args.profile, args.threads, max(1, args.repeat))
+
+    output = args.output
+    if output is None:
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        output = RESULTS_DIR / f"{stamp}-{report['commit'] or 'unknown'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Wrote {output}")
+
+
+if __name__ == "__main__":
+    main()
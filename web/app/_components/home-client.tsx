@@ -7,10 +7,11 @@ import { JobStatus, Task, JobState } from "@/types";
 import Timeline from "./timeline/timeline";
 import UploadFile from "./upload-file";
 import GenerateVideo from "./generate-video";
-import { Track } from "@/types/editor";
+import { Render, Track } from "@/types/editor";
 import { useMediaController } from "./hooks/useMediaController";
 import { useQuery } from "@tanstack/react-query";
 import { useGetJson } from "@/hooks/useGetJson";
+import { useTaskEvents } from "@/hooks/useTaskEvents";
 import DebugControls from "./debug-controls";
 
 
@@ -39,10 +40,25 @@ export default function HomeClient() {
     return tasks.find((t) => t.id === chosenTaskId) ?? null;
   }, [tasks, chosenTaskId])
 
+  const { data: renders } = useGetJson<Render[]>(
+    ["renders", chosenTask?.id],
+    `/api/tasks/${chosenTask?.id}/renders`,
+    undefined,
+    {
+      enabled: !!chosenTask?.id
+    }
+  );
+
+  // Show the low-resolution preview until the final render is ready.
   const videoSrc = useMemo(() => {
     if (!chosenTask) return null;
+    const final = renders?.find((r) => r.kind === "final");
+    const preview = renders?.find((r) => r.kind === "preview");
+    if (final?.state === "ready" && final.url) return final.url;
+    if (preview?.url) return preview.url;
+    if (final?.url) return final.url;
     return `/api/media/${chosenTask.id}/final_video.mp4`;
-  }, [chosenTask])
+  }, [chosenTask, renders])
 
   async function fetchStatus(id: number): Promise<JobStatus> {
     const res = await fetch(`/api/status/${id}`, { cache: "no-store" });
@@ -54,17 +70,10 @@ export default function HomeClient() {
     queryKey: ["status", chosenTask?.id],
     queryFn: () => fetchStatus(chosenTask!.id),
     enabled: !!chosenTask,
-    refetchInterval: (query) => {
-      if (query.state.status === "error") return false;
-
-      const status = query.state.data?.state;
-
-      if (!status) return 1000 * 60;
-
-      return ["done", "failed"].includes(status) ? false : 5000;
-    },
   })
 
+  useTaskEvents(chosenTask?.id)
+
 
   function onSetSelectedTaskId(id: number | null) {
     setSelectedTaskId(id);
@@ -1,4 +1,4 @@
-import { Clip } from "@/types";
+import { Clip, ClipThumbnails } from "@/types";
 import { Box, Button, Dialog, DialogActions, DialogContent, DialogTitle, TextField, Typography } from "@mui/material";
 import { useMutation } from "@tanstack/react-query";
 import axios from "axios";
@@ -10,6 +10,8 @@ type Props = {
   pxPerSecond: number;
   clip: Clip;
   index: number;
+  height: number;
+  thumbnails?: ClipThumbnails;
 }
 
 type ScenePayload = {
@@ -18,7 +20,37 @@ type ScenePayload = {
   scriptDescription: string;
 };
 
-export default function VideoClip({ pxPerSecond, clip, index }: Props) {
+// One sprite frame per tile, picked by the time under the tile's center.
+function Filmstrip({ thumbnails, width, height, pxPerSecond }: { thumbnails: ClipThumbnails, width: number, height: number, pxPerSecond: number }) {
+  const tileWidth = thumbnails.frame_width * height / thumbnails.frame_height;
+  const tiles = Math.max(1, Math.ceil(width / tileWidth));
+
+  return (
+    <Box sx={{ position: 'absolute', inset: 0, display: 'flex', overflow: 'hidden', pointerEvents: 'none' }}>
+      {Array.from({ length: tiles }, (_, k) => {
+        const t = (k + 0.5) * tileWidth / pxPerSecond;
+        const frame = Math.min(thumbnails.count - 1, Math.max(0, Math.floor(t / thumbnails.interval)));
+        const col = frame % thumbnails.columns;
+        const row = Math.floor(frame / thumbnails.columns);
+        return (
+          <Box
+            key={k}
+            sx={{
+              flex: '0 0 auto',
+              width: tileWidth,
+              height,
+              backgroundImage: `url(${thumbnails.sprite_url})`,
+              backgroundSize: `${thumbnails.columns * tileWidth}px ${thumbnails.rows * height}px`,
+              backgroundPosition: `-${col * tileWidth}px -${row * height}px`,
+            }}
+          />
+        );
+      })}
+    </Box>
+  )
+}
+
+export default function VideoClip({ pxPerSecond, clip, index, height, thumbnails }: Props) {
   const [open, setOpen] = useState(false);
   const [confirmCloseOpen, setConfirmCloseOpen] = useState(false);
 
@@ -94,6 +126,9 @@ export default function VideoClip({ pxPerSecond, clip, index }: Props) {
       className="border rounded-sm"
       onClick={handleClickOpen}
     >
+      {thumbnails && (
+        <Filmstrip thumbnails={thumbnails} width={clip.duration_seconds * pxPerSecond} height={height} pxPerSecond={pxPerSecond} />
+      )}
       {(clip.duration_seconds * pxPerSecond) > 60 && (
         <Box sx={{ width: '100%', height: '80%' }} className="flex items-center justify-center">
           <Box sx={{ position: 'absolute', backgroundColor: 'rgba(0, 0, 0, 0.3)' }} className="rounded-sm">
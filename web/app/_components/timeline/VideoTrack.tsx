@@ -1,4 +1,4 @@
-import { Clip } from "@/types/editor"
+import { Clip, ClipThumbnails } from "@/types/editor"
 import { Box } from "@mui/material"
 import VideoClip from "./VideoClip";
 
@@ -7,15 +7,16 @@ type Props = {
 	height: number;
 	clips: Clip[];
 	pxPerSecond: number;
+	thumbnails?: Record<number, ClipThumbnails>;
 }
 
 
-export default function VideoTrack({ width, height, clips, pxPerSecond }: Props) {
+export default function VideoTrack({ width, height, clips, pxPerSecond, thumbnails }: Props) {
 
 	return (
 		<Box sx={{ width: width, height: height, position: 'relative' }}>
 			{clips.map((clip, i) => (
-				<VideoClip key={i} index={i} clip={clip} pxPerSecond={pxPerSecond} />
+				<VideoClip key={i} index={i} clip={clip} pxPerSecond={pxPerSecond} height={height} thumbnails={thumbnails?.[clip.id]} />
 			))
 			}
 		</Box >
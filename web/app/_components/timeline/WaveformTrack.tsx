@@ -6,32 +6,58 @@ import { useEffect, useRef, useState } from "react";
 
 type WaveformTrackProps = {
   src: string;
+  taskId?: number;
   height: number;
   width: number;
 }
 
+// Per-peak minimum and maximum, scaled to -1..1.
+type Peaks = { min: Float32Array; max: Float32Array };
+
+async function fetchPeaks(taskId: number, width: number): Promise<Peaks | null> {
+  const res = await fetch(`/api/tasks/${taskId}/waveform/peaks?pixels=${Math.max(1, Math.round(width))}`);
+  if (!res.ok) return null;
+
+  const pairs = new Int8Array(await res.arrayBuffer());
+  const count = pairs.length / 2;
+  const min = new Float32Array(count);
+  const max = new Float32Array(count);
+  for (let i = 0; i < count; i++) {
+    min[i] = pairs[2 * i] / 128;
+    max[i] = pairs[2 * i + 1] / 128;
+  }
+  return { min, max };
+}
+
+async function decodePeaks(src: string): Promise<Peaks> {
+  const res = await fetch(src);
+  const arrayBuffer = await res.arrayBuffer();
+
+  const audioCtx = new AudioContext();
+  const audioBuffer = await audioCtx.decodeAudioData(arrayBuffer);
+
+  // first channel: left
+  const raw = audioBuffer.getChannelData(0);
+  return { min: raw, max: raw };
+}
+
 
 
-export default function WaveformTrack({ src, height, width }: WaveformTrackProps) {
+export default function WaveformTrack({ src, taskId, height, width }: WaveformTrackProps) {
   const canvasRef = useRef<HTMLCanvasElement | null>(null);
-  const [samples, setSamples] = useState<Float32Array | null>(null); // PCM data
+  const [samples, setSamples] = useState<Peaks | null>(null);
 
   useEffect(() => {
     let cancelled = false;
 
     const load = async () => {
-      const res = await fetch(src);
-      const arrayBuffer = await res.arrayBuffer();
-
-      const audioCtx = new AudioContext();
-      const audioBuffer = await audioCtx.decodeAudioData(arrayBuffer);
+      // Precomputed peaks at the zoom level that fits the width; decoding
+      // the whole file is only a fallback for audio without them.
+      const peaks = (taskId ? await fetchPeaks(taskId, width) : null) ?? await decodePeaks(src);
 
       if (cancelled) return;
 
-      // first channel: left
-      const raw = audioBuffer.getChannelData(0);
-
-      setSamples(raw);
+      setSamples(peaks);
     };
 
     load();
@@ -39,7 +65,7 @@ export default function WaveformTrack({ src, height, width }: WaveformTrackProps
     return () => {
       cancelled = true;
     };
-  }, [src]);
+  }, [src, taskId, width]);
 
   useEffect(() => {
     if (!samples || !canvasRef.current) return;
@@ -53,7 +79,7 @@ export default function WaveformTrack({ src, height, width }: WaveformTrackProps
 
     ctx.clearRect(0, 0, width, height);
 
-    const step = Math.floor(samples.length / width); // 1 pixel = chunk of samples
+    const step = Math.max(1, Math.floor(samples.min.length / width)); // 1 pixel = chunk of samples
     const amplitude = height / 2;
 
     for (let i = 0; i < width; i++) {
@@ -61,11 +87,11 @@ export default function WaveformTrack({ src, height, width }: WaveformTrackProps
       let min = 1;
       let max = -1;
 
-      for (let j = 0; j < step; j++) {
-        const val = samples[start + j];
-        if (val < min) min = val;
-        if (val > max) max = val;
+      for (let j = 0; j < step && start + j < samples.min.length; j++) {
+        if (samples.min[start + j] < min) min = samples.min[start + j];
+        if (samples.max[start + j] > max) max = samples.max[start + j];
       }
+      if (min > max) continue;
 
       const y1 = (1 + min) * amplitude;
       const y2 = (1 + max) * amplitude;
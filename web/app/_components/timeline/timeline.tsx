@@ -3,12 +3,13 @@ import { Box, Button, Paper, Typography } from "@mui/material";
 import React, { useRef, useState, useMemo, useEffect } from "react";
 import Ruler from "./ruler";
 import { formatTimePrecise } from "@/utils/formatTime";
-import { Track } from "@/types/editor";
+import { ClipThumbnails, SuggestedCutMarkers, Track } from "@/types/editor";
 import WaveformTrack from "./WaveformTrack";
 import VideoTrack from "./VideoTrack";
 import { useMutation, useQueryClient } from "@tanstack/react-query";
 import axios from "axios";
 import { toast } from "sonner";
+import { useGetJson } from "@/hooks/useGetJson";
 
 
 function clamp(v: number, min: number, max: number) {
@@ -36,6 +37,30 @@ export default function Timeline({ time, seekToAction, playAction, pauseAction,
   const scrollRef = useRef<HTMLDivElement | null>(null)
 
   const queryClient = useQueryClient()
+
+  const { data: thumbnailList } = useGetJson<ClipThumbnails[]>(
+    ["thumbnails", taskId],
+    `/api/tasks/${taskId}/tracks/thumbnails`,
+    undefined,
+    {
+      enabled: !!taskId && tracks.length > 0
+    }
+  );
+
+  const { data: suggested } = useGetJson<SuggestedCutMarkers>(
+    ["suggested-cut-markers", taskId],
+    `/api/tasks/${taskId}/cut-markers/suggested`,
+    undefined,
+    {
+      enabled: !!taskId
+    }
+  );
+
+  const thumbnails = useMemo(() => {
+    const byClip: Record<number, ClipThumbnails> = {};
+    for (const t of thumbnailList ?? []) byClip[t.clip_id] = t;
+    return byClip;
+  }, [thumbnailList])
   const [pxPerSecond, setPxPerSecond] = useState(80)
   const [viewportWidth, setViewportWidth] = useState(0);
   const [cutMarkers, setCutMarkers] = useState<number[]>(initialCutMarkers);
@@ -197,6 +222,22 @@ export default function Timeline({ time, seekToAction, playAction, pauseAction,
     }
   })
 
+  const acceptSuggestedMutation = useMutation({
+    mutationFn: async () => {
+      const response = await axios.post(`/api/tasks/${taskId}/cut-markers/accept-suggested`)
+      return response.data
+    },
+    onSuccess: (data) => {
+      setCutMarkers(data.cut_markers);
+      setIsDirty(false);
+      toast.success(`Placed ${data.cut_markers.length} cut markers on the beat`);
+      queryClient.invalidateQueries({ queryKey: ["task", taskId] });
+    },
+    onError: (error) => {
+      toast.error(`Failed to use suggested cuts: ${error.message}`);
+    }
+  })
+
 
   return (
     <Box className="flex flex-col flex-1 min-h-0 px-2">
@@ -213,6 +254,15 @@ export default function Timeline({ time, seekToAction, playAction, pauseAction,
           <Button variant="outlined" onClick={placeCutMarker} className="m-1">
             Place cut marker
           </Button>
+          <Button
+            variant="outlined"
+            className="m-1"
+            onClick={() => acceptSuggestedMutation.mutate()}
+            disabled={!suggested?.suggested_cut_markers?.length || acceptSuggestedMutation.isPending}
+            title={suggested?.tempo_bpm ? `${Math.round(suggested.tempo_bpm)} BPM` : undefined}
+          >
+            Use suggested cuts
+          </Button>
           <Button variant="outlined" className="m-1" onClick={() => saveChangesMutation.mutate()} disabled={!isDirty}>
             Save changes
           </Button>
@@ -269,6 +319,7 @@ export default function Timeline({ time, seekToAction, playAction, pauseAction,
               >
                 <WaveformTrack
                   src={audioSrc}
+                  taskId={taskId}
                   height={trackHeight}
                   width={totalWidth}
                 />
@@ -287,7 +338,7 @@ export default function Timeline({ time, seekToAction, playAction, pauseAction,
                   borderColor: "divider",
                 }}
               >
-                <VideoTrack clips={t.clips} height={trackHeight} width={totalWidth} pxPerSecond={pxPerSecond} />
+                <VideoTrack clips={t.clips} height={trackHeight} width={totalWidth} pxPerSecond={pxPerSecond} thumbnails={thumbnails} />
               </Box>
             ))}
 
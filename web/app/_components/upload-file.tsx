@@ -10,6 +10,14 @@ import axios from "axios";
 
 
 
+// SHA-256 of the file, so the server can skip sending audio it already has
+// to the HPC. crypto.subtle only exists in secure contexts.
+async function sha256Hex(file: File): Promise<string | null> {
+  if (!globalThis.crypto?.subtle) return null;
+  const digest = await crypto.subtle.digest("SHA-256", await file.arrayBuffer());
+  return Array.from(new Uint8Array(digest), (b) => b.toString(16).padStart(2, "0")).join("");
+}
+
 type UploadFileProps = {
   file: File | null;
   setFileAction: (file: File | null) => void;
@@ -37,7 +45,10 @@ export default function UploadFile({ file, setFileAction, tasks, chosenTask, set
       const form = new FormData();
       form.append("file", file);
 
-      const { data } = await axios.post("/api/upload-audio", form)
+      const sha256 = await sha256Hex(file);
+      const { data } = await axios.post("/api/upload-audio", form, {
+        headers: sha256 ? { "X-Content-Sha256": sha256 } : undefined,
+      })
 
       return data;
     },
@@ -0,0 +1,44 @@
+import { useEffect } from "react";
+import { useQueryClient } from "@tanstack/react-query";
+import { JobState, JobStatus } from "@/types";
+
+type TaskEvent = {
+  id: number;
+  task_id: number;
+  state: JobState;
+  progress: number;
+  message: string | null;
+}
+
+// Keeps the ["status", taskId] query up to date from the server-sent event
+// stream. EventSource reconnects on its own and sends Last-Event-ID, so no
+// update is missed across reconnects.
+export function useTaskEvents(taskId: number | null | undefined) {
+  const queryClient = useQueryClient();
+
+  useEffect(() => {
+    if (!taskId) return;
+
+    const source = new EventSource(`/api/tasks/${taskId}/events`);
+
+    source.addEventListener("task", (e) => {
+      const event = JSON.parse((e as MessageEvent).data) as TaskEvent;
+
+      queryClient.setQueryData<JobStatus>(["status", taskId], (old) => ({
+        ...old,
+        state: event.state,
+      }));
+      // Picks up a finished preview or final render.
+      queryClient.invalidateQueries({ queryKey: ["renders", taskId] });
+
+      if (event.state === JobState.FAILED || event.state === JobState.DONE) {
+        // The error text and finished tracks are not part of the event.
+        queryClient.invalidateQueries({ queryKey: ["status", taskId] });
+        queryClient.invalidateQueries({ queryKey: ["tracks", taskId] });
+        queryClient.invalidateQueries({ queryKey: ["thumbnails", taskId] });
+      }
+    });
+
+    return () => source.close();
+  }, [taskId, queryClient]);
+}
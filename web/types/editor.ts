@@ -13,6 +13,28 @@ export type JobStatus = {
   error?: string | null;
 }
 
+export type Render = {
+  kind: "preview" | "final";
+  state: "pending" | "rendering" | "ready" | "failed";
+  profile: string | null;
+  error: string | null;
+  rendered_at: string | null;
+  url: string | null;
+}
+
+export type ClipThumbnails = {
+  clip_id: number;
+  clip_index: number;
+  sprite_url: string;
+  frame_width: number;
+  frame_height: number;
+  columns: number;
+  rows: number;
+  count: number;
+  interval: number;
+  times: number[];
+}
+
 export type Clip = {
   id: number;
   url: string | null;
@@ -42,3 +64,9 @@ export type Task = {
   additional_prompt: string | null;
   name: string;
 }
+
+export type SuggestedCutMarkers = {
+  task_id: number;
+  tempo_bpm: number | null;
+  suggested_cut_markers: number[] | null;
+}